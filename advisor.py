@@ -0,0 +1,373 @@
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from catalog import is_internal
+from filtering import quote_identifier
+from profiler import FULL_SCAN_PATTERN
+from result_cache import normalize_sql
+
+ADVISOR_INTERVAL = 120  # Seconds between background analyses of the query history
+HISTORY_LIMIT = 200  # Distinct queries remembered, least recently run dropped first
+REPLAY_RUNS = 3  # Timed runs per query; the fastest counts
+REPLAY_TIMEOUT = 10.0  # Seconds a replay may take before it is stopped
+SLOW_REPLAY_SECONDS = 0.1  # A replay this slow isn't repeated
+MIN_SCAN_SECONDS = 0.05  # Time an index must be estimated to save, over all runs, for it to be suggested
+SAMPLE_ROWS = 50_000  # Rows per table copied into the schema copy, to time queries there with and without an index
+MAX_INDEX_COLUMNS = 5
+
+KEYWORDS = {
+    "where", "join", "inner", "left", "right", "full", "cross", "natural", "outer", "on", "using",
+    "group", "order", "limit", "having", "window", "union", "except", "intersect", "as",
+}
+TABLE_REFERENCE_PATTERN = re.compile(
+    r'\b(?:FROM|JOIN)\s+(?:"([^"]+)"|(\w+))(?:\s+(?:AS\s+)?(\w+))?', re.IGNORECASE
+)
+EXTRA_TABLE_PATTERN = re.compile(r',\s*(?:"([^"]+)"|(\w+))(?:\s+(?:AS\s+)?(\w+))?')
+FROM_CLAUSE_PATTERN = re.compile(r'\bFROM\b(.*?)(?:\bWHERE\b|\bGROUP\b|\bORDER\b|\bLIMIT\b|\bHAVING\b|$)',
+                                 re.IGNORECASE | re.DOTALL)
+WHERE_PATTERN = re.compile(r'\bWHERE\b(.*?)(?:\bGROUP\s+BY\b|\bORDER\s+BY\b|\bLIMIT\b|\bHAVING\b|\bWINDOW\b|$)',
+                           re.IGNORECASE | re.DOTALL)
+ON_PATTERN = re.compile(r'\bON\b(.*?)(?:\b(?:LEFT|INNER|CROSS|JOIN|WHERE|GROUP|ORDER|LIMIT)\b|$)',
+                        re.IGNORECASE | re.DOTALL)
+ORDER_BY_PATTERN = re.compile(r'\bORDER\s+BY\b(.*?)(?:\bLIMIT\b|$)', re.IGNORECASE | re.DOTALL)
+SELECT_LIST_PATTERN = re.compile(r'^\s*SELECT\s+(?:DISTINCT\s+)?(.*?)\bFROM\b', re.IGNORECASE | re.DOTALL)
+PREDICATE_PATTERN = re.compile(
+    r'(?:(\w+)\.)?"?(\w+)"?\s*(==|=|<=|>=|<>|!=|<|>|\bIN\b|\bIS\b|\bLIKE\b|\bBETWEEN\b)', re.IGNORECASE
+)
+COLUMN_REFERENCE_PATTERN = re.compile(r'^(?:(\w+)\.)?"?(\w+)"?(?:\s+(?:ASC|DESC))?$', re.IGNORECASE)
+EQUALITY_OPERATORS = {"=", "==", "in", "is"}
+
+
+class HistoryEntry:
+    def __init__(self, query: str):
+        self.query = query
+        self.runs = 0
+        self.total_seconds = 0.0
+        self.plan = None  # Latest EXPLAIN QUERY PLAN details, when known
+
+    @property
+    def average_seconds(self) -> float:
+        return self.total_seconds / self.runs if self.runs else 0.0
+
+
+class QueryHistory:
+    """The read queries run this session, with how often and how long they ran."""
+
+    def __init__(self, limit: int = HISTORY_LIMIT):
+        self.limit = limit
+        self.entries = OrderedDict()  # Normalized SQL -> HistoryEntry
+        self.version = 0  # Bumped on every record, so analysis can skip an unchanged history
+        self.lock = threading.Lock()
+
+    def record(self, query: str, seconds: float, plan=None) -> None:
+        key = normalize_sql(query)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                entry = self.entries[key] = HistoryEntry(query.strip().rstrip(';'))
+            self.entries.move_to_end(key)
+            entry.runs += 1
+            entry.total_seconds += seconds
+            if plan is not None:
+                entry.plan = plan
+            while len(self.entries) > self.limit:
+                self.entries.popitem(last=False)
+            self.version += 1
+
+    def snapshot(self):
+        with self.lock:
+            return list(self.entries.values()), self.version
+
+
+class IndexSuggestion:
+    """A proposed index, the recorded queries whose full scans it replaces, and how much time it saves them."""
+
+    def __init__(self, table_name: str, columns):
+        self.table_name = table_name
+        self.columns = list(columns)
+        self.entries = []  # HistoryEntry objects whose queries would use it
+        self.seconds_before = 0.0  # Their runs replayed on the database as it is, weighted by run count
+        self.seconds_after = 0.0  # The same, estimated with the index in place
+
+    @property
+    def benefit_seconds(self) -> float:
+        return self.seconds_before - self.seconds_after
+
+    @property
+    def name(self) -> str:
+        return "idx_" + "_".join([self.table_name] + self.columns).lower()
+
+    @property
+    def statement(self) -> str:
+        columns = ", ".join(f'"{column}"' for column in self.columns)
+        return f'CREATE INDEX IF NOT EXISTS "{self.name}" ON "{self.table_name}" ({columns})'
+
+    @property
+    def label(self) -> str:
+        runs = sum(entry.runs for entry in self.entries)
+        return (
+            f"{self.table_name}({', '.join(self.columns)}) · saves ~{self.benefit_seconds * 1000:.1f} ms "
+            f"of {self.seconds_before * 1000:.1f} ms over {runs} run{'s' if runs != 1 else ''}"
+        )
+
+
+def table_references(query: str) -> dict:
+    """Map each alias or table name used in a query to its table."""
+    references = {}
+    matches = list(TABLE_REFERENCE_PATTERN.finditer(query))
+    from_clause = FROM_CLAUSE_PATTERN.search(query)
+    if from_clause:
+        # Comma joins: FROM a, b x
+        matches += list(EXTRA_TABLE_PATTERN.finditer(from_clause.group(1)))
+    for match in matches:
+        table_name = match.group(1) or match.group(2)
+        alias = match.group(3)
+        references[table_name.lower()] = table_name
+        if alias and alias.lower() not in KEYWORDS:
+            references[alias.lower()] = table_name
+    return references
+
+
+def candidate_indexes(conn: sqlite3.Connection, query: str, plan):
+    """Propose ``(table, columns)`` indexes for the tables a query's plan scans in full.
+
+    Columns compared with equality come first, then one range or ORDER BY
+    column; when the query only selects a few columns of the table, they are
+    appended so the index covers the query.
+    """
+    references = table_references(query)
+    scanned = set()
+    for detail in plan:
+        if FULL_SCAN_PATTERN.match(detail):
+            name = detail.split()[1].strip('"').lower()
+            if name in references:
+                scanned.add(references[name])
+    if not scanned:
+        return []
+
+    columns_of = {
+        table_name: {row[1].lower(): row[1] for row in conn.execute(f'PRAGMA table_info("{table_name}")')}
+        for table_name in set(references.values())
+    }
+
+    def resolve(qualifier, column):
+        """The (table, column) a possibly qualified column name refers to."""
+        if qualifier:
+            table_name = references.get(qualifier.lower())
+            columns = columns_of.get(table_name, {})
+            return (table_name, columns[column.lower()]) if column.lower() in columns else None
+        for table_name, columns in columns_of.items():
+            if column.lower() in columns:
+                return table_name, columns[column.lower()]
+        return None
+
+    equality, ranges = {}, {}
+    clauses = [match.group(1) for match in WHERE_PATTERN.finditer(query)]
+    clauses += [match.group(1) for match in ON_PATTERN.finditer(query)]
+    for clause in clauses:
+        for qualifier, column, operator in PREDICATE_PATTERN.findall(clause):
+            resolved = resolve(qualifier, column)
+            if resolved is None:
+                continue
+            target = equality if operator.lower() in EQUALITY_OPERATORS else ranges
+            target.setdefault(resolved[0], [])
+            if resolved[1] not in target[resolved[0]]:
+                target[resolved[0]].append(resolved[1])
+
+    ordering = {}
+    order_by = ORDER_BY_PATTERN.search(query)
+    if order_by:
+        for part in order_by.group(1).split(","):
+            match = COLUMN_REFERENCE_PATTERN.match(part.strip())
+            resolved = resolve(match.group(1), match.group(2)) if match else None
+            if resolved is None:
+                ordering = {}  # Expressions can't be served by a plain index
+                break
+            ordering.setdefault(resolved[0], []).append(resolved[1])
+
+    selected = {}
+    select_list = SELECT_LIST_PATTERN.search(query)
+    if select_list and "*" not in select_list.group(1):
+        for part in select_list.group(1).split(","):
+            match = COLUMN_REFERENCE_PATTERN.match(part.strip())
+            resolved = resolve(match.group(1), match.group(2)) if match else None
+            if resolved is None:
+                selected = None  # Expressions or other tables; no covering index
+                break
+            selected.setdefault(resolved[0], []).append(resolved[1])
+
+    candidates = []
+    for table_name in sorted(scanned):
+        columns = list(equality.get(table_name, []))
+        tail = ranges.get(table_name, [])[:1]
+        if not tail and len(ordering) == 1 and table_name in ordering:
+            tail = ordering[table_name]
+        columns += [column for column in tail if column not in columns]
+        if not columns:
+            continue
+        if selected is not None and set(selected) == {table_name}:
+            extra = [column for column in selected[table_name] if column not in columns]
+            if len(columns) + len(extra) <= MAX_INDEX_COLUMNS:
+                columns += extra
+        candidates.append((table_name, tuple(columns[:MAX_INDEX_COLUMNS])))
+    return candidates
+
+
+def time_query(conn: sqlite3.Connection, query: str, limit_seconds: float = REPLAY_TIMEOUT):
+    """Fastest of up to REPLAY_RUNS complete runs of a query, in seconds.
+
+    Rows are stepped through and dropped, so a large result isn't held in
+    memory. A run stopped at ``limit_seconds`` counts as taking that long.
+    Slow queries are only run once.
+    """
+    best = None
+    for _ in range(REPLAY_RUNS):
+        started_at = time.perf_counter()
+        deadline = started_at + limit_seconds
+        conn.set_progress_handler(lambda: 1 if time.perf_counter() > deadline else 0, 10_000)
+        try:
+            for _ in conn.execute(query):
+                pass
+        except sqlite3.OperationalError:
+            if time.perf_counter() > deadline:
+                return limit_seconds
+            raise
+        finally:
+            conn.set_progress_handler(None, 10_000)
+        elapsed = time.perf_counter() - started_at
+        best = elapsed if best is None else min(best, elapsed)
+        if elapsed > SLOW_REPLAY_SECONDS:
+            break
+    return best
+
+
+def schema_copy(conn: sqlite3.Connection) -> sqlite3.Connection:
+    """An in-memory database with the same tables and indexes, and the same planner statistics, but no rows.
+
+    It is enough for EXPLAIN QUERY PLAN to show whether an index would be
+    used, without copying any data.
+    """
+    copy = sqlite3.connect(":memory:")
+    rows = conn.execute(
+        "SELECT type, name, sql FROM sqlite_master WHERE type IN ('table', 'index') AND sql IS NOT NULL "
+        "ORDER BY type = 'index'"
+    ).fetchall()
+    for kind, name, sql in rows:
+        if name.startswith("sqlite_") or is_internal(name):
+            continue
+        try:
+            copy.execute(sql)
+        except sqlite3.Error:
+            pass  # E.g. a virtual table whose module isn't available; no index is suggested on it anyway
+    stats = []
+    try:
+        stats = conn.execute("SELECT tbl, idx, stat FROM sqlite_stat1").fetchall()
+    except sqlite3.Error:
+        pass  # Never analyzed
+    if stats:
+        copy.execute("ANALYZE")  # Creates sqlite_stat1
+        copy.execute("DELETE FROM sqlite_stat1")
+        copy.executemany("INSERT INTO sqlite_stat1 (tbl, idx, stat) VALUES (?, ?, ?)", stats)
+        copy.execute("ANALYZE sqlite_master")  # Makes the planner load them
+    copy.commit()
+    return copy
+
+
+def copy_sample(conn: sqlite3.Connection, copy: sqlite3.Connection, table_names, sample_rows: int = SAMPLE_ROWS) -> None:
+    """Copy up to ``sample_rows`` rows of each table into the schema copy, so queries can be timed there."""
+    for table_name in table_names:
+        columns = [quote_identifier(row[1]) for row in copy.execute(f'PRAGMA table_info("{table_name}")')]
+        if not columns:
+            continue  # Not in the copy, e.g. a view
+        column_list = ", ".join(columns)
+        rows = conn.execute(f'SELECT {column_list} FROM "{table_name}" LIMIT ?', (sample_rows,))
+        copy.executemany(
+            f'INSERT OR IGNORE INTO "{table_name}" ({column_list}) VALUES ({", ".join("?" * len(columns))})', rows
+        )
+    copy.commit()
+
+
+def uses_index(copy: sqlite3.Connection, suggestion: IndexSuggestion, query: str) -> bool:
+    """Whether the query's plan on the schema copy uses the suggested index and no longer scans its table."""
+    plan = [row[3] for row in copy.execute(f"EXPLAIN QUERY PLAN {query}")]
+    table_name = suggestion.table_name.lower()
+    return any(suggestion.name in detail for detail in plan) and not any(
+        FULL_SCAN_PATTERN.match(detail) and detail.split()[1].strip('"').lower() == table_name for detail in plan
+    )
+
+
+def suggest_indexes(connections, entries):
+    """Analyze recorded queries and return index suggestions, most beneficial first.
+
+    Candidates come from the queries whose plans scan a table in full. Each
+    is created on a schema-only copy of the database, and kept if the plans
+    of all the queries it should help then use it instead of the scan. The
+    copy is then given a sample of the tables' rows, and the queries are
+    timed on it with and without the index; the ratio scales their time
+    replayed on the database itself, through a reader and with a timeout, to
+    estimate what the index saves. Indexes saving less than MIN_SCAN_SECONDS
+    are dropped.
+    """
+    suggestions = {}
+    with connections.reader() as conn:
+        for entry in entries:
+            try:
+                plan = [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {entry.query}")]
+                entry.plan = plan
+                candidates = candidate_indexes(conn, entry.query, plan)
+            except sqlite3.Error:
+                continue  # The schema has moved on since the query ran
+            for table_name, columns in candidates:
+                suggestion = suggestions.setdefault((table_name, columns), IndexSuggestion(table_name, columns))
+                suggestion.entries.append(entry)
+        if not suggestions:
+            return []
+        copy = schema_copy(conn)
+
+    try:
+        for key, suggestion in list(suggestions.items()):
+            try:
+                copy.execute(suggestion.statement)
+                used = all(uses_index(copy, suggestion, entry.query) for entry in suggestion.entries)
+                copy.execute(f'DROP INDEX "{suggestion.name}"')
+            except sqlite3.Error:
+                used = False
+            if not used:
+                del suggestions[key]
+
+        entries = {id(entry): entry for suggestion in suggestions.values() for entry in suggestion.entries}
+        table_names = {name for entry in entries.values() for name in table_references(entry.query).values()}
+        replayed, sampled = {}, {}  # Each query is timed once without a new index, however many suggestions share it
+        with connections.reader() as conn:
+            copy_sample(conn, copy, table_names)
+            for key, entry in entries.items():
+                replayed[key] = time_query(conn, entry.query)
+        for key, entry in entries.items():
+            sampled[key] = time_query(copy, entry.query)
+
+        for suggestion in suggestions.values():
+            copy.execute(suggestion.statement)
+            for entry in suggestion.entries:
+                before = sampled[id(entry)]
+                # The index's effect on the sample, scaled to the time on the database itself;
+                # a run slower than without the index is stopped there, as it saves nothing
+                ratio = min(time_query(copy, entry.query, limit_seconds=before) / before, 1.0) if before else 1.0
+                suggestion.seconds_before += replayed[id(entry)] * entry.runs
+                suggestion.seconds_after += replayed[id(entry)] * ratio * entry.runs
+            copy.execute(f'DROP INDEX "{suggestion.name}"')
+    finally:
+        copy.close()
+
+    kept = [suggestion for suggestion in suggestions.values() if suggestion.benefit_seconds >= MIN_SCAN_SECONDS]
+    return sorted(kept, key=lambda suggestion: suggestion.benefit_seconds, reverse=True)
+
+
+def apply_suggestion(connections, suggestion: IndexSuggestion) -> None:
+    """Create a suggested index, then refresh the planner statistics."""
+    with connections.writer() as conn:
+        conn.execute(suggestion.statement)
+        conn.execute(f'ANALYZE "{suggestion.table_name}"')
+        conn.execute("PRAGMA optimize")
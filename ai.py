@@ -1,51 +1,396 @@
+import asyncio
 import os
+import threading
+import time
+from collections import OrderedDict
 from dotenv import load_dotenv
-from langchain_anthropic import ChatAnthropic
-from langchain_community.utilities import SQLDatabase
-from langchain_experimental.sql import SQLDatabaseChain
+from catalog import is_internal, schema_fingerprint
+from column_stats import ColumnStatsCache
+from connections import get_manager
+from schema_index import SchemaIndex
+from sql_cache import SqlCache, normalize_question
+from statements import VOLATILE_PATTERN, writes_database
+from tracing import tracer
 
 # Load environment variables from .env file
 load_dotenv()
 
-# Initialize the Anthropic LLM
-llm = ChatAnthropic(
-    model="claude-3-5-sonnet-20241022",
-    api_key=os.getenv("ANTHROPIC_API_KEY"),
-    temperature=0,  # Lower temperature for more accurate SQL
-    max_tokens=1000
-)
-
-# Connect to SQLite database
-db_path = "./database/database.db"
-db = SQLDatabase.from_uri(f"sqlite:///{db_path}")
-
-db._sample_rows_in_table_info = 0
-
-# Create SQL database chain - this handles SQL generation and execution automatically
-db_chain = SQLDatabaseChain.from_llm(
-    llm=llm, 
-    db=db, 
-    verbose=True,  # Shows the SQL queries being generated
-    return_intermediate_steps=True,  # Returns both query and result
-    use_query_checker=True,  # Validates SQL before execution
-    return_direct=False,  # Returns natural language answer, not just SQL results
-    #return_only_outputs=True  # Only return the final answer, not the dictionary
-)
+# Generated SQL is only allowed to read unless INFOTRON_AI_ALLOW_WRITES=1
+AI_ALLOW_WRITES = os.getenv("INFOTRON_AI_ALLOW_WRITES", "0") == "1"
+AI_ANSWER_ENTRIES = 64  # Answers kept in memory, each only while the data it was drawn from is unchanged
+
+
+class AiService:
+    """The LangChain/Anthropic stack, built on first use rather than at import.
+
+    Importing langchain and reflecting the database schema takes seconds, so
+    nothing is imported or constructed until ``ensure_ready()`` is called, by
+    the TUI after its first paint or by the first question.
+    """
+
+    def __init__(self, connections=None, llm=None, allow_writes: bool = AI_ALLOW_WRITES, sql_cache=None,
+                 column_stats=None):
+        self.connections = connections or get_manager()
+        self.database = os.path.abspath(self.connections.database_path)  # Keys this database's cached SQL
+        self.llm = llm  # Optional prebuilt chat model, e.g. a fake one in tests
+        self.allow_writes = allow_writes  # Whether direct mode may run writing SQL
+        self.sql_cache = sql_cache or SqlCache()  # Questions already turned into SQL
+        self.answers = OrderedDict()  # (question, sql, *data versions) -> (rows, answer)
+        self.answers_lock = threading.Lock()
+        self.schema_index = SchemaIndex()  # Picks the tables each prompt describes
+        self.column_stats = column_stats or ColumnStatsCache(self.connections)  # Profiles shared with the explorer
+        self.db = None
+        self.db_chain = None
+        self.build_seconds = None  # How long building the stack took
+        self.lock = threading.Lock()
+
+    @property
+    def ready(self) -> bool:
+        return self.db_chain is not None
+
+    def ensure_ready(self):
+        """Build the LLM, database wrapper and chain once; safe to call from any thread."""
+        with self.lock:
+            if self.db_chain is not None:
+                return self.db_chain
+            started_at = time.perf_counter()
+
+            from langchain_community.utilities import SQLDatabase
+            from langchain_experimental.sql import SQLDatabaseChain
+            from sqlalchemy import create_engine, event, exc
+            from sqlalchemy.pool import QueuePool
+
+            if self.llm is None:
+                from langchain_anthropic import ChatAnthropic
+
+                # Initialize the Anthropic LLM
+                self.llm = ChatAnthropic(
+                    model="claude-3-5-sonnet-20241022",
+                    api_key=os.getenv("ANTHROPIC_API_KEY"),
+                    temperature=0,  # Lower temperature for more accurate SQL
+                    max_tokens=1000
+                )
+
+            # Connect to SQLite database through the shared connection manager, so the chain
+            # gets the same pragma profile and statement cache as the TUI. Its connections only
+            # read, from the snapshot in snapshot mode; writes go through the manager's writer
+            engine = create_engine(
+                "sqlite://",
+                creator=lambda: self.connections.connect(read_only=True, path=self.connections.read_path),
+                poolclass=QueuePool,
+                pool_size=self.connections.reader_count,
+            )
+
+            @event.listens_for(engine, "connect")
+            def remember_path(dbapi_connection, record):
+                record.info["path"] = dbapi_connection.execute("PRAGMA database_list").fetchone()[2]
+
+            @event.listens_for(engine, "checkout")
+            def check_path(dbapi_connection, record, proxy):
+                # Reads have moved to or from a snapshot since the connection was pooled
+                if record.info["path"] != os.path.realpath(self.connections.read_path):
+                    raise exc.DisconnectionError()
+            # Infotron's own tables (search indexes) are not the user's data
+            with self.connections.reader() as conn:
+                internal = [name for (name,) in conn.execute("SELECT name FROM sqlite_master WHERE type='table'")
+                            if is_internal(name)]
+            self.db = SQLDatabase(engine, ignore_tables=internal or None)
+
+            self.db._sample_rows_in_table_info = 0
+
+            # Create SQL database chain - this handles SQL generation and execution automatically
+            self.db_chain = SQLDatabaseChain.from_llm(
+                llm=self.llm,
+                db=self.db,
+                verbose=True,  # Shows the SQL queries being generated
+                return_intermediate_steps=True,  # Returns both query and result
+                use_query_checker=True,  # Validates SQL before execution
+                return_direct=False,  # Returns natural language answer, not just SQL results
+                #return_only_outputs=True  # Only return the final answer, not the dictionary
+            )
+            self.build_seconds = time.perf_counter() - started_at
+            return self.db_chain
+
+    def query_database(self, question):
+        """Query the database with a natural language question"""
+        try:
+            chain = self.ensure_ready()
+            with self.connections.reader() as conn:
+                self.schema_index.refresh(conn)
+            usable = self.db.get_usable_table_names()
+            selected = [name for name in self.schema_index.select(question) or [] if name in usable]
+            inputs = {chain.input_key: question}
+            if selected:
+                inputs["table_names_to_use"] = selected
+            with tracer.span("llm.chain", tables=len(selected) or None):
+                result = chain.invoke(inputs)
+            return result
+        except Exception as e:
+            return f"Error: {e}"
+
+    def run_sql(self, sql: str):
+        """Run generated SQL the way the chain does; return the rows and their text form.
+
+        Reads go through the chain's read-only engine; a write, where allowed,
+        runs on the connection manager's writer like any other.
+        """
+        from langchain_community.utilities.sql_database import truncate_word
+
+        writes = self.validate_sql(sql)
+        with tracer.span("ai.run_sql") as span:
+            if writes:
+                with self.connections.writer() as conn:
+                    cursor = conn.execute(sql)
+                    rows = cursor.fetchall() if cursor.description else []
+            else:
+                result = self.db.run(sql, fetch="cursor")
+                rows = result.fetchall() if getattr(result, "returns_rows", False) else []
+            span.set(rows=len(rows))
+        # Same text the chain feeds to the answer prompt
+        text = str([
+            tuple(truncate_word(value, length=self.db._max_string_length) for value in row)
+            for row in rows
+        ]) if rows else ""
+        return rows, text
+
+    def lookup_sql(self, question: str):
+        """Return ``(fingerprint, sql)`` for a question, with sql None unless it is cached."""
+        with tracer.span("ai.sql_cache") as span:
+            with self.connections.reader() as conn:
+                fingerprint = schema_fingerprint(conn)
+            sql = self.sql_cache.get(question, fingerprint, self.database)
+            span.set(cache_hit=sql is not None)
+        return fingerprint, sql
+
+    def remember_sql(self, question: str, fingerprint: str, sql: str) -> None:
+        self.sql_cache.put(question, fingerprint, sql, self.database)
+
+    def answer_key(self, question: str, sql: str):
+        """Key an answer by its question and SQL and the data versions it reads; None if the SQL is volatile."""
+        if VOLATILE_PATTERN.search(sql):
+            return None
+        return (normalize_question(question), sql, *self.connections.versions())
+
+    def lookup_answer(self, key):
+        """Return ``(rows, answer)`` given before for the same question, SQL and data, or None."""
+        with self.answers_lock:
+            entry = self.answers.get(key)
+            if entry is not None:
+                self.answers.move_to_end(key)
+            return entry
+
+    def remember_answer(self, key, rows: str, answer: str) -> None:
+        with self.answers_lock:
+            self.answers[key] = (rows, answer)
+            self.answers.move_to_end(key)
+            while len(self.answers) > AI_ANSWER_ENTRIES:
+                self.answers.popitem(last=False)
+
+    def schema_info(self, question: str):
+        """Describe only the tables relevant to a question; return ``(table_info, report)``.
+
+        The report compares the schema sent with the whole schema, e.g.
+        "3 of 240 tables, 1,204 of 48,310 characters". Column stats of the
+        tables sent are appended where they have already been profiled.
+        """
+        with tracer.span("ai.schema") as span:
+            with self.connections.reader() as conn:
+                self.schema_index.refresh(conn)
+            usable = self.db.get_usable_table_names()
+            selected = self.schema_index.select(question)
+            if selected is not None:
+                selected = [name for name in selected if name in usable]
+            table_info = self.db.get_table_info(selected or None)
+            sent = selected or usable
+            stats = self.column_stats.describe(sent)
+            if stats:
+                table_info = f"{table_info}\n\n{stats}"
+            span.set(tables=len(sent), bytes=len(table_info))
+        report = (
+            f"{len(sent)} of {len(usable)} tables, "
+            f"{self.schema_index.schema_size(sent):,} of {self.schema_index.schema_size(usable):,} characters"
+        )
+        return table_info, report
+
+    async def prompt_inputs(self, question: str) -> dict:
+        """Build the chain's SQL generation prompt inputs for a question.
+
+        Besides the prompt variables, ``schema_report`` says how much of the
+        schema the prompt carries.
+        """
+        chain = await asyncio.to_thread(self.ensure_ready)
+        table_info, report = await asyncio.to_thread(self.schema_info, question)
+        return {
+            "input": f"{question}\nSQLQuery:",
+            "top_k": str(chain.top_k),
+            "dialect": self.db.dialect,
+            "table_info": table_info,
+            "schema_report": report,
+        }
+
+    async def generate_sql(self, llm_inputs: dict) -> str:
+        """Ask the LLM for the SQL answering a question; one round trip."""
+        prompt = self.ensure_ready().llm_chain.prompt
+        with tracer.span("llm.generate_sql") as span:
+            message = await self.llm.ainvoke(format_prompt(prompt, llm_inputs), stop=["\nSQLResult:"])
+            span.set(**token_usage(message))
+        sql = message_text(message).strip()
+        if "SQLQuery:" in sql:
+            sql = sql.split("SQLQuery:")[1].strip()
+        return sql
+
+    def validate_sql(self, sql: str) -> bool:
+        """Check generated SQL locally instead of with a second LLM call; return whether it writes.
+
+        The statement is compiled with EXPLAIN against the live schema, so
+        unknown tables or columns and syntax errors raise sqlite3.Error without
+        running anything. Unless writes are allowed, statements whose bytecode
+        writes to the database are rejected with ValueError.
+        """
+        with self.connections.reader() as conn:
+            writes = writes_database(conn, sql)
+        if writes and not self.allow_writes:
+            raise ValueError("Generated SQL would modify the database; only read-only queries are run")
+        return writes
+
+    async def astream_query(self, question: str):
+        """Answer a question stage by stage, yielding ``(stage, text)`` as each one completes.
+
+        Runs the same steps as SQLDatabaseChain, with its prompts, but reports
+        each as it happens: "schema" (how much of it the prompt carries), "sql"
+        (generated), "checked_sql" (after the query checker), "rows" (how many
+        came back) and then "answer" once per streamed token. A question answered before under the same schema
+        yields "cached_sql" instead of the first two and skips both SQL LLM calls; if the data hasn't changed
+        since, the rows and the whole answer come from memory too, without running the SQL or calling the LLM.
+        """
+        from langchain_community.tools.sql_database.prompt import QUERY_CHECKER
+        from langchain_core.prompts import PromptTemplate
+
+        chain = await asyncio.to_thread(self.ensure_ready)
+        llm_inputs = await self.prompt_inputs(question)
+        yield "schema", llm_inputs["schema_report"]
+        input_text = llm_inputs["input"]
+        prompt = chain.llm_chain.prompt
+        stop = ["\nSQLResult:"]
+
+        fingerprint, sql = await asyncio.to_thread(self.lookup_sql, question)
+        if sql is not None:
+            yield "cached_sql", sql
+            key = await asyncio.to_thread(self.answer_key, question, sql)
+            cached = self.lookup_answer(key) if key is not None else None
+            if cached is not None:
+                rows, answer = cached
+                yield "rows", rows
+                yield "answer", answer
+                return
+        else:
+            sql = await self.generate_sql(llm_inputs)
+            yield "sql", sql
+
+            if chain.use_query_checker:
+                checker_prompt = chain.query_checker_prompt or PromptTemplate(
+                    template=QUERY_CHECKER, input_variables=["query", "dialect"]
+                )
+                checker_input = checker_prompt.format(query=sql, dialect=self.db.dialect)
+                with tracer.span("llm.check_sql") as span:
+                    message = await self.llm.ainvoke(checker_input)
+                    span.set(**token_usage(message))
+                sql = message_text(message).strip()
+                yield "checked_sql", sql
+
+        # Versions from before the SQL runs, so an answer is never filed under newer data
+        key = await asyncio.to_thread(self.answer_key, question, sql)
+        rows, result = await asyncio.to_thread(self.run_sql, sql)
+        # Only SQL that actually ran is worth reusing
+        await asyncio.to_thread(self.remember_sql, question, fingerprint, sql)
+        yield "rows", str(len(rows))
+
+        llm_inputs["input"] = input_text + f"{sql}\nSQLResult: {result}\nAnswer:"
+        with tracer.span("llm.answer") as span:
+            started_at = time.perf_counter()
+            usage = {}
+            answer = []
+            async for chunk in self.llm.astream(format_prompt(prompt, llm_inputs), stop=stop):
+                if "first_token_ms" not in span.attributes:
+                    span.set(first_token_ms=round((time.perf_counter() - started_at) * 1000, 3))
+                # Providers report usage on some chunks, e.g. input on the first and output on the last
+                for key, count in token_usage(chunk).items():
+                    usage[key] = usage.get(key, 0) + count
+                text = message_text(chunk)
+                if text:
+                    answer.append(text)
+                    yield "answer", text
+            span.set(**usage)
+        if key is not None:
+            self.remember_answer(key, str(len(rows)), "".join(answer))
+
+
+def format_prompt(prompt, inputs: dict) -> str:
+    """Format a prompt with just the inputs it declares."""
+    return prompt.format(**{name: inputs[name] for name in prompt.input_variables})
+
+
+def token_usage(message) -> dict:
+    """Input and output token counts of a chat message or chunk, where the provider reports them."""
+    usage = getattr(message, "usage_metadata", None) or {}
+    return {key: usage[key] for key in ("input_tokens", "output_tokens") if usage.get(key) is not None}
+
+
+def message_text(message) -> str:
+    """Return the text of a chat message or chunk, whatever its content shape."""
+    content = message.content
+    if isinstance(content, str):
+        return content
+    # Some providers return a list of content blocks
+    return "".join(
+        block if isinstance(block, str) else block.get("text", "")
+        for block in content
+    )
+
+
+_service = None
+_service_lock = threading.Lock()
+
+
+def get_service(connections=None, column_stats=None) -> AiService:
+    """Return the shared AI service. Creating it is cheap; building it is not.
+
+    The first call decides the connections and column stats cache it uses,
+    e.g. the app's, so tables are profiled once for the explorer and prompts.
+    """
+    global _service
+    with _service_lock:
+        if _service is None:
+            _service = AiService(connections, column_stats=column_stats)
+        return _service
+
+
+def set_service(service: AiService) -> None:
+    """Replace the shared AI service, e.g. with one on a fake LLM for benchmarks."""
+    global _service
+    with _service_lock:
+        _service = service
+
 
 def query_database(question):
     """Query the database with a natural language question"""
-    try:
-        result = db_chain.invoke(question)
-        return result
-    except Exception as e:
-        return f"Error: {e}"
+    return get_service().query_database(question)
+
+
+def __getattr__(name):
+    # Keep `ai.llm`, `ai.db` and `ai.db_chain` working; they build the stack on access
+    if name in ("llm", "db", "db_chain"):
+        service = get_service()
+        service.ensure_ready()
+        return getattr(service, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 # Example usage
 if __name__ == "__main__":
     # First, let's see what's in the database
     #print("=== Database Schema ===")
-    #print(db.get_table_info())
-    
+    #print(get_service().db.get_table_info())
+
     # Example queries
     questions = [
         'what city is the oldest user from',
@@ -56,14 +401,14 @@ if __name__ == "__main__":
         #"List all unique cities in the database",
         # Add your specific questions here
     ]
-    
+
     for question in questions:
         print(f"\n=== Question: {question} ===")
         answer = query_database(question)
         #print('the answer follows')
         #print(f"Answer: {answer}")
         print("-" * 50)
-    
+
     # Interactive mode
     print("\n=== Interactive Mode ===")
     while True:
@@ -71,4 +416,4 @@ if __name__ == "__main__":
         if user_question.lower() == 'quit':
             break
         answer = query_database(user_question)
-        #print(f"Answer: {answer}")
\ No newline at end of file
+        #print(f"Answer: {answer}")
@@ -0,0 +1,207 @@
+"""Run a file of AI questions or SQL statements headlessly and concurrently.
+
+    python batch.py questions.txt > answers.jsonl
+    python batch.py report.sql --format csv --output report.csv
+
+Questions are one per line; SQL files (``.sql``, or ``--sql``) may spread a
+statement over several lines. Results are written as each item completes,
+not in input order, with the item's index and timings so they can be matched
+and sorted afterwards.
+"""
+import argparse
+import asyncio
+import csv
+import json
+import sys
+import time
+
+from connections import get_manager
+from statements import split_statements, writes_database
+
+OUTPUT_FIELDS = ["index", "kind", "input", "sql", "columns", "rows", "row_count", "answer",
+                 "error", "started", "seconds"]
+
+
+class RateLimiter:
+    """Spaces out acquisitions so at most ``per_minute`` happen in any minute."""
+
+    def __init__(self, per_minute: float):
+        self.interval = 60.0 / per_minute if per_minute else 0.0
+        self.next_at = 0.0
+        self.lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        if not self.interval:
+            return
+        async with self.lock:
+            now = time.monotonic()
+            wait = self.next_at - now
+            self.next_at = max(now, self.next_at) + self.interval
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+
+def read_items(path: str, sql: bool):
+    """Return the questions (one per line) or SQL statements in a file."""
+    with open(path) as file:
+        text = file.read()
+    if sql:
+        return split_statements(text)
+    return [line.strip() for line in text.splitlines() if line.strip() and not line.lstrip().startswith("#")]
+
+
+def run_sql(connections, sql: str, max_rows: int):
+    """Run one statement; reads use the reader pool, anything else the writer."""
+    with connections.reader() as conn:
+        if not writes_database(conn, sql):
+            cursor = conn.execute(sql)
+            columns = [description[0] for description in cursor.description or []]
+            rows = cursor.fetchmany(max_rows)
+            return columns, rows, len(rows)
+    with connections.writer() as conn:
+        cursor = conn.execute(sql)
+        columns = [description[0] for description in cursor.description or []]
+        rows = cursor.fetchmany(max_rows)
+        cursor.fetchall()  # Finish the statement before commit
+        return columns, rows, cursor.rowcount if cursor.rowcount >= 0 else len(rows)
+
+
+class BatchRunner:
+    """Runs items with at most ``concurrency`` in flight and ``llm_concurrency`` talking to the LLM."""
+
+    def __init__(self, connections, service=None, concurrency: int = 8, llm_concurrency: int = 2,
+                 llm_per_minute: float = 0, max_rows: int = 1000, answer: bool = False):
+        self.connections = connections
+        self.service = service
+        self.slots = asyncio.Semaphore(concurrency)
+        self.llm_slots = asyncio.Semaphore(llm_concurrency)
+        self.rate_limiter = RateLimiter(llm_per_minute)
+        self.max_rows = max_rows
+        self.answer = answer  # Ask for a natural-language answer instead of returning rows
+        self.started_at = time.perf_counter()
+
+    async def run_item(self, index: int, kind: str, text: str) -> dict:
+        async with self.slots:
+            started = time.perf_counter()
+            result = {"index": index, "kind": kind, "input": text, "sql": None, "columns": None,
+                      "rows": None, "row_count": None, "answer": None, "error": None}
+            try:
+                if kind == "sql":
+                    result["sql"] = text
+                elif self.answer:
+                    await self.answer_question(text, result)
+                else:
+                    result["sql"] = await self.question_sql(text)
+                if result["sql"] is not None and not self.answer:
+                    columns, rows, row_count = await asyncio.to_thread(
+                        run_sql, self.connections, result["sql"], self.max_rows
+                    )
+                    result.update(columns=columns, rows=[list(row) for row in rows], row_count=row_count)
+            except Exception as e:
+                result["error"] = str(e)
+            result["started"] = round(started - self.started_at, 4)
+            result["seconds"] = round(time.perf_counter() - started, 4)
+            return result
+
+    async def question_sql(self, question: str) -> str:
+        """Turn a question into checked, read-only SQL, reusing cached SQL when there is some."""
+        fingerprint, sql = await asyncio.to_thread(self.service.lookup_sql, question)
+        if sql is None:
+            async with self.llm_slots:
+                await self.rate_limiter.acquire()
+                llm_inputs = await self.service.prompt_inputs(question)
+                sql = await self.service.generate_sql(llm_inputs)
+        await asyncio.to_thread(self.service.validate_sql, sql)
+        await asyncio.to_thread(self.service.remember_sql, question, fingerprint, sql)
+        return sql
+
+    async def answer_question(self, question: str, result: dict) -> None:
+        async with self.llm_slots:
+            await self.rate_limiter.acquire()
+            answer = []
+            async for stage, text in self.service.astream_query(question):
+                if stage in ("sql", "checked_sql", "cached_sql"):
+                    result["sql"] = text
+                elif stage == "rows":
+                    result["row_count"] = int(text)
+                elif stage == "answer":
+                    answer.append(text)
+            result["answer"] = "".join(answer).strip()
+
+    async def run(self, kind: str, items, write) -> list:
+        """Run every item and call ``write`` with each result as it completes."""
+        tasks = [asyncio.create_task(self.run_item(index, kind, text)) for index, text in enumerate(items)]
+        results = []
+        for task in asyncio.as_completed(tasks):
+            result = await task
+            write(result)
+            results.append(result)
+        return results
+
+
+def make_writer(output, output_format: str):
+    """Return a function writing one result to ``output`` and flushing it."""
+    if output_format == "csv":
+        writer = csv.DictWriter(output, fieldnames=OUTPUT_FIELDS)
+        writer.writeheader()
+
+        def write(result):
+            row = dict(result)
+            for field in ("columns", "rows"):
+                if row[field] is not None:
+                    row[field] = json.dumps(row[field], default=str)
+            writer.writerow(row)
+            output.flush()
+    else:
+        def write(result):
+            output.write(json.dumps(result, default=str) + "\n")
+            output.flush()
+    return write
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run a file of AI questions or SQL statements concurrently.")
+    parser.add_argument("file", help="questions, one per line, or a .sql script")
+    parser.add_argument("--sql", action="store_true", help="treat the file as SQL even without a .sql extension")
+    parser.add_argument("--database", help="database file (default: INFOTRON_DATABASE or database/database.db)")
+    parser.add_argument("--format", choices=["jsonl", "csv"], default="jsonl")
+    parser.add_argument("--output", help="write results here instead of stdout")
+    parser.add_argument("--concurrency", type=int, default=8, help="items in flight at once")
+    parser.add_argument("--llm-concurrency", type=int, default=2, help="items talking to the LLM at once")
+    parser.add_argument("--llm-per-minute", type=float, default=0, help="cap on LLM requests a minute (0: none)")
+    parser.add_argument("--max-rows", type=int, default=1000, help="rows kept per result")
+    parser.add_argument("--answer", action="store_true", help="answer questions in words rather than with rows")
+    args = parser.parse_args(argv)
+
+    sql = args.sql or args.file.lower().endswith(".sql")
+    items = read_items(args.file, sql)
+    connections = get_manager(args.database)
+    service = None
+    if not sql:
+        from ai import AiService
+
+        service = AiService(connections=connections)
+    runner = BatchRunner(
+        connections, service,
+        concurrency=args.concurrency,
+        llm_concurrency=args.llm_concurrency,
+        llm_per_minute=args.llm_per_minute,
+        max_rows=args.max_rows,
+        answer=args.answer,
+    )
+
+    output = open(args.output, "w", newline="") if args.output else sys.stdout
+    try:
+        results = asyncio.run(runner.run("sql" if sql else "question", items, make_writer(output, args.format)))
+    finally:
+        if args.output:
+            output.close()
+        connections.close()
+    failed = sum(1 for result in results if result["error"])
+    elapsed = time.perf_counter() - runner.started_at
+    print(f"{len(results)} items in {elapsed:.2f}s, {failed} failed", file=sys.stderr)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,277 @@
+"""Benchmark InfotronApp headlessly on synthetic databases.
+
+    python benchmark.py --output bench.json
+    python benchmark.py --scales 1m-5t,10m-5t --baseline bench.json
+
+Each scale is a generated database, built once and kept under BENCH_DIR. The
+app is driven through Textual's ``run_test`` and Pilot with a fake LLM, every
+scenario runs ``--repeat`` times and the median is reported, in milliseconds.
+With ``--baseline``, metrics slower than the baseline by more than
+``--threshold`` (and BENCH_NOISE_MS) are flagged and the exit status is 1.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+# Generated databases are kept here between runs; override with INFOTRON_BENCH_DIR
+BENCH_DIR = os.getenv(
+    "INFOTRON_BENCH_DIR",
+    os.path.join(os.path.expanduser("~"), ".cache", "infotron", "bench"),
+)
+BENCH_NOISE_MS = 5.0  # Differences smaller than this are never regressions
+BENCH_SIZE = (160, 50)  # Terminal size the app is laid out at
+SIDE_TABLE_ROWS = 1000  # Rows in each table besides the main one
+SCROLL_PAGES = 20  # Page Down presses in the scroll scenario
+WAIT_TIMEOUT = 300.0  # Give up on a scenario that hasn't finished after this long
+
+# Name -> (rows in the main table, tables)
+SCALES = {
+    "10k-5t": (10_000, 5),
+    "10k-200t": (10_000, 200),
+    "1m-5t": (1_000_000, 5),
+    "1m-200t": (1_000_000, 200),
+    "10m-5t": (10_000_000, 5),
+}
+DEFAULT_SCALES = ["10k-5t", "10k-200t", "1m-5t"]
+
+MAIN_TABLE = "items"
+AI_QUESTION = "How many items are there in each category?"
+AI_SQL = f"SELECT category, count(*) FROM {MAIN_TABLE} GROUP BY category"
+AI_ANSWER = "There are 50 categories with about the same number of items each."
+
+
+def generate_database(path: str, rows: int, tables: int) -> None:
+    """Write a database with one big table and ``tables - 1`` small ones referencing it."""
+    partial_path = f"{path}.partial"
+    if os.path.exists(partial_path):
+        os.remove(partial_path)
+    conn = sqlite3.connect(partial_path)
+    try:
+        conn.execute("PRAGMA journal_mode = OFF")
+        conn.execute("PRAGMA synchronous = OFF")
+        conn.execute(
+            f"CREATE TABLE {MAIN_TABLE} (id INTEGER PRIMARY KEY, name TEXT, category TEXT, price REAL, "
+            "quantity INTEGER, created TEXT, note TEXT)"
+        )
+        # Deterministic values, so every generated copy of a scale is the same
+        conn.execute(
+            f"WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < ?) "
+            f"INSERT INTO {MAIN_TABLE} (name, category, price, quantity, created, note) "
+            "SELECT 'item ' || i, 'category ' || (i % 50), (i * 7919 % 100000) / 100.0, i % 1000, "
+            "date('2020-01-01', '+' || (i % 2000) || ' days'), "
+            "CASE WHEN i % 3 THEN printf('note %d', i * 31 % 9973) END FROM n",
+            (rows,),
+        )
+        for number in range(1, tables):
+            conn.execute(
+                f"CREATE TABLE t_{number:03d} (id INTEGER PRIMARY KEY, label TEXT, value REAL, "
+                f"item_id INTEGER REFERENCES {MAIN_TABLE}(id))"
+            )
+            conn.execute(
+                f"WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < ?) "
+                f"INSERT INTO t_{number:03d} (label, value, item_id) "
+                "SELECT 'label ' || i, i / 10.0, (i * 7919 % ?) + 1 FROM n",
+                (min(rows, SIDE_TABLE_ROWS), rows),
+            )
+        conn.commit()
+    finally:
+        conn.close()
+    os.replace(partial_path, path)
+
+
+def database_for(scale: str) -> str:
+    """Return the scale's database, generating it on first use."""
+    rows, tables = SCALES[scale]
+    path = os.path.join(BENCH_DIR, f"bench-{scale}.db")
+    if not os.path.exists(path):
+        os.makedirs(BENCH_DIR, exist_ok=True)
+        print(f"Generating {scale} ({rows:,} rows, {tables} tables)…", file=sys.stderr)
+        started_at = time.perf_counter()
+        generate_database(path, rows, tables)
+        print(f"  done in {time.perf_counter() - started_at:.1f}s", file=sys.stderr)
+    return path
+
+
+def install_fake_ai(connections, cache_dir: str, column_stats=None):
+    """Make the app's AI service answer from a fake LLM, with its own empty SQL cache."""
+    from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+    import ai
+    from sql_cache import SqlCache
+
+    # One response each for generating the SQL, checking it and answering
+    llm = FakeListChatModel(responses=[AI_SQL, AI_SQL, AI_ANSWER])
+    service = ai.AiService(
+        connections=connections,
+        llm=llm,
+        sql_cache=SqlCache(os.path.join(cache_dir, f"sql_cache_{time.monotonic_ns()}.db")),
+        column_stats=column_stats,
+    )
+    ai.set_service(service)
+    return service
+
+
+async def wait_until(pilot, condition, timeout: float = WAIT_TIMEOUT) -> None:
+    """Let the app run until ``condition()`` holds."""
+    deadline = time.perf_counter() + timeout
+    while not condition():
+        if time.perf_counter() > deadline:
+            raise TimeoutError("benchmark scenario did not finish in time")
+        await pilot.pause(0.001)
+
+
+async def run_once(path: str, tables: int, cache_dir: str) -> dict:
+    """Start the app on a database, run every scenario once, and return their timings in ms."""
+    from connections import get_manager
+    from main import InfotronApp
+
+    timings = {}
+    started_at = time.perf_counter()
+    app = InfotronApp(database_path=path)
+    service = install_fake_ai(get_manager(path), cache_dir, app.column_stats)
+    async with app.run_test(size=BENCH_SIZE) as pilot:
+        await wait_until(pilot, lambda: app.startup_seconds is not None)
+        timings["first_paint"] = time.perf_counter() - started_at
+
+        # Every table listed with an exact row count
+        explorer = app.query_one("#sidebar")
+        await wait_until(pilot, lambda: len(explorer.table_nodes) == tables and all(
+            (count := explorer.row_counts.get(name)) is not None and count[1] for name in explorer.table_nodes
+        ))
+        timings["explorer_load"] = time.perf_counter() - started_at
+
+        # The AI stack builds in the background after first paint; let it finish so it
+        # doesn't compete with the scenarios below
+        await wait_until(pilot, lambda: service.ready)
+        timings["ai_build"] = service.build_seconds
+
+        # Opening the main table from the explorer, uncached
+        data_table = app.query_one("#main_table")
+        app.result_cache.clear()
+        data_table.current_display_query = None
+        started_at = time.perf_counter()
+        explorer.select_node(explorer.table_nodes[MAIN_TABLE])
+        await wait_until(pilot, lambda: data_table.current_display_query is not None)
+        await pilot.pause()
+        timings["table_open"] = time.perf_counter() - started_at
+
+        # Paging down through the grid, sliding the loaded window as it goes
+        data_table.focus()
+        started_at = time.perf_counter()
+        for _ in range(SCROLL_PAGES):
+            await pilot.press("pagedown")
+        await wait_until(pilot, lambda: not data_table.window_settling and not any(
+            worker.group == "window" and worker.is_running for worker in app.workers
+        ))
+        timings["scroll"] = time.perf_counter() - started_at
+
+        # An UPDATE from the editor, through to the grid showing it
+        editor = app.query_one("#current_editor")
+        editor.text = f"UPDATE {MAIN_TABLE} SET quantity = quantity WHERE id = 1"
+        started_at = time.perf_counter()
+        app.action_execute_query()
+        await wait_until(pilot, lambda: app.current_execution is None)
+        await pilot.pause()
+        timings["dml_refresh"] = time.perf_counter() - started_at
+
+        # A question answered through the fake LLM
+        await app.toggle_editor_mode()
+        app.query_one("#current_editor").text = AI_QUESTION
+        started_at = time.perf_counter()
+        app.action_execute_query()
+        await wait_until(pilot, lambda: app.current_execution is None)
+        await pilot.pause()
+        timings["ai_round_trip"] = time.perf_counter() - started_at
+    return {name: round(seconds * 1000, 2) for name, seconds in timings.items()}
+
+
+def run_benchmarks(scales, repeat: int) -> dict:
+    """Run every scale ``repeat`` times and return the results document."""
+    import textual
+
+    results = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "textual": textual.__version__,
+        "repeat": repeat,
+        "scales": {},
+    }
+    with tempfile.TemporaryDirectory() as cache_dir:
+        for scale in scales:
+            rows, tables = SCALES[scale]
+            path = database_for(scale)
+            runs = []
+            for run in range(repeat):
+                runs.append(asyncio.run(run_once(path, tables, cache_dir)))
+                print(f"{scale} run {run + 1}/{repeat}: {runs[-1]}", file=sys.stderr)
+            results["scales"][scale] = {
+                "rows": rows,
+                "tables": tables,
+                "metrics_ms": {name: statistics.median(run[name] for run in runs) for name in runs[0]},
+            }
+    return results
+
+
+def compare(results: dict, baseline: dict, threshold: float):
+    """Return ``(scale, metric, baseline ms, current ms, regressed)`` for every shared metric."""
+    rows = []
+    for scale, current in results["scales"].items():
+        previous = baseline.get("scales", {}).get(scale)
+        if previous is None:
+            continue
+        for metric, milliseconds in current["metrics_ms"].items():
+            before = previous["metrics_ms"].get(metric)
+            if before is None:
+                continue
+            regressed = milliseconds > before * (1 + threshold) and milliseconds - before > BENCH_NOISE_MS
+            rows.append((scale, metric, before, milliseconds, regressed))
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark Infotron headlessly on synthetic databases.")
+    parser.add_argument("--scales", default=",".join(DEFAULT_SCALES),
+                        help=f"comma-separated, from {', '.join(SCALES)} (default: %(default)s)")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per scale; the median is kept")
+    parser.add_argument("--output", help="write the results JSON here instead of stdout")
+    parser.add_argument("--baseline", help="results JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2, help="slowdown flagged as a regression (0.2: 20%%)")
+    args = parser.parse_args(argv)
+
+    scales = [scale.strip() for scale in args.scales.split(",") if scale.strip()]
+    unknown = [scale for scale in scales if scale not in SCALES]
+    if unknown:
+        parser.error(f"unknown scale(s): {', '.join(unknown)}")
+
+    results = run_benchmarks(scales, args.repeat)
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=2)
+    else:
+        print(json.dumps(results, indent=2))
+
+    if not args.baseline:
+        return 0
+    with open(args.baseline) as file:
+        baseline = json.load(file)
+    regressions = 0
+    print(f"\n{'scale':<10} {'metric':<15} {'baseline':>10} {'current':>10} {'change':>8}", file=sys.stderr)
+    for scale, metric, before, milliseconds, regressed in compare(results, baseline, args.threshold):
+        change = (milliseconds - before) / before if before else 0.0
+        flag = "  REGRESSION" if regressed else ""
+        print(f"{scale:<10} {metric:<15} {before:>10.1f} {milliseconds:>10.1f} {change:>+8.0%}{flag}", file=sys.stderr)
+        regressions += regressed
+    print(f"{regressions} regression{'s' if regressions != 1 else ''}", file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,133 @@
+import hashlib
+import re
+import sqlite3
+import threading
+
+# Tables Infotron keeps for itself (search indexes and their state), hidden from the user
+INTERNAL_TABLE_PREFIX = "_infotron"
+
+# The table written by an INSERT/REPLACE/UPDATE/DELETE statement
+WRITTEN_TABLE_PATTERN = re.compile(
+    r'^\s*(?:(?:INSERT|REPLACE)(?:\s+OR\s+\w+)?\s+INTO|UPDATE(?:\s+OR\s+\w+)?|DELETE\s+FROM)\s+'
+    r'(?:"([^"]+)"|(\w+))',
+    re.IGNORECASE,
+)
+
+
+def written_table(statement: str):
+    """Return the table a DML statement writes to, or None if it can't be told."""
+    match = WRITTEN_TABLE_PATTERN.match(statement)
+    if match is None:
+        return None
+    return match.group(1) or match.group(2)
+
+
+def is_internal(table_name: str) -> bool:
+    return table_name.startswith(INTERNAL_TABLE_PREFIX)
+
+
+def schema_fingerprint(conn: sqlite3.Connection) -> str:
+    """Hash everything in sqlite_master, so any schema change gives a new fingerprint."""
+    rows = conn.execute("SELECT type, name, tbl_name, sql FROM sqlite_master ORDER BY type, name").fetchall()
+    return hashlib.sha256(repr(rows).encode()).hexdigest()
+
+
+class SchemaSnapshot:
+    """The tables in sqlite_master as of one ``PRAGMA schema_version``."""
+
+    def __init__(self, schema_version: int, tables: dict):
+        self.schema_version = schema_version
+        self.tables = tables  # Table name -> CREATE statement
+
+    @staticmethod
+    def read_version(conn: sqlite3.Connection) -> int:
+        return conn.execute("PRAGMA schema_version").fetchone()[0]
+
+    @classmethod
+    def load(cls, conn: sqlite3.Connection) -> "SchemaSnapshot":
+        # Read the version first: a change in between is then caught by the next check
+        schema_version = cls.read_version(conn)
+        rows = conn.execute("SELECT name, sql FROM sqlite_master WHERE type='table' ORDER BY name;").fetchall()
+        return cls(schema_version, {name: sql for name, sql in rows if not is_internal(name)})
+
+    def diff(self, newer: "SchemaSnapshot"):
+        """Return the (added, dropped, altered) table names between two snapshots."""
+        added = [name for name in newer.tables if name not in self.tables]
+        dropped = [name for name in self.tables if name not in newer.tables]
+        altered = [
+            name for name, sql in newer.tables.items()
+            if name in self.tables and self.tables[name] != sql
+        ]
+        return added, dropped, altered
+
+
+class RowCountCache:
+    """Row counts per table, kept for as long as the data is unchanged.
+
+    Counts are either estimates (from ``sqlite_stat1`` or ``max(rowid)``) or
+    exact ``COUNT(*)`` results. The whole cache is dropped as soon as
+    ``PRAGMA data_version`` reports a commit.
+    """
+
+    def __init__(self, connections):
+        self.connections = connections
+        self.data_version = None
+        self.counts = {}  # Table name -> (row count, exact)
+        self.lock = threading.Lock()
+
+    def validate(self) -> int:
+        """Drop every count if the data has changed, and return the current version."""
+        version = self.connections.data_version()
+        with self.lock:
+            if version != self.data_version:
+                self.counts.clear()
+                self.data_version = version
+        return version
+
+    def get(self, table_name: str):
+        """Return ``(count, exact)`` for a table, or None if nothing is cached."""
+        with self.lock:
+            return self.counts.get(table_name)
+
+    def put(self, table_name: str, count: int, exact: bool, version: int) -> None:
+        """Cache a count computed while the data was at ``version``."""
+        with self.lock:
+            if version != self.data_version:
+                return  # Computed against data that has since changed
+            cached = self.counts.get(table_name)
+            if cached is None or exact or not cached[1]:
+                self.counts[table_name] = (count, exact)
+
+    def invalidate(self, table_names) -> int:
+        """Drop the counts of tables we know were written, keeping the others.
+
+        Used after our own DML, where the written table is known, so one INSERT
+        doesn't force a recount of every table. Returns the current version.
+        """
+        version = self.connections.data_version()
+        with self.lock:
+            for table_name in table_names:
+                self.counts.pop(table_name, None)
+            self.data_version = version
+        return version
+
+    @staticmethod
+    def estimate(conn: sqlite3.Connection, table_name: str):
+        """Return a cheap row count estimate, or None if there is no cheap way."""
+        try:
+            # ANALYZE leaves the row count as the first number of each stat
+            row = conn.execute("SELECT stat FROM sqlite_stat1 WHERE tbl = ? LIMIT 1", (table_name,)).fetchone()
+            if row and row[0]:
+                return int(row[0].split()[0])
+        except (sqlite3.Error, ValueError):
+            pass  # Not analyzed yet
+        try:
+            # An index seek on the rowid; exact unless rows have been deleted
+            row = conn.execute(f'SELECT max(rowid) FROM "{table_name}"').fetchone()
+            return row[0] or 0
+        except sqlite3.Error:
+            return None  # WITHOUT ROWID table or a view
+
+    @staticmethod
+    def exact(conn: sqlite3.Connection, table_name: str) -> int:
+        return conn.execute(f'SELECT COUNT(*) FROM "{table_name}"').fetchone()[0]
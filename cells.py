@@ -0,0 +1,167 @@
+import os
+from functools import lru_cache
+
+from rich.text import Text
+
+# TEXT longer than this is cut down in SQL; the full value loads when its cell is focused
+PREVIEW_CHARS = int(os.getenv("INFOTRON_PREVIEW_CHARS", "80"))
+BLOB_PREVIEW_BYTES = 8  # Leading bytes of a BLOB shown in hex next to its size
+DETAIL_CHARS = 64 * 1024  # Most of a TEXT value loaded into the value panel
+DETAIL_BYTES = 4 * 1024  # Most of a BLOB value hex-dumped into the value panel
+HEX_DUMP_WIDTH = 16  # Bytes per hex dump line
+
+
+def affinity(declared_type: str) -> str:
+    """The column affinity SQLite gives a declared type; see https://www.sqlite.org/datatype3.html"""
+    declared_type = (declared_type or "").upper()
+    if "INT" in declared_type:
+        return "INTEGER"
+    if any(name in declared_type for name in ("CHAR", "CLOB", "TEXT")):
+        return "TEXT"
+    if not declared_type or "BLOB" in declared_type:
+        return "BLOB"
+    if any(name in declared_type for name in ("REAL", "FLOA", "DOUB")):
+        return "REAL"
+    return "NUMERIC"
+
+
+def is_wide(declared_type) -> bool:
+    """Whether a column can hold long TEXT or BLOBs, so is previewed in SQL.
+
+    Columns of a query's result have no known declared type (None) and are
+    always previewed.
+    """
+    return declared_type is None or affinity(declared_type) in ("TEXT", "BLOB")
+
+
+def preview_expressions(column: str):
+    """SQL for a column's preview and, when the preview isn't the whole value, its full length.
+
+    ``column`` is a quoted identifier. BLOBs are cut to a few leading bytes
+    and TEXT to PREVIEW_CHARS characters; other values come back as they are.
+    """
+    return (
+        f"CASE typeof({column}) WHEN 'blob' THEN substr({column}, 1, {BLOB_PREVIEW_BYTES}) "
+        f"WHEN 'text' THEN substr({column}, 1, {PREVIEW_CHARS}) ELSE {column} END",
+        f"CASE WHEN typeof({column}) = 'blob' OR length({column}) > {PREVIEW_CHARS} THEN length({column}) END",
+    )
+
+
+def detail_expressions(column: str):
+    """SQL for as much of a value as the value panel shows, and its full length."""
+    return (
+        f"CASE typeof({column}) WHEN 'blob' THEN substr({column}, 1, {DETAIL_BYTES}) "
+        f"WHEN 'text' THEN substr({column}, 1, {DETAIL_CHARS}) ELSE {column} END",
+        f"length({column})",
+    )
+
+
+class Preview:
+    """The start of a TEXT or BLOB value that was cut in SQL, and its full length."""
+
+    __slots__ = ("head", "length")
+
+    def __init__(self, head, length: int):
+        self.head = head
+        self.length = length
+
+
+def has_more(value) -> bool:
+    """Whether a cell shows less than the whole value, so the value panel has more to show."""
+    if isinstance(value, (Preview, bytes)):
+        return True
+    return isinstance(value, str) and (len(value) > PREVIEW_CHARS or "\n" in value)
+
+
+def format_size(size: int) -> str:
+    for unit in ("bytes", "KB", "MB", "GB"):
+        if size < 1024 or unit == "GB":
+            break
+        size /= 1024
+    return f"{size:,} {unit}" if unit == "bytes" else f"{size:.1f} {unit}"
+
+
+def blob_summary(head: bytes, length: int) -> Text:
+    prefix = head[:BLOB_PREVIEW_BYTES].hex()
+    return Text(f"BLOB {format_size(length)}" + (f" {prefix}…" if prefix else ""), style="italic")
+
+
+@lru_cache(maxsize=None)
+def formatter_for(declared_type):
+    """The function turning a column's values into grid text, picked by its declared type.
+
+    Numeric columns are right-aligned; a result column with no declared type
+    (None) is aligned by each value's own type.
+    """
+    kind = affinity(declared_type) if declared_type is not None else None
+    if kind is None:
+        justify = None
+    elif kind in ("INTEGER", "REAL") or (kind == "NUMERIC" and "DATE" not in declared_type.upper()
+                                         and "TIME" not in declared_type.upper()):
+        justify = "right"
+    else:
+        justify = "left"
+
+    def format_value(value) -> Text:
+        align = justify or ("right" if isinstance(value, (int, float)) else "left")
+        if value is None:
+            return Text("NULL", style="dim", justify=align)
+        if isinstance(value, Preview):
+            if isinstance(value.head, bytes):
+                return blob_summary(value.head, value.length)
+            return Text(value.head.replace("\n", "↵") + "…", justify=align)
+        if isinstance(value, bytes):
+            return blob_summary(value, len(value))
+        if isinstance(value, float):
+            return Text(repr(value), justify=align)
+        text = str(value)
+        if len(text) > PREVIEW_CHARS:
+            return Text(text[:PREVIEW_CHARS].replace("\n", "↵") + "…", justify=align)
+        return Text(text.replace("\n", "↵"), justify=align)
+
+    return format_value
+
+
+class Cell:
+    """A grid cell: its value as fetched, rendered by its column's formatter when drawn."""
+
+    __slots__ = ("value", "formatter")
+
+    def __init__(self, value, formatter):
+        self.value = value
+        self.formatter = formatter
+
+    def __rich__(self) -> Text:
+        return self.formatter(self.value)
+
+
+def hex_dump(data: bytes) -> str:
+    lines = []
+    for offset in range(0, len(data), HEX_DUMP_WIDTH):
+        chunk = data[offset:offset + HEX_DUMP_WIDTH]
+        printable = "".join(chr(byte) if 32 <= byte < 127 else "." for byte in chunk)
+        lines.append(f"{offset:08x}  {chunk.hex(' '):<{HEX_DUMP_WIDTH * 3}} {printable}")
+    return "\n".join(lines)
+
+
+def describe_value(value, length: int = None) -> Text:
+    """The value panel's view of a value: TEXT in full, BLOBs as a hex dump.
+
+    ``length`` is the full length when ``value`` is only the start of it.
+    """
+    if isinstance(value, bytes):
+        length = len(value) if length is None else length
+        text = Text(f"BLOB, {format_size(length)}\n", style="bold")
+        text.append(hex_dump(value[:DETAIL_BYTES]))
+        if length > min(len(value), DETAIL_BYTES):
+            text.append(f"\n… {format_size(length - min(len(value), DETAIL_BYTES))} more", style="dim")
+        return text
+    if value is None:
+        return Text("NULL", style="dim")
+    if not isinstance(value, str):
+        return Text(repr(value) if isinstance(value, float) else str(value))
+    length = len(value) if length is None else length
+    text = Text(value[:DETAIL_CHARS])
+    if length > len(text.plain):
+        text.append(f"\n… {length - len(text.plain):,} more characters", style="dim")
+    return text
@@ -0,0 +1,365 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from cells import format_size
+from filtering import quote_identifier
+from tracing import tracer
+
+# Where column statistics are kept between sessions; override with INFOTRON_STATS_CACHE
+STATS_CACHE_PATH = os.getenv(
+    "INFOTRON_STATS_CACHE",
+    os.path.join(os.path.expanduser("~"), ".cache", "infotron", "column_stats.db"),
+)
+# Tables with more rows than this are profiled from a sample of about this many rows
+STATS_SAMPLE_ROWS = int(os.getenv("INFOTRON_STATS_SAMPLE_ROWS", "100000"))
+STATS_SAMPLE_CHUNKS = 20  # Rowid ranges a sample is read from, spread over the table
+STATS_TOP_VALUES = 5  # Most common values kept per column
+STATS_HISTOGRAM_BUCKETS = 8  # Equal-width buckets between a column's numeric min and max
+STATS_VALUE_CHARS = 24  # Text values are cut to this in stats
+STATS_ATTEMPTS = 3  # Profiles tried while the table keeps changing; the last one is returned uncached
+
+SPARK_CHARS = "▁▂▃▄▅▆▇█"
+NUMERIC = "typeof({column}) IN ('integer', 'real')"
+
+
+def preview_value(value):
+    """A value as kept in stats: numbers as they are, text cut short, BLOBs as their size."""
+    if isinstance(value, bytes):
+        return f"BLOB {format_size(len(value))}"
+    if isinstance(value, str) and len(value) > STATS_VALUE_CHARS:
+        return value[:STATS_VALUE_CHARS] + "…"
+    return value
+
+
+def show_value(value) -> str:
+    if value is None:
+        return "NULL"
+    if isinstance(value, float):
+        return f"{value:g}"
+    if isinstance(value, str) and not value.startswith("BLOB "):
+        return repr(value)
+    return str(value)
+
+
+def sparkline(counts) -> str:
+    peak = max(counts) or 1
+    return "".join(SPARK_CHARS[min(count * len(SPARK_CHARS) // (peak + 1), len(SPARK_CHARS) - 1)]
+                   if count else " " for count in counts)
+
+
+def file_stamp(path: str) -> str:
+    """Size and modification time of the database file and its WAL, which move on every commit.
+
+    ``PRAGMA data_version`` only means something within one connection, so
+    the sidecar cache checks entries from earlier sessions against this. An
+    empty WAL's time is left out, since opening the database recreates it.
+    """
+    parts = []
+    for file_path in (path, f"{path}-wal"):
+        try:
+            stat = os.stat(file_path)
+        except OSError:
+            parts.append("0:0")
+            continue
+        parts.append(f"{stat.st_size}:{stat.st_mtime_ns if stat.st_size else 0}")
+    return "/".join(parts)
+
+
+class ColumnStats:
+    """What one column holds: NULLs, distinct values, range, most common values and a histogram."""
+
+    def __init__(self, name: str, null_fraction: float, distinct: int, minimum=None, maximum=None,
+                 top=None, histogram=None, numeric_range=None):
+        self.name = name
+        self.null_fraction = null_fraction
+        self.distinct = distinct  # Within the rows profiled
+        self.minimum = minimum
+        self.maximum = maximum
+        self.top = top or []  # [(value, fraction of rows)], most common first
+        self.histogram = histogram  # Row counts per bucket over numeric_range, or None
+        self.numeric_range = numeric_range  # (low, high) of the numeric values
+
+    def to_dict(self) -> dict:
+        return dict(self.__dict__)
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "ColumnStats":
+        stats = cls(**data)
+        stats.top = [tuple(item) for item in stats.top]
+        return stats
+
+    def summary_lines(self, sampled: bool = False):
+        """The stats as short lines, for the explorer."""
+        approximate = "~" if sampled else ""
+        lines = [f"nulls {approximate}{self.null_fraction:.1%} · distinct {approximate}{self.distinct:,}"]
+        if self.minimum is not None:
+            lines.append(f"min {show_value(self.minimum)} · max {show_value(self.maximum)}")
+        if self.top:
+            lines.append("top " + ", ".join(f"{show_value(value)} {fraction:.0%}" for value, fraction in self.top))
+        if self.histogram:
+            low, high = self.numeric_range
+            lines.append(f"{sparkline(self.histogram)} {show_value(low)} … {show_value(high)}")
+        return lines
+
+    def describe(self) -> str:
+        """The stats as one line, for an AI prompt."""
+        parts = [f"{self.null_fraction:.0%} null", f"{self.distinct:,} distinct"]
+        if self.minimum is not None:
+            parts.append(f"range {show_value(self.minimum)} to {show_value(self.maximum)}")
+        if self.top:
+            parts.append("most common " + ", ".join(show_value(value) for value, _ in self.top))
+        return f"{self.name}: {', '.join(parts)}"
+
+
+class TableStats:
+    """Column stats for one table, and how many rows they were drawn from."""
+
+    def __init__(self, table_name: str, rows: int, sampled: bool, columns, seconds: float = 0.0):
+        self.table_name = table_name
+        self.rows = rows  # Rows profiled
+        self.sampled = sampled
+        self.columns = columns  # [ColumnStats] in table order
+        self.seconds = seconds  # How long profiling took
+
+    def column(self, name: str):
+        return next((column for column in self.columns if column.name == name), None)
+
+    def to_json(self) -> str:
+        return json.dumps({
+            "table_name": self.table_name, "rows": self.rows, "sampled": self.sampled, "seconds": self.seconds,
+            "columns": [column.to_dict() for column in self.columns],
+        })
+
+    @classmethod
+    def from_json(cls, text: str) -> "TableStats":
+        data = json.loads(text)
+        data["columns"] = [ColumnStats.from_dict(column) for column in data["columns"]]
+        return cls(**data)
+
+    def describe(self) -> str:
+        """A comment block for an AI prompt, like the sample rows SQLDatabase can add."""
+        source = f"a sample of {self.rows:,} rows" if self.sampled else f"all {self.rows:,} rows"
+        lines = [f"Column statistics for {self.table_name}, from {source}:"]
+        lines.extend(column.describe() for column in self.columns)
+        return "/*\n" + "\n".join(lines) + "\n*/"
+
+
+def sample_source(conn: sqlite3.Connection, table_name: str, sample_rows: int = STATS_SAMPLE_ROWS):
+    """SQL for the rows to profile, and whether they are a sample.
+
+    A big table is sampled as STATS_SAMPLE_CHUNKS rowid ranges spread evenly
+    over it, so the sample costs a few index seeks instead of a full scan.
+    """
+    table = quote_identifier(table_name)
+    try:
+        low, high = conn.execute(f"SELECT min(rowid), max(rowid) FROM {table}").fetchone()
+    except sqlite3.Error:
+        # WITHOUT ROWID table: the first rows will have to do
+        return f"(SELECT * FROM {table} LIMIT {sample_rows})", None
+    if high is None or high - low + 1 <= sample_rows:
+        return table, False
+    span = high - low + 1
+    chunk = sample_rows // STATS_SAMPLE_CHUNKS
+    ranges = [low + index * span // STATS_SAMPLE_CHUNKS for index in range(STATS_SAMPLE_CHUNKS)]
+    return "(" + " UNION ALL ".join(
+        f"SELECT * FROM {table} WHERE rowid BETWEEN {start} AND {start + chunk - 1}" for start in ranges
+    ) + ")", True
+
+
+def profile_table(conn: sqlite3.Connection, table_name: str, sample_rows: int = STATS_SAMPLE_ROWS) -> TableStats:
+    """Profile every column of a table, or of a sample of it.
+
+    One aggregate scan gets the NULL and distinct counts and ranges of all
+    columns together. Histograms of numeric columns and the most common
+    values take a GROUP BY each, skipped for columns where no value repeats.
+    """
+    started_at = time.perf_counter()
+    with tracer.span("stats.profile") as span:
+        source, sampled = sample_source(conn, table_name, sample_rows)
+        names = [row[1] for row in conn.execute(f"PRAGMA table_info({quote_identifier(table_name)})")]
+        expressions = ["count(*)"]
+        for name in names:
+            column = quote_identifier(name)
+            numeric = NUMERIC.format(column=column)
+            expressions += [
+                f"count({column})", f"count(DISTINCT {column})", f"min({column})", f"max({column})",
+                f"min(CASE WHEN {numeric} THEN {column} END)", f"max(CASE WHEN {numeric} THEN {column} END)",
+            ]
+        row = conn.execute(f"SELECT {', '.join(expressions)} FROM {source}").fetchone()
+        rows = row[0]
+        if sampled is None:
+            sampled = rows >= sample_rows
+
+        columns, non_nulls = [], []
+        for index, name in enumerate(names):
+            non_null, distinct, minimum, maximum, low, high = row[1 + 6 * index:7 + 6 * index]
+            columns.append(ColumnStats(
+                name, (rows - non_null) / rows if rows else 0.0, distinct,
+                preview_value(minimum), preview_value(maximum),
+                numeric_range=(low, high) if low is not None and low < high else None,
+            ))
+            non_nulls.append(non_null)
+
+        for column in columns:
+            if column.numeric_range is None:
+                continue
+            quoted = quote_identifier(column.name)
+            low, high = column.numeric_range
+            # A GROUP BY per column beats one scan summing every bucket of every column
+            buckets = conn.execute(
+                f"SELECT min(CAST(({quoted} - ?) * {STATS_HISTOGRAM_BUCKETS}.0 / (? - ?) AS INTEGER), "
+                f"{STATS_HISTOGRAM_BUCKETS - 1}), count(*) FROM {source} "
+                f"WHERE {NUMERIC.format(column=quoted)} GROUP BY 1",
+                (low, high, low),
+            ).fetchall()
+            column.histogram = [0] * STATS_HISTOGRAM_BUCKETS
+            for bucket, count in buckets:
+                column.histogram[bucket] = count
+
+        for column, non_null in zip(columns, non_nulls):
+            if not non_null or column.distinct >= non_null:
+                continue  # Nothing, or nothing repeats
+            quoted = quote_identifier(column.name)
+            top = conn.execute(
+                f"SELECT {quoted}, count(*) FROM {source} WHERE {quoted} IS NOT NULL "
+                f"GROUP BY {quoted} HAVING count(*) > 1 ORDER BY count(*) DESC LIMIT {STATS_TOP_VALUES}"
+            ).fetchall()
+            column.top = [(preview_value(value), count / rows) for value, count in top]
+        span.set(rows=rows)
+    return TableStats(table_name, rows, sampled, columns, time.perf_counter() - started_at)
+
+
+class ColumnStatsCache:
+    """Column stats per table, kept in memory and in a sidecar database.
+
+    In memory, stats are dropped as soon as ``PRAGMA data_version`` reports a
+    commit, like row counts. The sidecar keeps them across sessions, keyed
+    by the database file, the table's CREATE statement and ``file_stamp``,
+    so they are reused until the data or the table changes.
+    """
+
+    def __init__(self, connections, path: str = STATS_CACHE_PATH, sample_rows: int = STATS_SAMPLE_ROWS):
+        self.connections = connections
+        self.path = path
+        self.sample_rows = sample_rows
+        self.database = os.path.abspath(connections.database_path)
+        self.data_version = None
+        self.stamp = None  # file_stamp() as of data_version
+        self.stats = {}  # Table name -> TableStats
+        self.lock = threading.Lock()
+        self.sidecar_lock = threading.Lock()
+        self.initialized = False
+
+    def connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=5)
+        if not self.initialized:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS column_stats (
+                    database TEXT NOT NULL,
+                    table_name TEXT NOT NULL,
+                    table_sql TEXT NOT NULL,
+                    stamp TEXT NOT NULL,
+                    stats TEXT NOT NULL,
+                    PRIMARY KEY (database, table_name)
+                )
+            """)
+            self.initialized = True
+        return conn
+
+    def validate(self) -> int:
+        """Drop every table's stats if the data has changed, and return the current version."""
+        version = self.connections.data_version()
+        with self.lock:
+            if version != self.data_version:
+                self.stats.clear()
+                self.data_version = version
+                self.stamp = file_stamp(self.database)
+            return version
+
+    def table_sql(self, table_name: str):
+        with self.connections.reader() as conn:
+            row = conn.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?",
+                               (table_name,)).fetchone()
+        return row[0] if row else None
+
+    def get(self, table_name: str):
+        """Return a table's stats if they are still current, from memory or the sidecar; else None."""
+        self.validate()
+        with self.lock:
+            stats = self.stats.get(table_name)
+            stamp = self.stamp
+        if stats is not None or not os.path.exists(self.path):
+            return stats
+        table_sql = self.table_sql(table_name)
+        with self.sidecar_lock:
+            conn = self.connect()
+            try:
+                row = conn.execute(
+                    "SELECT stats FROM column_stats WHERE database = ? AND table_name = ? AND table_sql = ? AND stamp = ?",
+                    (self.database, table_name, table_sql, stamp),
+                ).fetchone()
+            finally:
+                conn.close()
+        if row is None:
+            return None
+        stats = TableStats.from_json(row[0])
+        with self.lock:
+            self.stats[table_name] = stats
+        return stats
+
+    def put(self, stats: TableStats, version: int) -> bool:
+        """Keep stats computed while the data was at ``version``; False if it has changed since."""
+        if self.validate() != version:
+            return False
+        with self.lock:
+            self.stats[stats.table_name] = stats
+            stamp = self.stamp
+        table_sql = self.table_sql(stats.table_name)
+        with self.sidecar_lock:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = self.connect()
+            try:
+                conn.execute(
+                    "INSERT OR REPLACE INTO column_stats (database, table_name, table_sql, stamp, stats) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (self.database, stats.table_name, table_sql or "", stamp, stats.to_json()),
+                )
+                conn.commit()
+            finally:
+                conn.close()
+        return True
+
+    def profile(self, table_name: str, execution=None) -> TableStats:
+        """Return a table's stats, profiling it now if nothing current is cached.
+
+        A table written to while it is profiled is profiled again, up to
+        STATS_ATTEMPTS times; then the last profile is returned without being
+        cached. Returns None if the execution is cancelled first.
+        """
+        stats = self.get(table_name)
+        if stats is not None:
+            return stats
+        for _ in range(STATS_ATTEMPTS):
+            if execution is not None and execution.cancelled:
+                return None
+            version = self.validate()
+            with self.connections.reader(execution) as conn:
+                stats = profile_table(conn, table_name, self.sample_rows)
+            if self.put(stats, version):
+                break
+        return stats
+
+    def describe(self, table_names) -> str:
+        """Stats of the tables already profiled, as prompt comments; tables without any are skipped."""
+        blocks = []
+        for table_name in table_names:
+            try:
+                stats = self.get(table_name)
+            except (sqlite3.Error, OSError):
+                stats = None
+            if stats is not None:
+                blocks.append(stats.describe())
+        return "\n\n".join(blocks)
@@ -0,0 +1,334 @@
+import os
+import queue
+import re
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from snapshot import (
+    SNAPSHOT_ATTEMPTS, RecordingConnection, TracedRecordingConnection, copy_database, remove_snapshot, replay,
+    snapshot_path,
+)
+from tracing import TracedConnection, tracer
+
+# The database Infotron manages; override with the INFOTRON_DATABASE environment variable
+DATABASE_PATH = os.getenv("INFOTRON_DATABASE", "database/database.db")
+
+# Pragmas applied to every connection the manager opens. The journal mode is
+# left as the file has it: WAL is kept once set, but switching a file to it
+# is an opt-in, e.g. INFOTRON_PRAGMAS="journal_mode=WAL"
+DEFAULT_PRAGMAS = {
+    "mmap_size": 256 * 1024 * 1024,  # Bytes of the file to memory-map
+    "cache_size": -64 * 1024,  # Negative means KiB, so 64 MB of page cache
+    "temp_store": "MEMORY",  # Keep sorts and temp B-trees off the disk
+    "busy_timeout": 5000,  # Milliseconds to wait for a lock before failing
+}
+
+# Pragmas that change the file rather than the connection, so only the writer sets them
+WRITER_PRAGMAS = {"journal_mode"}
+PRAGMA_PATTERN = re.compile(r"\s*(\w+)\s*=\s*([\w.+-]+)\s*")
+
+READER_COUNT = 4  # Read connections kept in the pool
+STATEMENT_CACHE_SIZE = 256  # Prepared statements cached per connection
+
+
+def parse_pragmas(text: str) -> dict:
+    """Parse a pragma profile given as "name=value,name=value"."""
+    pragmas = {}
+    for part in text.split(","):
+        if not part.strip():
+            continue
+        match = PRAGMA_PATTERN.fullmatch(part)
+        if match is None:
+            raise ValueError(f"Expected name=value in INFOTRON_PRAGMAS, got {part.strip()!r}")
+        pragmas[match.group(1).lower()] = match.group(2)
+    return pragmas
+
+
+# Pragmas added to or overriding the defaults, e.g. INFOTRON_PRAGMAS="journal_mode=WAL,cache_size=-131072"
+CONFIGURED_PRAGMAS = parse_pragmas(os.getenv("INFOTRON_PRAGMAS", ""))
+
+
+class ConnectionManager:
+    """Owns the connections to one SQLite database.
+
+    There is a single writer connection, serialized by a lock, and a small pool
+    of read-only connections that are handed out one caller at a time. Every
+    connection gets the pragma profile, DEFAULT_PRAGMAS with INFOTRON_PRAGMAS
+    on top, and a prepared statement cache, and
+    lives for as long as the manager does instead of being opened per query.
+
+    In snapshot mode reads are served from a copy of the database on tmpfs,
+    see ``sync_snapshot()``. Writes still go to the file, and once committed
+    are replayed into the snapshot, so it never lags behind our own writes.
+    """
+
+    def __init__(self, database_path: str = DATABASE_PATH, pragmas: dict = None,
+                 reader_count: int = READER_COUNT, cached_statements: int = STATEMENT_CACHE_SIZE):
+        self.database_path = database_path
+        self.pragmas = {**DEFAULT_PRAGMAS, **(pragmas or {})}
+        self.reader_count = reader_count
+        self.cached_statements = cached_statements
+        self.readers = queue.LifoQueue()
+        self.opened_readers = 0
+        self.reader_paths = {}  # Reader -> the file it reads, so readers of a replaced file are closed
+        self.reader_lock = threading.Lock()
+        self.writer_connection = None
+        self.writer_lock = threading.RLock()
+        self.monitor_connection = None  # Private connection for change detection
+        self.monitor_lock = threading.Lock()
+        self.read_path = database_path  # The snapshot in snapshot mode, else the file itself
+        self.read_generation = 0  # Bumped whenever read_path changes, to keep data_version moving
+        self.snapshot_path = None
+        self.snapshot_synced_at = None  # time.time() of the copy the snapshot was made from
+        self.snapshot_writer = None  # Replays our writes into the snapshot
+        self.snapshot_error = None  # Why the last snapshot had to be dropped, if it did
+
+    @property
+    def exists(self) -> bool:
+        return os.path.exists(self.database_path)
+
+    def connect(self, read_only: bool = False, path: str = None, factory=None) -> sqlite3.Connection:
+        """Open a new connection with the pragma profile applied."""
+        if factory is None:
+            factory = TracedConnection if tracer.enabled else sqlite3.Connection  # Spans for every execute/fetch
+        conn = sqlite3.connect(
+            path or self.database_path,
+            check_same_thread=False,  # Pooled connections move between worker threads
+            cached_statements=self.cached_statements,
+            factory=factory,
+        )
+        for name, value in self.pragmas.items():
+            if not (read_only and name in WRITER_PRAGMAS):
+                conn.execute(f"PRAGMA {name} = {value}")
+        if read_only:
+            conn.execute("PRAGMA query_only = 1")
+        return conn
+
+    @contextmanager
+    def reader(self, execution=None):
+        """Borrow a read-only connection from the pool."""
+        conn = self.checkout_reader()
+        if execution is not None:
+            execution.attach(conn)
+        try:
+            yield conn
+        finally:
+            if execution is not None:
+                execution.detach(conn)
+            if conn.in_transaction:
+                conn.rollback()
+            if self.reader_paths.get(conn) == self.read_path:
+                self.readers.put(conn)
+            else:
+                self.discard_reader(conn)
+
+    def checkout_reader(self) -> sqlite3.Connection:
+        while True:
+            try:
+                conn = self.readers.get_nowait()
+            except queue.Empty:
+                with self.reader_lock:
+                    if self.opened_readers < self.reader_count:
+                        self.opened_readers += 1
+                        path = self.read_path
+                        conn = self.connect(read_only=True, path=path)
+                        self.reader_paths[conn] = path
+                        return conn
+                # Pool exhausted: wait for another caller to hand one back
+                conn = self.readers.get()
+            if self.reader_paths.get(conn) == self.read_path:
+                return conn
+            self.discard_reader(conn)  # Reads have moved to another file since it was pooled
+
+    def discard_reader(self, conn: sqlite3.Connection) -> None:
+        conn.close()
+        with self.reader_lock:
+            self.reader_paths.pop(conn, None)
+            self.opened_readers -= 1
+
+    @contextmanager
+    def writer(self, execution=None):
+        """Hold the writer connection; commits on success and rolls back on error."""
+        with self.writer_lock:
+            if self.writer_connection is None:
+                self.writer_connection = self.connect(
+                    factory=TracedRecordingConnection if tracer.enabled else RecordingConnection
+                )
+            conn = self.writer_connection
+            # Log what commits, to replay into the snapshot; a nested writer() leaves it to the outer one
+            recording = self.snapshot_path is not None and not conn.recording
+            if recording:
+                conn.start_recording()
+            if execution is not None:
+                execution.attach(conn)
+            try:
+                yield conn
+                if conn.in_transaction:
+                    conn.commit()
+            except BaseException:
+                if conn.in_transaction:
+                    conn.rollback()
+                raise
+            finally:
+                if execution is not None:
+                    execution.detach(conn)
+                if recording:
+                    self.replay_into_snapshot(conn.stop_recording())
+
+    def replay_into_snapshot(self, writes) -> None:
+        """Apply committed writes to the snapshot as well, or drop it if they can't be.
+
+        Called with the writer lock held. ``writes`` is None when they can't be
+        replayed faithfully; reads then go back to the file until a resync.
+        """
+        if writes is not None and not writes:
+            return
+        try:
+            if writes is None:
+                raise sqlite3.DatabaseError("too much was written, or something that won't replay the same")
+            if self.snapshot_writer is None:
+                self.snapshot_writer = self.connect(path=self.snapshot_path)
+            with tracer.span("snapshot.replay", statements=len(writes)):
+                replay(self.snapshot_writer, writes)
+        except sqlite3.Error as e:
+            self.snapshot_error = str(e)
+            self.drop_snapshot()
+
+    def sync_snapshot(self, progress=None, execution=None) -> None:
+        """Copy the database into a new snapshot and serve reads from it.
+
+        The copy runs with the backup API without holding the writer. If the
+        file changed while it ran, it is copied again, the last time with the
+        writer held; otherwise the snapshot is swapped in under the writer
+        lock, so no write of ours can fall between the copy and its replay.
+        ``progress`` gets the fraction copied; a cancelled execution stops it.
+        """
+        path = snapshot_path(self.database_path)
+        source = sqlite3.connect(self.database_path, check_same_thread=False)
+        try:
+            with tracer.span("snapshot.sync") as span:
+                for attempt in range(1, SNAPSHOT_ATTEMPTS + 1):
+                    if attempt == SNAPSHOT_ATTEMPTS:
+                        with self.writer_lock:
+                            copy_database(source, path, progress, execution)
+                            self.use_snapshot(path)
+                        break
+                    version = source.execute("PRAGMA data_version").fetchone()[0]
+                    copy_database(source, path, progress, execution)
+                    with self.writer_lock:
+                        if source.execute("PRAGMA data_version").fetchone()[0] == version:
+                            self.use_snapshot(path)
+                            break
+                span.set(attempts=attempt, bytes=os.path.getsize(path))
+        except BaseException:
+            remove_snapshot(path)
+            raise
+        finally:
+            source.close()
+
+    def use_snapshot(self, path: str) -> None:
+        """Point reads at a freshly copied snapshot, removing the one it replaces."""
+        with self.writer_lock:
+            previous = self.snapshot_path
+            self.snapshot_path = path
+            self.snapshot_synced_at = time.time()
+            self.snapshot_error = None
+            self.switch_reads(path)
+        if previous is not None:
+            remove_snapshot(previous)
+
+    def drop_snapshot(self) -> None:
+        """Serve reads from the file again and remove the snapshot."""
+        with self.writer_lock:
+            previous = self.snapshot_path
+            self.snapshot_path = None
+            self.snapshot_synced_at = None
+            self.switch_reads(self.database_path)
+        if previous is not None:
+            remove_snapshot(previous)
+
+    def switch_reads(self, path: str) -> None:
+        # Pooled readers of the old file are closed as they are next handed out or back
+        if self.snapshot_writer is not None:
+            self.snapshot_writer.close()
+            self.snapshot_writer = None
+        with self.monitor_lock:
+            self.read_path = path
+            self.read_generation += 1
+            if self.monitor_connection is not None:
+                self.monitor_connection.close()
+                self.monitor_connection = None
+
+    @property
+    def snapshot_age(self):
+        """Seconds since the snapshot was copied from the file, or None outside snapshot mode."""
+        synced_at = self.snapshot_synced_at
+        return None if synced_at is None else time.time() - synced_at
+
+    def monitor(self) -> sqlite3.Connection:
+        # Called with monitor_lock held
+        if self.monitor_connection is None:
+            self.monitor_connection = self.connect(read_only=True, path=self.read_path)
+        return self.monitor_connection
+
+    def data_version(self) -> int:
+        """Return PRAGMA data_version as seen by a dedicated connection.
+
+        The value is per-connection and only moves when *another* connection
+        commits, so it is read from a connection that never writes. That way it
+        changes on every commit from the writer, or from another process. It
+        watches the file reads come from, and moves when that file is switched.
+        """
+        with self.monitor_lock:
+            data_version = self.monitor().execute("PRAGMA data_version").fetchone()[0]
+            return (self.read_generation << 32) + data_version
+
+    def identity(self):
+        """Identify the file reads come from, so a replaced file never matches cached state."""
+        try:
+            stat = os.stat(self.read_path)
+        except OSError:
+            return None
+        return (stat.st_dev, stat.st_ino)
+
+    def versions(self):
+        """Return ``(file identity, data_version, schema_version)`` for cache keys."""
+        with self.monitor_lock:
+            conn = self.monitor()
+            data_version = (self.read_generation << 32) + conn.execute("PRAGMA data_version").fetchone()[0]
+            schema_version = conn.execute("PRAGMA schema_version").fetchone()[0]
+        return self.identity(), data_version, schema_version
+
+    def close(self) -> None:
+        """Close every pooled connection, and remove the snapshot if there is one."""
+        while True:
+            try:
+                self.readers.get_nowait().close()
+            except queue.Empty:
+                break
+        self.opened_readers = 0
+        self.reader_paths.clear()
+        with self.writer_lock:
+            if self.writer_connection is not None:
+                self.writer_connection.close()
+                self.writer_connection = None
+            self.drop_snapshot()
+        with self.monitor_lock:
+            if self.monitor_connection is not None:
+                self.monitor_connection.close()
+                self.monitor_connection = None
+
+
+_managers = {}
+_managers_lock = threading.Lock()
+
+
+def get_manager(database_path: str = None) -> ConnectionManager:
+    """Return the shared manager for a database, creating it on first use."""
+    path = os.path.abspath(database_path or DATABASE_PATH)
+    with _managers_lock:
+        if path not in _managers:
+            _managers[path] = ConnectionManager(database_path or DATABASE_PATH, pragmas=CONFIGURED_PRAGMAS)
+        return _managers[path]
@@ -0,0 +1,95 @@
+import re
+import sqlite3
+
+from catalog import written_table
+from statements import strip_trailing_comments
+
+DELTA_ROW_LIMIT = 1000  # Beyond this many touched rows a full reload is cheaper
+RETURNING_SUPPORTED = sqlite3.sqlite_version_info >= (3, 35, 0)
+
+# REPLACE can delete conflicting rows that RETURNING never reports
+REPLACE_PATTERN = re.compile(r'^\s*(?:REPLACE\b|(?:INSERT|UPDATE)\s+OR\s+REPLACE\b)', re.IGNORECASE)
+RETURNING_PATTERN = re.compile(r'\bRETURNING\b', re.IGNORECASE)
+UPDATE_SET_PATTERN = re.compile(r'\bSET\b(.*?)(?:\bFROM\b|\bWHERE\b|$)', re.IGNORECASE | re.DOTALL)
+
+
+class RowDelta:
+    """The rows of one table touched by a DML statement, as they are after it ran.
+
+    ``rows`` maps each touched rowid to the row's current values, or to None if
+    the row no longer exists. ``changes`` is how many rows the statement
+    changed, as SQLite counted them.
+    """
+
+    def __init__(self, table_name: str, rows: dict, changes: int = None):
+        self.table_name = table_name
+        self.rows = rows
+        self.changes = changes
+
+
+def rowid_aliases(conn: sqlite3.Connection, table_name: str):
+    """Return the names that refer to a table's rowid, lower-cased."""
+    aliases = {'rowid', 'oid', '_rowid_'}
+    columns = conn.execute(f'PRAGMA table_info("{table_name}")').fetchall()
+    primary_keys = [col for col in columns if col[5]]
+    if len(primary_keys) == 1 and primary_keys[0][2].upper() == 'INTEGER':
+        aliases.add(primary_keys[0][1].lower())
+    return aliases
+
+
+def has_side_effects(conn: sqlite3.Connection, table_name: str) -> bool:
+    """Whether writing a table can change rows RETURNING won't report: triggers, or cascading foreign keys."""
+    if conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'trigger' AND tbl_name = ? COLLATE NOCASE LIMIT 1", (table_name,)
+    ).fetchone():
+        return True
+    return conn.execute(
+        "SELECT 1 FROM sqlite_master AS m, pragma_foreign_key_list(m.name) AS f "
+        "WHERE m.type = 'table' AND f.\"table\" = ? COLLATE NOCASE "
+        "AND (f.on_delete != 'NO ACTION' OR f.on_update != 'NO ACTION') LIMIT 1",
+        (table_name,),
+    ).fetchone() is not None
+
+
+def returning_statement(conn: sqlite3.Connection, query: str):
+    """Rewrite a DML statement to report the rowids it touches.
+
+    Returns ``(table_name, statement)``, or None when the statement's effect on
+    the grid can't be tracked that way and the caller should reload instead.
+    """
+    if not RETURNING_SUPPORTED:
+        return None
+    table_name = written_table(query)
+    if table_name is None or REPLACE_PATTERN.match(query) or RETURNING_PATTERN.search(query):
+        return None
+    try:
+        # Only rowid tables have a stable key to diff on
+        conn.execute(f'SELECT rowid FROM "{table_name}" LIMIT 0')
+        aliases = rowid_aliases(conn, table_name)
+        if has_side_effects(conn, table_name):
+            return None
+    except sqlite3.Error:
+        return None
+    if query.strip().upper().startswith('UPDATE'):
+        # Moving a row to a new rowid leaves its old key behind in the grid
+        match = UPDATE_SET_PATTERN.search(query)
+        assigned = re.findall(r'(?:^|,)\s*"?(\w+)"?\s*=', match.group(1)) if match else []
+        if any(name.lower() in aliases for name in assigned):
+            return None
+    # A trailing comment would swallow the clause
+    return table_name, f"{strip_trailing_comments(query)} RETURNING rowid"
+
+
+def fetch_delta(conn: sqlite3.Connection, table_name: str, rowids, changes: int = None) -> RowDelta:
+    """Read the current values of the touched rows."""
+    rows = {rowid: None for rowid in rowids}
+    rowids = list(rows)
+    for start in range(0, len(rowids), 500):
+        chunk = rowids[start:start + 500]
+        placeholders = ", ".join("?" * len(chunk))
+        cursor = conn.execute(
+            f'SELECT rowid, * FROM "{table_name}" WHERE rowid IN ({placeholders})', chunk
+        )
+        for row in cursor:
+            rows[row[0]] = row[1:]
+    return RowDelta(table_name, rows, changes)
@@ -0,0 +1,65 @@
+import sqlite3
+import threading
+import time
+
+PROGRESS_STEPS = 1000  # SQLite VM instructions between progress handler calls
+
+
+class Execution:
+    """One SQL or AI execution, tracked so the UI can time and cancel it.
+
+    Connections attached to the execution get a progress handler that aborts
+    the running statement once the execution is cancelled, and are interrupted
+    directly by ``cancel()`` so a cancel takes effect immediately.
+    """
+
+    def __init__(self, description: str, progress_steps: int = PROGRESS_STEPS):
+        self.description = description
+        self.progress_steps = progress_steps  # VM instructions between progress handler calls
+        self.started_at = time.monotonic()
+        self.finished_at = None
+        self.cancelled = False
+        self.steps = 0  # Approximate VM instructions run so far
+        self.progress = None  # Progress in the work's own terms, e.g. rows imported
+        self.connections = set()
+        self.cancel_callbacks = []  # Called on cancel, e.g. to cancel an async worker
+        self.lock = threading.Lock()
+
+    @property
+    def elapsed(self) -> float:
+        end = self.finished_at if self.finished_at is not None else time.monotonic()
+        return end - self.started_at
+
+    @property
+    def running(self) -> bool:
+        return self.finished_at is None
+
+    def attach(self, conn: sqlite3.Connection) -> None:
+        """Make statements on the connection count progress and honour cancellation."""
+        conn.set_progress_handler(self.on_progress, self.progress_steps)
+        with self.lock:
+            self.connections.add(conn)
+
+    def detach(self, conn: sqlite3.Connection) -> None:
+        """Stop tracking the connection, e.g. before it is closed."""
+        conn.set_progress_handler(None, self.progress_steps)
+        with self.lock:
+            self.connections.discard(conn)
+
+    def on_progress(self) -> int:
+        # A non-zero return makes SQLite abort the statement with "interrupted"
+        self.steps += self.progress_steps
+        return 1 if self.cancelled else 0
+
+    def cancel(self) -> None:
+        """Cancel the execution and interrupt any statement still running."""
+        self.cancelled = True
+        with self.lock:
+            for conn in self.connections:
+                conn.interrupt()
+        for callback in self.cancel_callbacks:
+            callback()
+
+    def finish(self) -> None:
+        if self.finished_at is None:
+            self.finished_at = time.monotonic()
@@ -0,0 +1,109 @@
+import argparse
+import csv
+import gzip
+import json
+import os
+import sys
+import time
+
+from connections import get_manager
+from importer import detect_format
+
+EXPORT_FETCH_ROWS = 5000  # Rows held in memory at a time
+
+
+class ExportResult:
+    """Where an export went and how many rows it wrote."""
+
+    def __init__(self, path: str, rows: int, seconds: float):
+        self.path = path
+        self.rows = rows
+        self.seconds = seconds
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / self.seconds if self.seconds else 0.0
+
+
+def open_output(path: str, compress: bool):
+    if compress:
+        return gzip.open(path, "wt", newline="")
+    return open(path, "w", newline="")
+
+
+def json_value(value):
+    # BLOBs have no JSON form; hex keeps them lossless
+    return value.hex() if isinstance(value, bytes) else value
+
+
+def export_query(connections, query: str, path: str, file_format: str = None,
+                 fetch_rows: int = EXPORT_FETCH_ROWS, progress=None, execution=None) -> ExportResult:
+    """Stream a query's result into a CSV or JSONL file, gzipped if the path ends in .gz.
+
+    Rows are read ``fetch_rows`` at a time, so memory stays flat however many
+    the query returns. ``progress`` is called with the rows written so far and
+    the elapsed seconds after every fetch. The file is written next to ``path``
+    and only moved into place once complete, so a failed or cancelled export
+    leaves nothing behind.
+    """
+    file_format = file_format or detect_format(path)
+    started_at = time.perf_counter()
+    partial_path = f"{path}.partial"
+    compress = path.lower().endswith(".gz")
+    rows = 0
+    try:
+        with connections.reader(execution) as conn, open_output(partial_path, compress) as file:
+            cursor = conn.execute(query)
+            columns = [description[0] for description in cursor.description or []]
+            if file_format == "csv":
+                writer = csv.writer(file)
+                writer.writerow(columns)
+            while True:
+                batch = cursor.fetchmany(fetch_rows)
+                if not batch:
+                    break
+                if file_format == "csv":
+                    writer.writerows(batch)
+                else:
+                    file.writelines(
+                        json.dumps(dict(zip(columns, map(json_value, row))), default=str) + "\n"
+                        for row in batch
+                    )
+                rows += len(batch)
+                if progress is not None:
+                    progress(rows, time.perf_counter() - started_at)
+        os.replace(partial_path, path)
+    except BaseException:
+        if os.path.exists(partial_path):
+            os.remove(partial_path)
+        raise
+    return ExportResult(path, rows, time.perf_counter() - started_at)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export a query's result to a CSV or JSONL file.")
+    parser.add_argument("query", help="SQL to export, or a table name")
+    parser.add_argument("file", help="output file; .jsonl for JSONL, a .gz suffix to gzip")
+    parser.add_argument("--database", help="database file (default: INFOTRON_DATABASE or database/database.db)")
+    parser.add_argument("--format", choices=["csv", "jsonl"], help="file format (default: from the extension)")
+    args = parser.parse_args(argv)
+
+    query = args.query if " " in args.query.strip() else f'SELECT * FROM "{args.query}"'
+    connections = get_manager(args.database)
+
+    def report(rows, elapsed):
+        print(f"\r{rows:,} rows · {rows / elapsed if elapsed else 0:,.0f} rows/s", end="", file=sys.stderr)
+
+    try:
+        result = export_query(connections, query, args.file, file_format=args.format, progress=report)
+    finally:
+        connections.close()
+    print(
+        f"\nExported {result.rows:,} rows to {result.path} in {result.seconds:.2f}s "
+        f"({result.rows_per_second:,.0f} rows/s)",
+        file=sys.stderr,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+import re
+
+# One predicate typed into the filter bar: column, operator, value
+PREDICATE_PATTERN = re.compile(
+    r'^(?:"((?:[^"]|"")+)"|([^\s=!<>~]+))\s*'
+    r'(is\s+not\s+null|is\s+null|==|=|!=|<>|<=|>=|<|>|!~|~)\s*(.*)$',
+    re.IGNORECASE | re.DOTALL,
+)
+AND_PATTERN = re.compile(r'\s+and\s+', re.IGNORECASE)
+NUMBER_PATTERN = re.compile(r'^[+-]?(?:\d+\.?\d*|\.\d+)(?:e[+-]?\d+)?$', re.IGNORECASE)
+
+OPERATORS = {"=": "=", "==": "=", "!=": "!=", "<>": "!=", "<": "<", "<=": "<=", ">": ">", ">=": ">=",
+             "~": "LIKE", "!~": "NOT LIKE"}
+
+
+def quote_identifier(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def split_terms(text: str):
+    """Split filter text on commas and ANDs that aren't inside quotes."""
+    terms, current, quote = [], [], None
+    position = 0
+    while position < len(text):
+        char = text[position]
+        if quote:
+            if char == quote:
+                quote = None
+        elif char in ("'", '"'):
+            quote = char
+        elif char == ",":
+            terms.append("".join(current))
+            current = []
+            position += 1
+            continue
+        else:
+            match = AND_PATTERN.match(text, position)
+            if match:
+                terms.append("".join(current))
+                current = []
+                position = match.end()
+                continue
+        current.append(char)
+        position += 1
+    terms.append("".join(current))
+    return [term.strip() for term in terms if term.strip()]
+
+
+def parse_value(text: str):
+    """A quoted value is text; an unquoted one is a number if it looks like one."""
+    text = text.strip()
+    if len(text) >= 2 and text[0] == text[-1] and text[0] in ("'", '"'):
+        return text[1:-1].replace(text[0] * 2, text[0])
+    if NUMBER_PATTERN.match(text):
+        return float(text) if any(char in text for char in ".eE") else int(text)
+    return text
+
+
+def parse_filter(text: str, columns):
+    """Turn filter bar text into a WHERE clause over ``columns`` and its parameters.
+
+    Predicates are separated by commas or AND, e.g. ``age >= 30, name ~ smi``.
+    Operators are the usual comparisons, ``~``/``!~`` for contains/doesn't
+    contain, and ``is null``/``is not null``. A term without an operator
+    matches rows where any column contains it. Values are always bound as
+    parameters and columns must be in ``columns``; raises ValueError otherwise.
+    """
+    by_name = {column.lower(): column for column in columns}
+    clauses, params = [], []
+    for term in split_terms(text):
+        match = PREDICATE_PATTERN.match(term)
+        if not match:
+            # Free text: any column containing it
+            value = parse_value(term)
+            clauses.append("(" + " OR ".join(f"{quote_identifier(column)} LIKE ?" for column in columns) + ")")
+            params.extend([f"%{value}%"] * len(columns))
+            continue
+
+        name = match.group(1).replace('""', '"') if match.group(1) else match.group(2)
+        if name.lower() not in by_name:
+            raise ValueError(f"No column named {name}")
+        column = quote_identifier(by_name[name.lower()])
+        operator = " ".join(match.group(3).upper().split())
+        if operator in ("IS NULL", "IS NOT NULL"):
+            if match.group(4).strip():
+                raise ValueError(f"Unexpected text after {operator.lower()}: {match.group(4).strip()}")
+            clauses.append(f"{column} {operator}")
+            continue
+        if not match.group(4).strip():
+            raise ValueError(f"Missing a value after {name} {match.group(3)}")
+        value = parse_value(match.group(4))
+        if OPERATORS[operator] in ("LIKE", "NOT LIKE"):
+            value = f"%{value}%"
+        clauses.append(f"{column} {OPERATORS[operator]} ?")
+        params.append(value)
+    return " AND ".join(clauses), tuple(params)
@@ -0,0 +1,247 @@
+import argparse
+import csv
+import gzip
+import itertools
+import json
+import os
+import re
+import sys
+import time
+
+from connections import get_manager
+
+IMPORT_BATCH_ROWS = 10_000  # Rows inserted per transaction
+SCHEMA_SAMPLE_ROWS = 1000  # Rows read ahead to infer column types
+
+# Pragmas relaxed for the duration of an import, then restored. A crash
+# mid-import can lose the last batches, but never corrupts the database.
+IMPORT_PRAGMAS = {
+    "synchronous": "OFF",
+}
+
+# Text read as a number only in plain notation: no leading zeros, so codes like
+# "007" stay text, and no "nan", "inf" or "1_000", which Python would parse
+INTEGER_PATTERN = re.compile(r"-?(?:0|[1-9][0-9]*)")
+REAL_PATTERN = re.compile(r"-?(?:(?:0|[1-9][0-9]*)(?:\.[0-9]*)?|\.[0-9]+)(?:[eE][-+]?[0-9]+)?")
+
+
+class ImportResult:
+    """What an import did: the table, whether it was created, how many rows went in, and the fields left out."""
+
+    def __init__(self, table_name: str, created: bool, rows: int, seconds: float, skipped_fields=()):
+        self.table_name = table_name
+        self.created = created
+        self.rows = rows
+        self.seconds = seconds
+        self.skipped_fields = list(skipped_fields)  # Fields with no column, e.g. first seen after the sample
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / self.seconds if self.seconds else 0.0
+
+
+def detect_format(path: str) -> str:
+    name = path.lower().removesuffix(".gz")
+    if name.endswith((".jsonl", ".ndjson", ".json")):
+        return "jsonl"
+    return "csv"
+
+
+def open_text(path: str):
+    if path.lower().endswith(".gz"):
+        return gzip.open(path, "rt", newline="")
+    return open(path, newline="")
+
+
+def read_records(file, file_format: str):
+    """Yield one dict per CSV row or JSONL line, without reading the whole file."""
+    if file_format == "jsonl":
+        for line in file:
+            if line.strip():
+                yield json.loads(line)
+    else:
+        yield from csv.DictReader(file)
+
+
+def value_type(value) -> str:
+    """The narrowest SQLite type a single value fits, or None for a missing value."""
+    if value is None or value == "":
+        return None
+    if isinstance(value, bool) or isinstance(value, int):
+        return "INTEGER"
+    if isinstance(value, float):
+        return "REAL"
+    if isinstance(value, (dict, list)):
+        return "TEXT"
+    if INTEGER_PATTERN.fullmatch(value):
+        return "INTEGER"
+    if REAL_PATTERN.fullmatch(value):
+        return "REAL"
+    return "TEXT"
+
+
+def infer_schema(records) -> dict:
+    """Infer column name -> type from sample records, widening INTEGER to REAL to TEXT."""
+    order = ["INTEGER", "REAL", "TEXT"]
+    columns = {}
+    for record in records:
+        for name, value in record.items():
+            kind = value_type(value)
+            current = columns.setdefault(name, None)
+            if kind is not None and (current is None or order.index(kind) > order.index(current)):
+                columns[name] = kind
+    return {name: kind or "TEXT" for name, kind in columns.items()}
+
+
+def parse_schema(text: str) -> dict:
+    """Parse a schema given as "name TYPE, name TYPE"; a missing type means TEXT."""
+    columns = {}
+    for part in text.split(","):
+        words = part.split()
+        if words:
+            columns[words[0].strip('"')] = " ".join(words[1:]) or "TEXT"
+    return columns
+
+
+def convert(value, kind: str):
+    """Convert a raw CSV/JSON value for a column of the given type."""
+    if value is None or value == "":
+        return None
+    if isinstance(value, (dict, list)):
+        return json.dumps(value)
+    if isinstance(value, str):
+        # Anything else is kept as text, like SQLite's own type affinity would
+        if kind == "INTEGER" and INTEGER_PATTERN.fullmatch(value):
+            return int(value)
+        if kind == "REAL" and REAL_PATTERN.fullmatch(value):
+            return float(value)
+    return value
+
+
+def track_fields(records, known: set, skipped: dict):
+    """Pass records through, noting in ``skipped`` any field not in ``known``."""
+    for record in records:
+        if not record.keys() <= known:
+            skipped.update(dict.fromkeys(name for name in record if name not in known))
+        yield record
+
+
+def import_file(connections, path: str, table_name: str, file_format: str = None, schema: dict = None,
+                batch_rows: int = IMPORT_BATCH_ROWS, progress=None, execution=None) -> ImportResult:
+    """Stream a CSV or JSONL file into a table, creating the table if it doesn't exist.
+
+    The file is read record by record and inserted with ``executemany`` in
+    transactions of ``batch_rows``, so memory stays flat however big it is.
+    Column types come from ``schema``, the existing table, or the first
+    ``SCHEMA_SAMPLE_ROWS`` records; fields that get no column, such as a JSONL
+    field first seen after the sample, are listed in the result's
+    ``skipped_fields``. ``progress`` is called with the rows
+    inserted so far and the elapsed seconds after every batch, and a cancelled
+    ``execution`` stops the import before the next one.
+    """
+    file_format = file_format or detect_format(path)
+    started_at = time.perf_counter()
+    with open_text(path) as file:
+        records = read_records(file, file_format)
+        sample = list(itertools.islice(records, SCHEMA_SAMPLE_ROWS))
+
+        # Cancellation is checked between batches; a progress handler on every
+        # insert would cost more than the batches take
+        with connections.writer() as conn:
+            existing = {row[1]: row[2] for row in conn.execute(f'PRAGMA table_info("{table_name}")')}
+            created = not existing
+            if created:
+                columns = schema or infer_schema(sample)
+                if not columns:
+                    raise ValueError(f"No columns found in {path}")
+                definitions = ", ".join(f'"{name}" {kind}' for name, kind in columns.items())
+                conn.execute(f'CREATE TABLE "{table_name}" ({definitions})')
+                conn.commit()
+            else:
+                # Fields the table has no column for are ignored
+                fields = schema or infer_schema(sample)
+                columns = {name: existing[name].upper() for name in fields if name in existing}
+                if not columns:
+                    raise ValueError(f'None of the fields in {path} match a column of "{table_name}"')
+            sampled = {name for record in sample for name in record}
+            skipped = dict.fromkeys(name for name in sampled if name not in columns)
+            if file_format == "jsonl":
+                # CSV rows all share the header; JSONL records can bring new fields at any point
+                records = track_fields(records, sampled, skipped)
+
+            names = list(columns)
+            kinds = [columns[name].upper() for name in names]
+            column_list = ", ".join(f'"{name}"' for name in names)
+            statement = f'INSERT INTO "{table_name}" ({column_list}) VALUES ({", ".join("?" * len(names))})'
+
+            previous = {name: conn.execute(f"PRAGMA {name}").fetchone()[0] for name in IMPORT_PRAGMAS}
+            for name, value in IMPORT_PRAGMAS.items():
+                conn.execute(f"PRAGMA {name} = {value}")
+            rows = 0
+            try:
+                all_records = itertools.chain(sample, records)
+                while True:
+                    batch = [
+                        tuple(convert(record.get(name), kind) for name, kind in zip(names, kinds))
+                        for record in itertools.islice(all_records, batch_rows)
+                    ]
+                    if not batch:
+                        break
+                    if execution is not None and execution.cancelled:
+                        raise InterruptedError("Import cancelled")
+                    conn.executemany(statement, batch)
+                    conn.commit()
+                    rows += len(batch)
+                    if progress is not None:
+                        progress(rows, time.perf_counter() - started_at)
+            finally:
+                if conn.in_transaction:
+                    conn.rollback()
+                for name, value in previous.items():
+                    conn.execute(f"PRAGMA {name} = {value}")
+
+    return ImportResult(table_name, created, rows, time.perf_counter() - started_at, skipped)
+
+
+def default_table_name(path: str) -> str:
+    name = os.path.basename(path).lower().removesuffix(".gz")
+    return os.path.splitext(name)[0].replace("-", "_").replace(" ", "_")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Import a CSV or JSONL file into a table.")
+    parser.add_argument("file", help="CSV or JSONL file, optionally gzipped")
+    parser.add_argument("table", nargs="?", help="table to import into (default: the file name)")
+    parser.add_argument("--database", help="database file (default: INFOTRON_DATABASE or database/database.db)")
+    parser.add_argument("--format", choices=["csv", "jsonl"], help="file format (default: from the extension)")
+    parser.add_argument("--schema", help='column types for a new table, e.g. "id INTEGER, name TEXT"')
+    parser.add_argument("--batch-rows", type=int, default=IMPORT_BATCH_ROWS, help="rows per transaction")
+    args = parser.parse_args(argv)
+
+    table_name = args.table or default_table_name(args.file)
+    connections = get_manager(args.database)
+
+    def report(rows, elapsed):
+        print(f"\r{rows:,} rows · {rows / elapsed if elapsed else 0:,.0f} rows/s", end="", file=sys.stderr)
+
+    try:
+        result = import_file(
+            connections, args.file, table_name,
+            file_format=args.format,
+            schema=parse_schema(args.schema) if args.schema else None,
+            batch_rows=args.batch_rows,
+            progress=report,
+        )
+    finally:
+        connections.close()
+    print(
+        f"\nImported {result.rows:,} rows into {'new table ' if result.created else ''}{result.table_name} "
+        f"in {result.seconds:.2f}s ({result.rows_per_second:,.0f} rows/s)",
+        file=sys.stderr,
+    )
+    if result.skipped_fields:
+        print(f"Skipped fields with no column: {', '.join(map(str, result.skipped_fields))}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,36 @@
+import time
+
+STARTED_AT = time.perf_counter()  # Cold start is measured from here to the first rendered table
+
 from textual.app import App, ComposeResult
-from textual.widgets import Button, DataTable, Tree, Footer, TextArea, Static
-from textual.containers import Horizontal, Vertical
-from textual import events
+from textual.binding import Binding
+from textual.widgets import Button, DataTable, Input, Tree, Footer, TextArea, Static
+from textual.containers import Horizontal, Vertical, VerticalScroll
+from textual.css.query import NoMatches
+from textual import events, work
+from textual.worker import get_current_worker
+import asyncio
+import shlex
 import sqlite3
-import time
-from ai import query_database
+from advisor import ADVISOR_INTERVAL, QueryHistory, apply_suggestion, suggest_indexes
+from ai import get_service
+from cells import Cell, Preview, describe_value, has_more
+from column_stats import ColumnStatsCache
+from catalog import RowCountCache, SchemaSnapshot, is_internal, written_table
+from connections import get_manager
+from execution import Execution
+from statements import SCRIPT_SAVEPOINTS, StatementEffect, run_script, split_statements, statement_effect, strip_comments
+from exporter import export_query
+from importer import default_table_name, import_file
+from delta import DELTA_ROW_LIMIT, RowDelta, fetch_delta, returning_statement
+from paging import PagedQuery
+from profiler import PROFILE_PROGRESS_STEPS, Profile, append_log, explain_query_plan
+from result_cache import ResultCache
+from search import SearchIndex
+from snapshot import SNAPSHOT_DIR, SNAPSHOT_ON_START
+from tracing import sql_hash, tracer
 from textual.widgets.tree import TreeNode
+from rich.text import Text
 import sqlite3
 import os
 
@@ -106,6 +131,15 @@ class AiEditor(Vertical):
         except:
             pass
 
+    def append_response(self, text: str) -> None:
+        """Append streamed text to the AI response."""
+        try:
+            response_area = self.query_one("#ai_response_area", TextArea)
+            response_area.insert(text, response_area.document.end)
+            response_area.scroll_end(animate=False)
+        except:
+            pass
+
     def get_input(self) -> str:
         """Get the user input text."""
         try:
@@ -120,250 +154,897 @@ class Explorer(Tree):
     def __init__(self, **kwargs):
         super().__init__("Database Explorer", **kwargs)
         self.border_title = 'Explorer'
-        self.database_path = 'database/database.db'
         self.show_root = False
+        self.row_counts = None  # Cached row counts, created once the app is available
+        self.schema = None  # Snapshot of the tables the tree currently shows
+        self.tables_node = None  # Parent node of the table nodes
+        self.table_nodes = {}  # Table name -> tree node
+        self.advice_node = None  # Parent node of suggested indexes, while there are any
+        self.search_node = None  # Parent node of the last search's results
+        self.profiling = {}  # Table name -> execution computing its column stats
 
     def on_mount(self) -> None:
         """Load the database structure when the widget mounts."""
+        self.row_counts = RowCountCache(self.app.connections)
         self.load_database_structure()
 
     def load_database_structure(self):
-        """Load and display the database structure."""
+        """Show the table names right away; columns and row counts load lazily."""
+        self.schema = None
+        self.tables_node = None
+        self.table_nodes = {}
+        self.advice_node = None
+        self.search_node = None
         try:
             # Check if database file exists
-            if not os.path.exists(self.database_path):
+            connections = self.app.connections
+            if not connections.exists:
                 self.root.add_leaf("Database file not found")
                 return
 
-            conn = sqlite3.connect(self.database_path)
-            cursor = conn.cursor()
+            with connections.reader() as conn:
+                # Get all tables
+                schema = SchemaSnapshot.load(conn)
             
-            # Get all tables
-            cursor.execute("SELECT name FROM sqlite_master WHERE type='table' ORDER BY name;")
-            tables = cursor.fetchall()
-            
-            if not tables:
+            if not schema.tables:
                 self.root.add_leaf("No tables found")
-                conn.close()
                 return
             
             # Add database file node
-            db_node = self.root.add("📁 database.db", expand=True)
+            db_node = self.root.add(f"📁 {os.path.basename(connections.database_path)}", expand=True)
             
             # Add tables node
-            tables_node = db_node.add("📊 Tables", expand=True)
-            
-            for table_name in tables:
-                table_name = table_name[0]
-                
-                # Get table info
-                cursor.execute(f"PRAGMA table_info({table_name});")
-                columns = cursor.fetchall()
-                
-                # Get row count
-                cursor.execute(f"SELECT COUNT(*) FROM {table_name};")
-                row_count = cursor.fetchone()[0]
-                
-                # Add table node with row count
-                table_node = tables_node.add(f"🗃️ {table_name} ({row_count} rows)", data={"type": "table", "name": table_name})
-                
-                # Add columns as children
-                for col in columns:
-                    col_name = col[1]  # column name
-                    col_type = col[2]  # column type
-                    is_pk = col[5]     # is primary key
-                    pk_indicator = " 🔑" if is_pk else ""
-                    table_node.add_leaf(f"📋 {col_name} ({col_type}){pk_indicator}")
+            self.tables_node = db_node.add("📊 Tables", expand=True)
             
-            conn.close()
+            for table_name in schema.tables:
+                self.add_table_node(table_name)
+
+            self.schema = schema
+            self.load_row_counts(list(self.table_nodes))
             
         except sqlite3.Error as e:
             self.root.add_leaf(f"Database error: {str(e)}")
         except Exception as e:
             self.root.add_leaf(f"Error: {str(e)}")
 
+    def add_table_node(self, table_name: str, before=None) -> TreeNode:
+        """Add a table node; its columns are added when it is first expanded."""
+        table_node = self.tables_node.add(
+            self.table_label(table_name, self.row_counts.get(table_name)),
+            data={"type": "table", "name": table_name, "columns_loaded": False},
+            before=before,
+            allow_expand=True,
+        )
+        self.table_nodes[table_name] = table_node
+        return table_node
+
+    @staticmethod
+    def table_label(table_name: str, row_count=None) -> str:
+        """Label a table node with its row count, marking estimates with ~."""
+        if row_count is None:
+            return f"🗃️ {table_name}"
+        count, exact = row_count
+        return f"🗃️ {table_name} ({'' if exact else '~'}{count} rows)"
+
+    def set_row_count(self, table_name: str, row_count) -> None:
+        node = self.table_nodes.get(table_name)
+        if node is not None:
+            node.set_label(self.table_label(table_name, row_count))
+
+    @work(thread=True, group="row_counts")
+    def load_row_counts(self, table_names) -> None:
+        """Fill in row counts: cached or estimated ones first, then exact counts."""
+        worker = get_current_worker()
+        connections = self.app.connections
+        version = self.row_counts.validate()
+
+        needs_exact = []
+        with connections.reader() as conn:
+            for table_name in table_names:
+                cached = self.row_counts.get(table_name)
+                if cached is None:
+                    estimate = self.row_counts.estimate(conn, table_name)
+                    if estimate is not None:
+                        cached = (estimate, False)
+                        self.row_counts.put(table_name, estimate, False, version)
+                if cached is not None:
+                    self.app.call_from_thread(self.set_row_count, table_name, cached)
+                if cached is None or not cached[1]:
+                    needs_exact.append(table_name)
+
+        for table_name in needs_exact:
+            if worker.is_cancelled:
+                return
+            try:
+                with connections.reader() as conn:
+                    count = self.row_counts.exact(conn, table_name)
+            except sqlite3.Error:
+                continue
+            self.row_counts.put(table_name, count, True, version)
+            self.app.call_from_thread(self.set_row_count, table_name, (count, True))
+
+    def on_tree_node_expanded(self, event: Tree.NodeExpanded) -> None:
+        """Load a table's columns the first time its node is expanded."""
+        node = event.node
+        if not (node.data and node.data.get('type') == 'table') or node.data['columns_loaded']:
+            return
+        self.load_columns(node)
+
+    def load_columns(self, node: TreeNode) -> None:
+        """Add a table node's columns as its children."""
+        try:
+            with self.app.connections.reader() as conn:
+                columns = conn.execute(f'PRAGMA table_info("{node.data["name"]}");').fetchall()
+        except sqlite3.Error as e:
+            node.add_leaf(f"Database error: {str(e)}")
+            return
+        node.data['columns_loaded'] = True
+
+        # Add columns as children; their stats are profiled in the background
+        table_name = node.data["name"]
+        for col in columns:
+            col_name = col[1]  # column name
+            col_type = col[2]  # column type
+            is_pk = col[5]     # is primary key
+            pk_indicator = " 🔑" if is_pk else ""
+            column_node = node.add(
+                f"📋 {col_name} ({col_type}){pk_indicator}",
+                data={"type": "column", "table": table_name, "name": col_name},
+            )
+            column_node.add_leaf("⏳ Profiling…")
+        self.load_column_stats(table_name)
+
+    @work(thread=True, group="column_stats")
+    def load_column_stats(self, table_name: str) -> None:
+        """Profile a table's columns, or fetch the cached stats, and show them under its column nodes."""
+        if table_name in self.profiling:
+            return
+        execution = self.profiling[table_name] = Execution(f"Profiling {table_name}")
+        try:
+            stats = self.app.column_stats.profile(table_name, execution)
+        except (sqlite3.Error, OSError) as e:
+            if not execution.cancelled:
+                self.app.call_from_thread(self.app.notify, f"Could not profile {table_name}: {str(e)}", severity="warning")
+            return
+        finally:
+            execution.finish()
+            del self.profiling[table_name]
+        if not execution.cancelled:
+            self.app.call_from_thread(self.set_column_stats, table_name, stats)
+
+    def on_unmount(self) -> None:
+        # Stop profiling before the app closes its connections
+        for execution in list(self.profiling.values()):
+            execution.cancel()
+
+    def set_column_stats(self, table_name: str, stats) -> None:
+        table_node = self.table_nodes.get(table_name)
+        if table_node is None or stats is None:
+            return
+        for column_node in table_node.children:
+            column = stats.column(column_node.data["name"]) if column_node.data else None
+            if column is None:
+                continue
+            column_node.remove_children()
+            for line in column.summary_lines(stats.sampled):
+                column_node.add_leaf(Text(line))  # Values aren't markup
+
+    def set_index_advice(self, suggestions) -> None:
+        """List suggested indexes under the database node; selecting one creates it."""
+        if self.advice_node is not None:
+            self.advice_node.remove()
+            self.advice_node = None
+        if not suggestions or self.tables_node is None:
+            return
+        self.advice_node = self.tables_node.parent.add("💡 Suggested indexes (select to create)", expand=True)
+        for suggestion in suggestions:
+            self.advice_node.add_leaf(f"⚡ {suggestion.label}", data={"type": "index_advice", "suggestion": suggestion})
+
+    def remove_index_advice(self, node: TreeNode) -> None:
+        if self.advice_node is None or node not in self.advice_node.children:
+            return  # Already gone, e.g. replaced by newer advice
+        node.remove()
+        if self.advice_node is not None and not self.advice_node.children:
+            self.advice_node.remove()
+            self.advice_node = None
+
+    def set_search_results(self, text: str, results) -> None:
+        """List search hits above the tables, grouped by table, best match first."""
+        if self.search_node is not None:
+            self.search_node.remove()
+            self.search_node = None
+        if self.tables_node is None:
+            return
+        hits = sum(len(table_hits) for _, table_hits in results)
+        self.search_node = self.tables_node.parent.add(
+            f"🔍 {text} ({hits} row{'s' if hits != 1 else ''} in {len(results)} table{'s' if len(results) != 1 else ''})",
+            before=self.tables_node,
+            expand=True,
+        )
+        for table_name, table_hits in results:
+            table_node = self.search_node.add(f"🗃️ {table_name} ({len(table_hits)})", expand=True)
+            for hit in table_hits:
+                snippet = " ".join(hit.snippet.split())
+                table_node.add_leaf(
+                    f"#{hit.rowid}: {snippet[:80]}",
+                    data={"type": "search_hit", "table": hit.table_name, "rowid": hit.rowid},
+                )
+        self.focus()
+        self.move_cursor(self.search_node)
+
     def on_tree_node_selected(self, event: Tree.NodeSelected) -> None:
         """Handle tree node selection."""
         node = event.node
-        if hasattr(node, 'data') and node.data and node.data.get('type') == 'table':
+        if node.data and node.data.get('type') == 'index_advice':
+            self.app.apply_index_suggestion(node)
+        elif node.data and node.data.get('type') == 'search_hit':
+            self.app.query_one("#main_table", DisplayTable).show_row(node.data['table'], node.data['rowid'])
+        elif hasattr(node, 'data') and node.data and node.data.get('type') == 'table':
             # When a table is selected, show its data in the main table
             table_name = node.data['name']
             data_table = self.app.query_one("#main_table")
             data_table.load_data_from_db(f"SELECT * FROM {table_name}")
             data_table.border_title = f"Table: {table_name}"
 
-    def refresh_structure(self):
-        """Refresh the database structure display."""
-        self.clear()
-        self.load_database_structure()
+    def refresh_structure(self, statement: str = None):
+        """Bring the tree up to date after a statement, changing only what changed.
+
+        If PRAGMA schema_version is unchanged (plain DML) only row counts are
+        refreshed: the written table's if it can be told from the statement,
+        otherwise every table's. Otherwise sqlite_master is diffed against the
+        last snapshot and only added, dropped or altered tables are touched, so
+        expanded nodes stay expanded.
+        """
+        if self.schema is None or self.tables_node is None:
+            # Nothing incremental to work from (e.g. there were no tables)
+            self.clear()
+            self.load_database_structure()
+            return
+
+        try:
+            with self.app.connections.reader() as conn:
+                if SchemaSnapshot.read_version(conn) == self.schema.schema_version:
+                    schema = None
+                else:
+                    schema = SchemaSnapshot.load(conn)
+        except sqlite3.Error as e:
+            self.app.notify(f"Database error: {str(e)}", severity="error")
+            return
+
+        if schema is None:
+            table_name = written_table(statement) if statement else None
+            tables = [table_name] if table_name in self.table_nodes else list(self.table_nodes)
+            self.row_counts.invalidate(tables)
+            for table_name in tables:
+                self.set_row_count(table_name, None)
+                if self.table_nodes[table_name].data['columns_loaded']:
+                    self.load_column_stats(table_name)  # Shown stats are stale now
+            self.load_row_counts(tables)
+            return
+
+        added, dropped, altered = self.schema.diff(schema)
+        self.schema = schema
+        if not schema.tables:
+            self.clear()
+            self.load_database_structure()
+            return
+
+        for table_name in dropped:
+            self.table_nodes.pop(table_name).remove()
+        for table_name in added:
+            # Keep the tables sorted by name
+            before = next((self.table_nodes[name] for name in sorted(self.table_nodes) if name > table_name), None)
+            self.add_table_node(table_name, before=before)
+        for table_name in altered:
+            node = self.table_nodes[table_name]
+            node.remove_children()
+            node.data['columns_loaded'] = False
+            if node.is_expanded:
+                self.load_columns(node)
+
+        changed = added + altered
+        self.row_counts.invalidate(changed)
+        if changed:
+            self.load_row_counts(changed)
 
 class DisplayTable(DataTable):
 
+    PREFETCH_PAGES = 1  # Pages kept loaded on each side of the page being viewed
+
+    BINDINGS = [
+        Binding("s", "sort_cursor_column", "Sort"),
+    ]
+
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
-        self.database_path = 'database/database.db'
         self.current_display_query = None  # Track exactly what query is currently displayed
+        self.paged_query = None  # Pages of the displayed result, fetched on demand
+        self.window_first_page = 0  # Index of the first page loaded into the grid
+        self.window_page_count = 0  # Number of consecutive pages loaded into the grid
+        self.window_settling = False  # True while a freshly swapped window is being laid out
+        self.sort = None  # (column, descending) the displayed result is ordered by
+        self.filter_text = ""  # Filter bar predicates applied to the displayed result
 
     def load_data_from_db(self, query: str = None):
-        """Load data from SQLite database and populate the table."""
+        """Load a query, or the first table by default, into the grid in the background."""
+        self.load_table(query)
+
+    @work(thread=True, exclusive=True, group="view")
+    def load_table(self, query: str = None) -> None:
+        """Open a query off the event loop and show its first window."""
+        worker = get_current_worker()
         try:
-            conn = sqlite3.connect(self.database_path)
-            cursor = conn.cursor()
-            
             if query is None:
                 # Get the first table from the database
-                cursor.execute("SELECT name FROM sqlite_master WHERE type='table';")
-                tables = cursor.fetchall()
-                if tables:
-                    table_name = tables[0][0]
-                    query = f"SELECT * FROM {table_name}"
-                    self.border_title = f"Table: {table_name}"
-                else:
+                with self.app.connections.reader() as conn:
+                    tables = conn.execute("SELECT name FROM sqlite_master WHERE type='table';").fetchall()
+                tables = [table for table in tables if not is_internal(table[0])]
+                if not tables:
                     # No tables found, show empty table
-                    conn.close()
                     return
-            
-            cursor.execute(query)
-            columns = [description[0] for description in cursor.description]
-            rows = cursor.fetchall()
-            conn.close()
-            
-            # Store the current query for refresh purposes
-            if query.strip().upper().startswith('SELECT'):
-                self.current_display_query = query
-            
-            self.clear()
-            self.add_columns(*columns)
-            
-            # Add rows if they exist, otherwise just show empty table with column headers
-            if rows:
-                self.add_rows(rows)
-            
-            self.zebra_stripes = True
-            
+                table_name = tables[0][0]
+                query = f"SELECT * FROM {table_name}"
+                self.app.call_from_thread(setattr, self, "border_title", f"Table: {table_name}")
+
+            paged_query, pages = self.prepare_query(query)
+            if not worker.is_cancelled:
+                self.app.call_from_thread(self.show_query, query, paged_query, pages)
+
         except sqlite3.Error as e:
-            self.clear()
-            self.add_columns("Error")
-            self.add_rows([(f"Database error: {str(e)}",)])
+            self.app.call_from_thread(self.show_error, f"Database error: {str(e)}")
         except Exception as e:
-            self.clear()
-            self.add_columns("Error")
-            self.add_rows([(f"Error: {str(e)}",)])
+            self.app.call_from_thread(self.show_error, f"Error: {str(e)}")
+        finally:
+            # Cold start is measured to the first table drawn, or to finding there is none
+            self.app.call_from_thread(self.call_after_refresh, self.app.report_startup)
 
-    def execute_query(self, query: str):
-        """Execute a custom SQL query and update the table."""
-        query_upper = query.strip().upper()
-        
-        # Check if it's a DDL statement (CREATE, DROP, ALTER) or DML that doesn't return data
-        if (query_upper.startswith('CREATE') or 
-            query_upper.startswith('DROP') or 
-            query_upper.startswith('ALTER') or
-            query_upper.startswith('INSERT') or
-            query_upper.startswith('UPDATE') or
-            query_upper.startswith('DELETE')):
-            
-            # Execute the statement
-            try:
-                conn = sqlite3.connect(self.database_path)
-                cursor = conn.cursor()
-                cursor.execute(query)
-                conn.commit()
-                conn.close()
-
-                self.app.refresh_explorer_after_ddl()
-                
-                # After successful execution, refresh the table display
-                if query_upper.startswith('CREATE TABLE'):
-                    # For CREATE TABLE, show the new empty table structure
-                    self.refresh_display_after_ddl()
-                elif query_upper.startswith('DROP'):
-                    # After DROP, show the default table or empty display
-                    self.current_display_query = None
-                    self.load_data_from_db()
-                else:
-                    # For INSERT/UPDATE/DELETE, refresh the current table view
-                    self.refresh_current_table_view()
-                    
-            except sqlite3.Error as e:
-                self.clear()
-                self.add_columns("Error")
-                self.add_rows([(f"Database error: {str(e)}",)])
-            except Exception as e:
-                self.clear()
-                self.add_columns("Error")
-                self.add_rows([(f"Error: {str(e)}",)])
+    def open_query(self, query: str, execution: Execution = None, use_cache: bool = True,
+                   sort=None, filter_text: str = "") -> PagedQuery:
+        """Return the query's result from the result cache, or open it afresh."""
+        cache = self.app.result_cache
+        key = cache.key(query, (sort, filter_text)) if use_cache and cache.cacheable(query) else None
+        if key is not None:
+            with tracer.span("grid.result_cache", sql_hash=sql_hash(query)) as span:
+                paged_query = cache.get(key)
+                span.set(cache_hit=paged_query is not None)
+            if paged_query is not None:
+                return paged_query
+
+        paged_query = PagedQuery(self.app.connections, query, sort=sort, filter_text=filter_text)
+        paged_query.open(execution)
+        # One-shot statements like PRAGMA aren't cached; their output isn't versioned
+        if key is not None and paged_query.wrappable:
+            cache.put(key, paged_query)
+        return paged_query
+
+    def prepare_query(self, query: str, execution: Execution = None, use_cache: bool = True,
+                      sort=None, filter_text: str = ""):
+        """Open a query and fetch its first window. Safe to call from a worker thread."""
+        paged_query = self.open_query(query, execution, use_cache, sort, filter_text)
+        pages = paged_query.fetch_pages(0, 2 * self.PREFETCH_PAGES + 1, execution)
+        return paged_query, pages
+
+    def show_query(self, query: str, paged_query: PagedQuery, pages, first_page: int = 0, cursor_row: int = 0) -> None:
+        """Show a prepared query in the grid, from ``first_page`` with the cursor on ``cursor_row``."""
+        # Store the current query for refresh purposes; only read-only queries get here
+        self.current_display_query = query
+
+        self.paged_query = paged_query
+        self.sort = paged_query.sort
+        self.filter_text = paged_query.filter_text
+        self.app.query_one("#filter_bar", Input).value = self.filter_text
+        self.window_page_count = 0
+        self.clear(columns=True)
+        self.add_columns(*self.column_labels(paged_query))
+        self.apply_window(first_page, pages, cursor_row)
+
+        self.zebra_stripes = True
+
+    @staticmethod
+    def column_labels(paged_query: PagedQuery):
+        """Column headers, with an arrow on the one the rows are sorted by."""
+        labels = list(paged_query.columns)
+        if paged_query.sort is not None:
+            index = paged_query.sort_index
+            labels[index] = f"{labels[index]} {'▼' if paged_query.sort[1] else '▲'}"
+        return labels
+
+    def show_error(self, message: str) -> None:
+        """Replace the grid contents with a single error cell."""
+        self.paged_query = None
+        self.window_page_count = 0
+        self.clear(columns=True)
+        self.add_columns("Error")
+        self.add_rows([(message,)])
+
+    def apply_window(self, first_page: int, pages, cursor_row: int = None, scroll_y: float = None) -> None:
+        """Replace the rows in the grid with the given consecutive pages."""
+        pages = [page for page in pages if page]
+        column = self.cursor_column
+        # Clearing resets the scroll offset; don't let that slide the window
+        self.window_page_count = 0
+        self.clear()
+        row_number = first_page * self.paged_query.page_size
+        with tracer.span("grid.render", rows=sum(len(page) for page in pages)):
+            for page in pages:
+                for key, row in page:
+                    row_number += 1
+                    self.add_row(*self.paged_query.cells(row), key=str(key), label=str(row_number))
+        self.window_first_page = first_page
+        self.window_page_count = len(pages)
+
+        if cursor_row is not None and self.row_count:
+            cursor_row = min(max(cursor_row, 0), self.row_count - 1)
+            self.move_cursor(row=cursor_row, column=column, animate=False, scroll=scroll_y is None)
+        # Cursor and scroll events raised by the swap itself must not slide the window again
+        self.window_settling = True
+        self.call_after_refresh(self.settle_window, scroll_y)
+        self.update_window_subtitle()
+
+    def settle_window(self, scroll_y: float = None) -> None:
+        """Restore the viewport once the swapped-in rows have been laid out."""
+        if scroll_y is not None:
+            self.scroll_to(y=scroll_y, animate=False, immediate=True)
+        self.window_settling = False
+
+    def update_window_subtitle(self) -> None:
+        """Show which slice of the result is loaded in the border subtitle."""
+        if self.paged_query is None or not self.row_count:
+            self.border_subtitle = None
+            return
+        first_row = self.window_first_page * self.paged_query.page_size + 1
+        last_row = first_row + self.row_count - 1
+        last_page = self.window_first_page + self.window_page_count - 1
+        total = f" of {last_row}" if self.paged_query.is_last_page(last_page) else ""
+        view = f" · filter: {self.paged_query.filter_text}" if self.paged_query.filter_text else ""
+        if self.paged_query.truncated:
+            view += " · later rows not kept"
+        self.border_subtitle = f"Rows {first_row}-{last_row}{total}{view} · {self.app.result_cache.stats}"
+
+    def ensure_window(self, row: int) -> None:
+        """Slide the loaded window if the given grid row is on its edge page."""
+        if self.paged_query is None or not self.window_page_count or self.window_settling:
+            return
+        page_size = self.paged_query.page_size
+        page = self.window_first_page + row // page_size
+        window_last_page = self.window_first_page + self.window_page_count - 1
+
+        at_end = page >= window_last_page and not self.paged_query.is_last_page(window_last_page)
+        at_start = page <= self.window_first_page and self.window_first_page > 0
+        if at_end or at_start:
+            first_page = max(page - self.PREFETCH_PAGES, 0)
+            if first_page != self.window_first_page:
+                self.fetch_window(self.paged_query, first_page)
+
+    @work(thread=True, exclusive=True, group="window")
+    def fetch_window(self, paged_query: PagedQuery, first_page: int) -> None:
+        """Fetch a window of pages off the event loop and swap it into the grid."""
+        worker = get_current_worker()
+        last_page = first_page + 2 * self.PREFETCH_PAGES
+        try:
+            pages = paged_query.fetch_pages(first_page, last_page + 1 - first_page)
+        except sqlite3.Error as e:
+            self.app.call_from_thread(self.notify, f"Database error: {str(e)}", severity="error")
+            return
+        if not worker.is_cancelled:
+            self.app.call_from_thread(self.slide_window, paged_query, first_page, pages)
+
+    def slide_window(self, paged_query: PagedQuery, first_page: int, pages) -> None:
+        """Swap in a fetched window, keeping the cursor and viewport on the same rows."""
+        if paged_query is not self.paged_query:
+            return  # A different query has been loaded since the fetch started
+        shift = (self.window_first_page - first_page) * paged_query.page_size
+        self.apply_window(first_page, pages, self.cursor_row + shift, self.scroll_y + shift)
+
+    def on_data_table_header_selected(self, event: DataTable.HeaderSelected) -> None:
+        """Sort by the clicked column: ascending, then descending, then unsorted."""
+        self.cycle_sort(event.column_index)
+
+    def action_sort_cursor_column(self) -> None:
+        self.cycle_sort(self.cursor_column)
+
+    def cycle_sort(self, column_index: int) -> None:
+        if self.paged_query is None or column_index >= len(self.paged_query.columns):
+            return
+        column = self.paged_query.columns[column_index]
+        if self.sort is None or self.sort[0] != column:
+            sort = (column, False)
+        elif not self.sort[1]:
+            sort = (column, True)
         else:
-            # For SELECT queries, load data normally
-            self.load_data_from_db(query)
+            sort = None
+        self.apply_view(sort, self.filter_text)
+
+    def apply_view(self, sort, filter_text: str) -> None:
+        """Re-query the displayed result sorted and filtered in SQLite."""
+        if self.current_display_query is None or self.paged_query is None:
+            self.notify("Nothing to sort or filter", severity="warning")
+            return
+        execution = self.app.start_execution(f"Sorting and filtering {self.current_display_query}")
+        self.load_view(self.current_display_query, sort, filter_text, execution)
+
+    @work(thread=True, exclusive=True, group="view")
+    def load_view(self, query: str, sort, filter_text: str, execution: Execution) -> None:
+        """Open the sorted and filtered result off the event loop and show its first window."""
+        try:
+            paged_query, pages = self.prepare_query(query, execution, sort=sort, filter_text=filter_text)
+            if not execution.cancelled:
+                self.app.call_from_thread(self.show_query, query, paged_query, pages)
+        except (sqlite3.Error, ValueError) as e:
+            if execution.cancelled:
+                self.app.call_from_thread(self.notify, "Query cancelled", severity="warning")
+            else:
+                # Keep the unsorted, unfiltered rows on screen; the filter can be fixed and resubmitted
+                self.app.call_from_thread(self.notify, f"Could not sort or filter: {str(e)}", severity="error")
+        finally:
+            execution.finish()
+            self.app.call_from_thread(self.app.finish_execution, execution)
+
+    def show_row(self, table_name: str, rowid: int) -> None:
+        """Show a table with the cursor on one of its rows, e.g. a search hit."""
+        execution = self.app.start_execution(f"Opening {table_name} at row {rowid}")
+        self.load_row(table_name, rowid, execution)
+
+    @work(thread=True, exclusive=True, group="view")
+    def load_row(self, table_name: str, rowid: int, execution: Execution) -> None:
+        """Fetch the window of pages around a row off the event loop, then show it."""
+        query = f'SELECT * FROM "{table_name}"'
+        try:
+            paged_query = self.open_query(query, execution)
+            with self.app.connections.reader(execution) as conn:
+                position = conn.execute(f'SELECT count(*) FROM "{table_name}" WHERE rowid < ?', (rowid,)).fetchone()[0]
+            first_page = max(position // paged_query.page_size - self.PREFETCH_PAGES, 0)
+            pages = paged_query.fetch_pages(first_page, 2 * self.PREFETCH_PAGES + 1, execution)
+            if not execution.cancelled:
+                cursor_row = position - first_page * paged_query.page_size
+                self.app.call_from_thread(self.show_query, query, paged_query, pages, first_page, cursor_row)
+                self.app.call_from_thread(setattr, self, "border_title", f"Table: {table_name}")
+        except sqlite3.Error as e:
+            message = "Query cancelled" if execution.cancelled else f"Database error: {str(e)}"
+            self.app.call_from_thread(self.notify, message, severity="warning" if execution.cancelled else "error")
+        finally:
+            execution.finish()
+            self.app.call_from_thread(self.app.finish_execution, execution)
+
+    def on_mount(self) -> None:
+        self.border_title = 'Data Table'
+        self.watch(self, "scroll_y", self.on_scroll_y_changed, init=False)
+        # Load data on mount; the startup time is reported once it is drawn
+        self.load_data_from_db()
+
+    def on_data_table_cell_highlighted(self, event: DataTable.CellHighlighted) -> None:
+        """Page in more rows as the cursor approaches the edge of the window."""
+        # Ignore a cursor left off-screen by scrolling, or the window would bounce back to it
+        visible_rows = self.scrollable_content_region.height
+        if self.scroll_y <= self.cursor_row <= self.scroll_y + visible_rows:
+            self.ensure_window(self.cursor_row)
+        self.show_cell_value(event.value, event.cell_key.row_key.value, event.coordinate.column)
+
+    def show_cell_value(self, cell, key: str, column_index: int) -> None:
+        """Show a focused cell's whole value under the grid when the cell only shows part of it.
+
+        Previews cut in SQL are loaded in full off the event loop.
+        """
+        value = cell.value if isinstance(cell, Cell) else cell
+        section = self.app.query_one("#table_section")
+        if not has_more(value):
+            section.remove_class("inspecting")
+            return
+        panel = self.app.query_one("#value_panel", VerticalScroll)
+        view = self.app.query_one("#value_view", Static)
+        columns = self.ordered_columns
+        panel.border_title = str(columns[column_index].label) if column_index < len(columns) else "Value"
+        section.add_class("inspecting")
+        panel.scroll_home(animate=False)
+        if isinstance(value, Preview) and self.paged_query is not None:
+            view.update(describe_value(value.head, value.length))
+            self.load_cell_value(self.paged_query, key, column_index)
+        else:
+            view.update(describe_value(value))
+
+    @work(thread=True, exclusive=True, group="cell")
+    def load_cell_value(self, paged_query: PagedQuery, key: str, column_index: int) -> None:
+        """Fetch a previewed value off the event loop and show it if its cell is still focused."""
+        worker = get_current_worker()
+        try:
+            value, length = paged_query.fetch_value(int(key), column_index)
+        except sqlite3.Error as e:
+            self.app.call_from_thread(self.notify, f"Could not load the value: {str(e)}", severity="error")
+            return
+        if not worker.is_cancelled:
+            self.app.call_from_thread(self.show_loaded_value, paged_query, key, column_index, value, length)
+
+    def show_loaded_value(self, paged_query: PagedQuery, key: str, column_index: int, value, length) -> None:
+        if paged_query is not self.paged_query or not self.row_count:
+            return
+        cell_key = self.coordinate_to_cell_key(self.cursor_coordinate)
+        if cell_key.row_key.value == key and self.cursor_column == column_index:
+            self.app.query_one("#value_view", Static).update(describe_value(value, length))
+
+    def on_scroll_y_changed(self, scroll_y: float) -> None:
+        """Page in more rows as the viewport approaches the edge of the window."""
+        visible_rows = self.scrollable_content_region.height
+        if self.window_first_page > 0:
+            self.ensure_window(int(scroll_y))
+        self.ensure_window(int(scroll_y) + visible_rows)
+
+    def execute_query(self, query: str, execution: Execution = None):
+        """Execute a custom SQL query in a worker and update the table when it completes."""
+        if execution is None:
+            execution = Execution(query)
+        self.run_statement(query, execution)
+
+    @work(thread=True, group="execute")
+    def run_statement(self, query: str, execution: Execution) -> None:
+        """Run a statement or script off the event loop; the execution can interrupt it."""
+        profile = None
+        try:
+            statements = split_statements(query)
+            if len(statements) > 1:
+                self.run_script(statements, execution)
+                return
+            query = statements[0] if statements else query
+            if self.app.profile_mode:
+                profile = Profile(query)
+            with self.app.connections.reader() as conn:
+                effect = statement_effect(conn, query)
+                if profile is not None:
+                    profile.plan = explain_query_plan(conn, query)
+
+            if effect.writes:
+                # Execute the statement
+                delta = None
+                started_at = time.perf_counter()
+                with self.app.connections.writer(execution) as conn:
+                    total_changes = conn.total_changes
+                    # Track the rowids DML touches so the grid can be patched in place
+                    tracked = returning_statement(conn, query)
+                    if tracked is None:
+                        conn.execute(query)
+                    else:
+                        table_name, statement = tracked
+                        rowids = [row[0] for row in conn.execute(statement)]
+                    changes = conn.total_changes - total_changes
+                if tracked is not None and len(rowids) <= DELTA_ROW_LIMIT:
+                    with self.app.connections.reader() as conn:
+                        delta = fetch_delta(conn, table_name, rowids, changes)
+                if profile is None:
+                    self.app.call_from_thread(self.refresh_after_write, query, effect, delta)
+                else:
+                    profile.execute_seconds = time.perf_counter() - started_at
+                    profile.rows = changes
+                    profile.steps = execution.steps
+                    self.app.call_from_thread(self.show_profiled, profile, self.refresh_after_write, query, effect, delta)
+            else:
+                # Read-only statements (SELECT, WITH, read PRAGMAs...) load into the grid;
+                # a profiled run skips the result cache so it measures the database
+                started_at = time.perf_counter()
+                paged_query, pages = self.prepare_query(query, execution, use_cache=profile is None)
+                if not execution.cancelled:
+                    # The index advisor works from what has been run
+                    plan = [detail for _, _, detail in profile.plan] if profile is not None else None
+                    self.app.query_history.record(query, time.perf_counter() - started_at, plan)
+                if not execution.cancelled and profile is None:
+                    self.app.call_from_thread(self.show_query, query, paged_query, pages)
+                elif not execution.cancelled:
+                    profile.execute_seconds = paged_query.execute_seconds
+                    profile.fetch_seconds = paged_query.fetch_seconds
+                    profile.rows = sum(len(page) for page in pages)
+                    profile.steps = execution.steps
+                    self.app.call_from_thread(self.show_profiled, profile, self.show_query, query, paged_query, pages)
+
+        except sqlite3.Error as e:
+            if profile is not None:
+                profile.error = str(e)
+                profile.steps = execution.steps
+                self.app.call_from_thread(self.app.show_profile, profile)
+            if execution.cancelled:
+                self.app.call_from_thread(self.notify, "Query cancelled", severity="warning")
+            else:
+                self.app.call_from_thread(self.show_error, f"Database error: {str(e)}")
+        except Exception as e:
+            self.app.call_from_thread(self.show_error, f"Error: {str(e)}")
+        finally:
+            execution.finish()
+            self.app.call_from_thread(self.app.finish_execution, execution)
+            if profile is not None:
+                try:
+                    append_log(profile)
+                except OSError as e:
+                    self.app.call_from_thread(self.notify, f"Could not write profile log: {str(e)}", severity="warning")
+
+    def show_profiled(self, profile: Profile, show, *args) -> None:
+        """Run a grid update, time it as the profile's render phase, and show the profile."""
+        started_at = time.perf_counter()
+        show(*args)
+        profile.render_seconds = time.perf_counter() - started_at
+        self.app.show_profile(profile)
+
+    def run_script(self, statements, execution: Execution) -> None:
+        """Run several statements as one transaction, then refresh once and show how each went."""
+        started_at = time.perf_counter()
+        with self.app.connections.writer(execution) as conn:
+            results = run_script(conn, statements, self.app.script_savepoints, execution)
+        self.app.call_from_thread(self.show_script_results, results, time.perf_counter() - started_at)
+
+    def show_script_results(self, results, seconds: float) -> None:
+        """Refresh the explorer once and list each statement's rows and timing in the grid."""
+        self.app.refresh_explorer_after_ddl()
+        self.current_display_query = None
+        self.paged_query = None
+        self.sort = None
+        self.filter_text = ""
+        self.window_page_count = 0
+        self.clear(columns=True)
+        self.add_columns("#", "Statement", "Rows", "Time (ms)", "Result")
+        for number, result in enumerate(results, start=1):
+            text = " ".join(strip_comments(result.statement).split())
+            if result.skipped:
+                outcome = "skipped (the script is one transaction)"
+            else:
+                outcome = f"error: {result.error}" if result.error else "ok"
+            rows = "" if result.rows is None else f"{result.rows:,}"
+            self.add_row(number, text[:80], rows, f"{result.seconds * 1000:.1f}", outcome)
+        self.border_title = f"Script: {len(results)} statements"
+        self.border_subtitle = f"Committed in {seconds * 1000:.0f} ms"
+        failed = sum(1 for result in results if result.error)
+        if failed:
+            self.notify(f"Script committed; {failed} statement{'s' if failed != 1 else ''} rolled back", severity="warning")
+
+    def refresh_after_write(self, query: str, effect: StatementEffect, delta: RowDelta = None) -> None:
+        """Refresh the explorer and the grid after a DDL or DML statement."""
+        self.app.refresh_explorer_after_ddl(query)
+        
+        # After successful execution, refresh the table display
+        if effect.creates_table:
+            # For CREATE TABLE, show the new empty table structure
+            self.refresh_display_after_ddl()
+        elif effect.drops_table:
+            # After DROP, show the default table or empty display
+            self.current_display_query = None
+            self.load_data_from_db()
+        elif delta is None or written_table(query) is None or not self.apply_delta(delta):
+            # Anything but DML patched in place reloads the current table view
+            self.refresh_current_table_view()
+
+    def apply_delta(self, delta: RowDelta) -> bool:
+        """Patch the touched rows into the grid in place, keeping cursor and scroll.
+
+        Only works when the grid shows the written table paged by rowid, where
+        the grid's row keys are rowids. Returns False if the change can't be
+        applied safely and the view should be reloaded instead.
+        """
+        paged_query = self.paged_query
+        if (paged_query is None or not paged_query.keyset
+                or paged_query.table_name.lower() != delta.table_name.lower()):
+            return False
+        if delta.changes is not None and delta.changes != len(delta.rows):
+            return False  # Rows changed that RETURNING didn't report, e.g. by a trigger or cascade
+        if paged_query.sort is not None or paged_query.filter_text:
+            return False  # A changed row may now sort elsewhere or no longer match
+
+        keys = [int(row_key.value) for row_key in self.rows]
+        window_last_page = self.window_first_page + self.window_page_count - 1
+        at_end = not keys or paged_query.is_last_page(window_last_page)
+        updated, removed, appended = [], [], []
+        for rowid, row in sorted(delta.rows.items()):
+            if str(rowid) in self.rows:
+                (removed if row is None else updated).append((rowid, row))
+            elif row is None or (keys and rowid < keys[0]):
+                continue  # Gone, or before the loaded window
+            elif not keys or rowid > keys[-1]:
+                if at_end:
+                    appended.append((rowid, row))
+            else:
+                return False  # A new row in the middle of the window
+
+        columns = self.ordered_columns
+        for rowid, row in updated:
+            for column, cell in zip(columns, paged_query.cells(row)):
+                self.update_cell(str(rowid), column.key, cell)
+        for rowid, _ in removed:
+            self.remove_row(str(rowid))
+        row_number = self.window_first_page * paged_query.page_size + self.row_count
+        for rowid, row in appended:
+            row_number += 1
+            self.add_row(*paged_query.cells(row), key=str(rowid), label=str(row_number))
+
+        # Pages fetched before the write are stale; the window itself is now current
+        paged_query.cache.clear()
+        paged_query.page_keys.clear()
+        if appended:
+            paged_query.last_page = None
+        self.update_window_subtitle()
+        return True
     
     def refresh_current_table_view(self):
         """Refresh the current table view after DML operations."""
         if not self.current_display_query:
             self.load_data_from_db()
             return
-            
+        self.reload_view(
+            self.current_display_query, self.sort, self.filter_text,
+            self.window_first_page, self.cursor_row, self.scroll_y,
+        )
+
+    @work(thread=True, exclusive=True, group="view")
+    def reload_view(self, query: str, sort, filter_text: str, first_page: int, cursor_row: int, scroll_y: float) -> None:
+        """Re-open the displayed query off the event loop and reload the same window with fresh data."""
+        worker = get_current_worker()
         try:
-            # Get fresh data
-            conn = sqlite3.connect(self.database_path)
-            cursor = conn.cursor()
-            cursor.execute(self.current_display_query)
-            columns = [description[0] for description in cursor.description]
-            rows = cursor.fetchall()
-            conn.close()
-            
-            # Force complete table rebuild
-            self.clear(columns=True)  # Clear both data and columns
-            self.add_columns(*columns)
-            
-            if rows:
-                self.add_rows(rows)
-            
-            self.zebra_stripes = True
-                
+            paged_query = self.open_query(query, sort=sort, filter_text=filter_text)
+            last_page = first_page + 2 * self.PREFETCH_PAGES
+            pages = paged_query.fetch_pages(first_page, last_page + 1 - first_page)
         except Exception as e:
-            # Fallback - try to re-execute the same query through load_data_from_db
+            # Fallback - re-execute the same query from its first page
             try:
-                self.load_data_from_db(self.current_display_query)
-            except Exception as e2:
+                paged_query, pages = self.prepare_query(query)
+            except Exception:
                 # Last resort: clear everything and show error
-                self.clear(columns=True)
-                self.add_column("Error")
-                self.add_row(f"Refresh failed: {str(e)}")
-    
+                self.app.call_from_thread(self.show_error, f"Refresh failed: {str(e)}")
+                return
+            first_page = cursor_row = 0
+            scroll_y = None
+        if not worker.is_cancelled:
+            self.app.call_from_thread(self.show_reloaded, query, paged_query, first_page, pages, cursor_row, scroll_y)
+
+    def show_reloaded(self, query: str, paged_query: PagedQuery, first_page: int, pages, cursor_row: int, scroll_y) -> None:
+        """Swap a reloaded query into the grid, keeping the cursor and viewport."""
+        if query != self.current_display_query:
+            return  # Something else was shown while the reload ran
+        # Force complete table rebuild
+        self.paged_query = paged_query
+        self.sort = paged_query.sort
+        self.filter_text = paged_query.filter_text
+        self.window_page_count = 0
+        self.clear(columns=True)  # Clear both data and columns
+        self.add_columns(*self.column_labels(paged_query))
+        self.apply_window(first_page, pages, cursor_row, scroll_y)
+
+        self.zebra_stripes = True
+
     def refresh_display_after_ddl(self):
         """Refresh the display after DDL operations like CREATE TABLE."""
+        self.load_table_structure()
+
+    @work(thread=True, exclusive=True, group="view")
+    def load_table_structure(self) -> None:
+        """Read the newest table's columns off the event loop, then show it empty."""
+        worker = get_current_worker()
         try:
-            conn = sqlite3.connect(self.database_path)
-            cursor = conn.cursor()
-            
-            # Get the most recently created table
-            cursor.execute("SELECT name FROM sqlite_master WHERE type='table' ORDER BY name;")
-            tables = cursor.fetchall()
-            
-            if tables:
+            with self.app.connections.reader() as conn:
+                cursor = conn.cursor()
+
+                # Get the most recently created table
+                cursor.execute("SELECT name FROM sqlite_master WHERE type='table' ORDER BY name;")
+                tables = cursor.fetchall()
+                if not tables:
+                    return
+
                 # Show the last table (most recently created)
                 table_name = tables[-1][0]
                 query = f"SELECT * FROM {table_name}"
-                self.current_display_query = query
-                
                 cursor.execute(query)
                 columns = [description[0] for description in cursor.description]
-                
-                self.clear()
-                self.add_columns(*columns)
-                # Don't add any rows - just show the empty table structure
-                self.zebra_stripes = True
-            
-            conn.close()
-            
-        except Exception as e:
+                cursor.close()
+        except Exception:
             # Fallback to default display
-            self.load_data_from_db()
+            self.app.call_from_thread(self.load_data_from_db)
+            return
+        if not worker.is_cancelled:
+            self.app.call_from_thread(self.show_table_structure, query, columns)
 
-    def on_mount(self) -> None:
-        self.border_title = 'Data Table'
-        # Load data on mount
-        self.load_data_from_db()
+    def show_table_structure(self, query: str, columns) -> None:
+        """Show a table's columns without any rows."""
+        self.current_display_query = query
+        self.sort = None
+        self.filter_text = ""
+        self.paged_query = None
+        self.window_page_count = 0
+        self.clear()
+        self.add_columns(*columns)
+        # Don't add any rows - just show the empty table structure
+        self.zebra_stripes = True
 
 class AppFooter(Footer):
     def action_toggle_dark(self) -> None:
@@ -377,6 +1058,12 @@ class InfotronApp(App):
 
     BINDINGS = [
         ("ctrl+d", "toggle_dark", "Toggle dark mode"),
+        Binding("escape", "cancel_query", "Cancel query", priority=True),
+        ("ctrl+r", "toggle_ai_direct_mode", "AI answer/direct"),
+        ("ctrl+o", "toggle_profile_mode", "Profile"),
+        ("ctrl+f", "toggle_filter_bar", "Filter"),
+        ("ctrl+k", "toggle_search_bar", "Search"),
+        ("ctrl+t", "toggle_stats_panel", "Stats"),
     ]
     
     CSS = """
@@ -387,21 +1074,55 @@ Screen {
     grid-gutter: 1;
 }
 
-#sidebar {
+#sidebar_section {
     column-span: 1;
     row-span: 4;
+}
+
+#search_bar {
+    display: none;
+}
+
+#sidebar_section.searching #search_bar {
+    display: block;
+}
+
+#sidebar {
     background: $surface;
     border: solid $primary;
     border-title-align: center;
-    height: 100%;
+    height: 1fr;
 }
 
-#main_table {
+#table_section {
     column-span: 3;
     row-span: 2;
+    height: 100%;
+}
+
+#main_table {
     border: solid $primary;
     border-title-align: center;
-    height: 100%;
+    height: 1fr;
+}
+
+#filter_bar {
+    display: none;
+}
+
+#table_section.filtering #filter_bar {
+    display: block;
+}
+
+#value_panel {
+    display: none;
+    height: 10;
+    border: solid $secondary;
+    border-title-align: center;
+}
+
+#table_section.inspecting #value_panel {
+    display: block;
 }
 
 #query_section {
@@ -412,6 +1133,42 @@ Screen {
     border-title-align: center;
 }
 
+Screen.profiling #query_section {
+    column-span: 2;
+}
+
+#profile_panel {
+    display: none;
+    column-span: 1;
+    row-span: 2;
+    border: solid $secondary;
+    border-title-align: center;
+}
+
+Screen.profiling #profile_panel {
+    display: block;
+}
+
+#stats_panel {
+    display: none;
+    column-span: 1;
+    row-span: 2;
+    border: solid $secondary;
+    border-title-align: center;
+}
+
+Screen.stats #query_section {
+    column-span: 2;
+}
+
+Screen.stats.profiling #query_section {
+    column-span: 1;
+}
+
+Screen.stats #stats_panel {
+    display: block;
+}
+
 #query_section > Horizontal {
     align: left top;
 }
@@ -444,6 +1201,13 @@ Screen {
     text-style: bold;
 }
 
+#execution_status {
+    height: 1;
+    width: auto;
+    margin: 0 1;
+    color: $warning;
+}
+
 #toggle_btn {
     height: 1;
     width: 10;
@@ -464,15 +1228,37 @@ Footer {
 }
 """
 
-    def __init__(self, **kwargs):
+    def __init__(self, database_path: str = None, **kwargs):
         super().__init__(**kwargs)
+        self.connections = get_manager(database_path)  # Shared, tuned SQLite connections
+        self.result_cache = ResultCache(self.connections)  # Results reused until the data changes
         self.is_ai_mode = False  # Track current mode
         self.query_editor_text = ""  # Store SQL editor content
         self.ai_input_text = ""  # Store AI input content
+        self.current_execution = None  # The SQL or AI execution still running, if any
+        self.startup_seconds = None  # Cold start to the first rendered table
+        self.ai_direct_mode = False  # Run generated SQL into the grid instead of asking for an answer
+        self.script_savepoints = SCRIPT_SAVEPOINTS  # Let a script continue past a failing statement
+        self.profile_mode = False  # Profile each executed statement into the profile panel
+        self.query_history = QueryHistory()  # Read queries run, for the index advisor
+        self.advised_version = 0  # History version the current index advice was drawn from
+        self.search_index = SearchIndex(self.connections)  # Opt-in full-text search, see `.search on`
+        self.search_execution = None  # The search index build running in the background, if any
+        self.column_stats = ColumnStatsCache(self.connections)  # Per-column profiles, shown in the explorer
+        get_service(self.connections, self.column_stats)  # AI prompts describe tables from the same profiles
+        self.snapshot_mode = False  # Serve reads from a tmpfs copy of the database, see `.snapshot on`
+        self.snapshot_execution = None  # The snapshot copy running in the background, if any
 
     def compose(self) -> ComposeResult:
-        yield Explorer(id='sidebar')
-        yield DisplayTable(id='main_table')
+        with Vertical(id='sidebar_section'):
+            yield Input(placeholder="Search all tables (Enter)", id='search_bar')
+            yield Explorer(id='sidebar')
+        with Vertical(id='table_section'):
+            yield DisplayTable(id='main_table')
+            with VerticalScroll(id='value_panel'):
+                yield Static("", id='value_view')
+            yield Input(placeholder="Filter, e.g. age >= 30, name ~ smi, email is null, or any text (Enter to apply)",
+                        id='filter_bar')
         
         # Create a container for the query editor and button
         with Vertical(id='query_section') as query_section:
@@ -480,9 +1266,18 @@ Footer {
             with Horizontal():
                 yield Static("▶ Execute", id='execute_btn', classes="clickable")
                 yield Static("▶ Clear", id='clear_btn', classes="clickable")
+                yield Static("", id='execution_status')
                 yield Static("▶ AI", id='toggle_btn', classes="clickable")
             yield QueryEditor(id='current_editor')
-            
+
+        with VerticalScroll(id='profile_panel') as profile_panel:
+            profile_panel.border_title = 'Profile'
+            yield Static("Execute a query to profile it", id='profile_view')
+
+        with VerticalScroll(id='stats_panel') as stats_panel:
+            stats_panel.border_title = 'Stats'
+            yield Static("", id='stats_view')
+
         yield AppFooter()
 
     async def toggle_editor_mode(self) -> None:
@@ -511,9 +1306,10 @@ Footer {
             # Restore query editor text
             new_editor.text = self.query_editor_text
         else:
-            # Switch to AI Editor
+            # Switch to AI Editor, building the AI stack now if it isn't already
+            self.warm_up_ai()
             new_editor = AiEditor(id='current_editor')
-            query_section.border_title = 'AI Editor'
+            query_section.border_title = self.ai_editor_title()
             toggle_btn.update("▶ SQL")
             self.is_ai_mode = True
             # Restore AI input text (but only if it's not the placeholder)
@@ -526,6 +1322,48 @@ Footer {
         # Add new editor
         query_section.mount(new_editor)
 
+    def on_mount(self) -> None:
+        self.set_interval(0.1, self.update_execution_status)
+        self.set_interval(ADVISOR_INTERVAL, self.advise_indexes)
+        self.set_interval(1.0, self.update_stats_panel)
+        self.set_interval(1.0, self.check_snapshot)
+        # Resume an unfinished search index build, or catch up with schema changes made elsewhere
+        self.build_search_index()
+        if SNAPSHOT_ON_START:
+            self.sync_snapshot()
+
+    def on_unmount(self) -> None:
+        # Stop long-running work, such as an import, before its connections close
+        if self.current_execution is not None:
+            self.current_execution.cancel()
+        if self.search_execution is not None:
+            self.search_execution.cancel()
+        if self.snapshot_execution is not None:
+            self.snapshot_execution.cancel()
+        self.connections.close()
+
+    def report_startup(self) -> None:
+        """Report cold start time once the first table has been drawn, then warm up the AI."""
+        if self.startup_seconds is not None:
+            return
+        self.startup_seconds = time.perf_counter() - STARTED_AT
+        self.log(f"Cold start to first rendered table: {self.startup_seconds * 1000:.0f} ms")
+        self.notify(f"Ready in {self.startup_seconds * 1000:.0f} ms", timeout=3)
+        self.warm_up_ai()
+
+    @work(thread=True, exclusive=True, group="ai_warm_up")
+    def warm_up_ai(self) -> None:
+        """Build the AI stack in the background so the first question doesn't wait for it."""
+        service = get_service()
+        if service.ready:
+            return
+        try:
+            service.ensure_ready()
+        except Exception as e:
+            self.call_from_thread(self.notify, f"AI unavailable: {str(e)}", severity="warning")
+            return
+        self.log(f"AI stack built in {service.build_seconds * 1000:.0f} ms")
+
     def action_execute_query(self) -> None:
         """Execute the SQL query or AI query depending on current mode."""
         current_editor = self.query_one("#current_editor")
@@ -534,40 +1372,480 @@ Footer {
             # AI mode - use natural language query
             user_input = current_editor.text.strip()
             if user_input:
-                try:
-                    # Query the database using AI
-                    #current_editor.set_response(user_input)
-                    result = query_database(user_input)
-                    current_editor.set_response(str(result))
-                    
-                    """
-
-                    if result['success']:
-                        # Display the AI response
-                        response_text = result['answer']
-                        if result['sql_query']:
-                            response_text += f"\n\n--- Generated SQL ---\n{result['sql_query']}"
-                        
-                        current_editor.set_response(response_text)
-                        
-                        # Optionally, if there's a SQL query, execute it to show results in the table
-                        if result['sql_query']:
-                            data_table = self.query_one("#main_table", DisplayTable)
-                            data_table.execute_query(result['sql_query'])
-                    else:
-                        # Display error message
-                        current_editor.set_response(result['answer'])
-
-                    """
-                        
-                except Exception as e:
-                    current_editor.set_response(f"Error processing AI query: {str(e)}")
+                execution = self.start_execution(user_input)
+                if self.ai_direct_mode:
+                    self.run_ai_direct(user_input, execution)
+                else:
+                    self.run_ai_query(user_input, execution)
         else:
             # SQL mode - execute SQL directly
             data_table = self.query_one("#main_table", DisplayTable)
             query = current_editor.text.strip()
-            if query:
-                data_table.execute_query(query)
+            if query.startswith("."):
+                self.run_dot_command(query)
+            elif query:
+                execution = self.start_execution(query)
+                data_table.execute_query(query, execution)
+
+    def run_dot_command(self, command: str) -> None:
+        """Run a dot-command typed into the SQL editor, e.g. `.import people.csv people`."""
+        try:
+            words = shlex.split(command)
+        except ValueError as e:
+            self.notify(f"Invalid command: {str(e)}", severity="error")
+            return
+        if words[0] == ".import" and len(words) in (2, 3):
+            path = os.path.expanduser(words[1])
+            table_name = words[2] if len(words) == 3 else default_table_name(path)
+            self.run_import(path, table_name, self.start_execution(command))
+        elif words[0] == ".export" and len(words) >= 2:
+            # Everything after the file is the query; without one, export what the grid shows
+            query = command.split(None, 2)[2].strip() if len(words) > 2 else None
+            query = query or self.query_one("#main_table", DisplayTable).current_display_query
+            if not query:
+                self.notify("Nothing to export", severity="warning")
+                return
+            self.run_export(query, os.path.expanduser(words[1]), self.start_execution(command))
+        elif words == [".advise"]:
+            self.notify("Analyzing query history…")
+            self.advise_indexes(report=True)
+        elif words[0] == ".search" and len(words) >= 2:
+            if words[1:] == ["on"]:
+                self.enable_search()
+            elif words[1:] == ["off"]:
+                self.disable_search()
+            else:
+                self.run_search(command.split(None, 1)[1])
+        elif words[0] == ".snapshot" and words[1:] in (["on"], ["sync"]):
+            self.sync_snapshot()
+        elif words == [".snapshot", "off"]:
+            self.stop_snapshot()
+        else:
+            self.notify("Usage: .import FILE [TABLE], .export FILE [SQL], .advise, .search on|off|WORDS "
+                        "or .snapshot on|off|sync", severity="warning")
+
+    @work(thread=True, group="import")
+    def run_import(self, path: str, table_name: str, execution: Execution) -> None:
+        """Stream a CSV/JSONL file into a table, reporting rows/sec as it goes."""
+        def report(rows, elapsed):
+            execution.progress = f"{rows:,} rows · {rows / elapsed if elapsed else 0:,.0f} rows/s"
+
+        try:
+            result = import_file(self.connections, path, table_name, progress=report, execution=execution)
+        except Exception as e:
+            message = "Import cancelled" if execution.cancelled else f"Import failed: {str(e)}"
+            self.call_from_thread(self.notify, message, severity="warning" if execution.cancelled else "error")
+            # Batches committed before the failure are kept, so the explorer may still be stale
+            self.call_from_thread(self.refresh_explorer_after_ddl)
+        else:
+            self.call_from_thread(self.finish_import, result)
+        finally:
+            execution.finish()
+            self.call_from_thread(self.finish_execution, execution)
+
+    @work(thread=True, group="export")
+    def run_export(self, query: str, path: str, execution: Execution) -> None:
+        """Stream a query's result into a CSV/JSONL file, reporting rows/sec as it goes."""
+        def report(rows, elapsed):
+            execution.progress = f"{rows:,} rows · {rows / elapsed if elapsed else 0:,.0f} rows/s"
+
+        try:
+            result = export_query(self.connections, query, path, progress=report, execution=execution)
+        except Exception as e:
+            message = "Export cancelled" if execution.cancelled else f"Export failed: {str(e)}"
+            self.call_from_thread(self.notify, message, severity="warning" if execution.cancelled else "error")
+        else:
+            self.call_from_thread(
+                self.notify,
+                f"Exported {result.rows:,} rows to {result.path} in {result.seconds:.1f}s "
+                f"({result.rows_per_second:,.0f} rows/s)",
+            )
+        finally:
+            execution.finish()
+            self.call_from_thread(self.finish_execution, execution)
+
+    @work(thread=True, exclusive=True, group="advisor")
+    def advise_indexes(self, report: bool = False) -> None:
+        """Suggest indexes from the query history; in the background unless asked for."""
+        entries, version = self.query_history.snapshot()
+        if version == self.advised_version and not report:
+            return  # Nothing new has run since the last analysis
+        try:
+            suggestions = suggest_indexes(self.connections, entries)
+        except sqlite3.Error as e:
+            if report:
+                self.call_from_thread(self.notify, f"Index advisor failed: {str(e)}", severity="error")
+            return
+        self.advised_version = version
+        self.call_from_thread(self.show_index_advice, suggestions)
+        if report:
+            count = len(suggestions)
+            message = f"{count} index suggestion{'s' if count != 1 else ''} in the explorer" if count else "No indexes to suggest"
+            self.call_from_thread(self.notify, message)
+
+    @work(thread=True, group="advisor_apply")
+    def apply_index_suggestion(self, node: TreeNode) -> None:
+        """Create a suggested index, then ANALYZE and PRAGMA optimize."""
+        suggestion = node.data["suggestion"]
+        try:
+            apply_suggestion(self.connections, suggestion)
+        except sqlite3.Error as e:
+            self.call_from_thread(self.notify, f"Could not create index: {str(e)}", severity="error")
+            return
+        self.call_from_thread(self.finish_index_suggestion, node)
+
+    def show_index_advice(self, suggestions) -> None:
+        self.query_one("#sidebar", Explorer).set_index_advice(suggestions)
+
+    def finish_index_suggestion(self, node: TreeNode) -> None:
+        """Drop an applied suggestion from the explorer and show its new index."""
+        self.query_one("#sidebar", Explorer).remove_index_advice(node)
+        self.refresh_explorer_after_ddl()
+        self.notify(f"Created {node.data['suggestion'].name} and refreshed the planner statistics")
+
+    @work(thread=True, group="search_setup")
+    def enable_search(self) -> None:
+        """Turn search on for this database and index it in the background."""
+        try:
+            self.search_index.enable()
+        except sqlite3.Error as e:
+            self.call_from_thread(self.notify, f"Could not enable search: {str(e)}", severity="error")
+            return
+        self.call_from_thread(self.build_search_index)
+
+    @work(thread=True, group="search_setup")
+    def disable_search(self) -> None:
+        """Stop any build, then drop the search indexes and their triggers."""
+        if self.search_execution is not None:
+            self.search_execution.cancel()
+        try:
+            self.search_index.disable()
+        except sqlite3.Error as e:
+            self.call_from_thread(self.notify, f"Could not disable search: {str(e)}", severity="error")
+            return
+        self.call_from_thread(self.notify, "Search is off and its indexes are dropped")
+
+    def build_search_index(self) -> None:
+        """Bring the search indexes up to date in the background, if search is on."""
+        if self.search_execution is not None:
+            return  # The running build syncs with the schema before each table
+        self.search_execution = Execution("Building the search index")
+        self.run_search_build(self.search_execution)
+
+    @work(thread=True, group="search_build")
+    def run_search_build(self, execution: Execution) -> None:
+        """Index table after table, re-reading the schema in between; cancelling keeps what's done."""
+        def report(table_name, fraction):
+            execution.progress = f"indexing {table_name} for search {fraction:.0%}"
+
+        built = 0
+        try:
+            if not self.search_index.enabled():
+                return
+            while not execution.cancelled:
+                pending = self.search_index.sync()
+                if not pending:
+                    break
+                self.search_index.build_table(pending[0], report, execution)
+                built += 1
+        except sqlite3.Error as e:
+            if not execution.cancelled:
+                self.call_from_thread(self.notify, f"Search index build stopped: {str(e)}", severity="warning")
+        finally:
+            execution.finish()
+            self.call_from_thread(self.finish_search_build, execution, built)
+
+    def finish_search_build(self, execution: Execution, built: int) -> None:
+        if execution is self.search_execution:
+            self.search_execution = None
+        if built and not execution.cancelled:
+            self.notify(f"Search index ready ({execution.elapsed:.1f}s)")
+
+    def sync_snapshot(self) -> None:
+        """Copy the database into a fresh snapshot in the background, then read from it."""
+        if self.snapshot_execution is not None:
+            self.notify("The snapshot is already being copied")
+            return
+        self.snapshot_mode = True
+        self.snapshot_execution = Execution("Copying the database into a snapshot")
+        self.run_snapshot_sync(self.snapshot_execution)
+
+    @work(thread=True, group="snapshot")
+    def run_snapshot_sync(self, execution: Execution) -> None:
+        """Copy with the backup API, reporting how far it got; reads keep using the old file meanwhile."""
+        def report(fraction):
+            execution.progress = f"snapshot {fraction:.0%}"
+
+        resync = self.connections.snapshot_path is not None
+        synced = False
+        try:
+            self.connections.sync_snapshot(report, execution)
+            synced = True
+        except (sqlite3.Error, OSError) as e:
+            if not execution.cancelled:
+                self.call_from_thread(self.notify, f"Snapshot failed: {str(e)}", severity="error")
+        finally:
+            execution.finish()
+            self.call_from_thread(self.finish_snapshot_sync, execution, synced, resync)
+
+    def finish_snapshot_sync(self, execution: Execution, synced: bool, resync: bool) -> None:
+        if execution is self.snapshot_execution:
+            self.snapshot_execution = None
+        if not synced:
+            # Keep reading from an earlier snapshot if there is one; otherwise don't retry
+            self.snapshot_mode = self.snapshot_mode and self.connections.snapshot_path is not None
+            return
+        if not self.snapshot_mode:
+            self.connections.drop_snapshot()  # Turned off while it was copying
+            return
+        self.notify(f"Reading from a snapshot in {SNAPSHOT_DIR} (copied in {execution.elapsed:.1f}s)")
+        if resync:
+            # Show whatever changed in the file since the last copy
+            self.query_one("#sidebar", Explorer).refresh_structure()
+            self.query_one("#main_table", DisplayTable).refresh_current_table_view()
+
+    def stop_snapshot(self) -> None:
+        """Go back to reading the file itself."""
+        self.snapshot_mode = False
+        if self.snapshot_execution is not None:
+            self.snapshot_execution.cancel()
+        self.connections.drop_snapshot()
+        self.notify("Snapshot mode is off; reading from the database file")
+
+    def check_snapshot(self) -> None:
+        """Resync a snapshot that was dropped because a write couldn't be replayed into it."""
+        if self.snapshot_mode and self.connections.snapshot_path is None and self.snapshot_execution is None:
+            self.notify(f"Resyncing the snapshot: {self.connections.snapshot_error}", severity="warning")
+            self.sync_snapshot()
+
+    @work(thread=True, exclusive=True, group="search")
+    def run_search(self, text: str) -> None:
+        """Search every indexed table and list the hits in the explorer."""
+        try:
+            if not self.search_index.enabled():
+                self.call_from_thread(
+                    self.notify, "Search is off; run .search on to index this database's text columns",
+                    severity="warning",
+                )
+                return
+            results = self.search_index.search(text)
+        except sqlite3.Error as e:
+            self.call_from_thread(self.notify, f"Search failed: {str(e)}", severity="error")
+            return
+        self.call_from_thread(self.show_search_results, text, results)
+        if self.search_execution is not None:
+            self.call_from_thread(self.notify, "The search index is still being built; results may be incomplete")
+
+    def show_search_results(self, text: str, results) -> None:
+        self.query_one("#sidebar", Explorer).set_search_results(text, results)
+
+    def finish_import(self, result) -> None:
+        """Refresh the explorer once and show the imported table."""
+        self.refresh_explorer_after_ddl()
+        data_table = self.query_one("#main_table", DisplayTable)
+        data_table.border_title = f"Table: {result.table_name}"
+        data_table.load_data_from_db(f'SELECT * FROM "{result.table_name}"')
+        self.notify(
+            f"Imported {result.rows:,} rows into {result.table_name} in {result.seconds:.1f}s "
+            f"({result.rows_per_second:,.0f} rows/s)"
+        )
+        if result.skipped_fields:
+            self.notify(
+                f"Skipped fields with no column: {', '.join(map(str, result.skipped_fields))}", severity="warning"
+            )
+
+    @work(group="ai")
+    async def run_ai_query(self, question: str, execution: Execution) -> None:
+        """Stream each stage of the AI answer into the response pane as it happens."""
+        # Cancelling the worker cancels the pending LLM request outright
+        execution.cancel_callbacks.append(get_current_worker().cancel)
+        headings = {
+            "schema": "--- Schema sent: ",
+            "sql": "\n\n--- Generated SQL ---\n",
+            "cached_sql": "\n\n--- Cached SQL (schema unchanged) ---\n",
+            "checked_sql": "\n\n--- Checked SQL ---\n",
+            "rows": "\n\n--- Rows returned: ",
+            "answer": "\n\n--- Answer ---\n",
+        }
+        self.show_ai_response("")
+        stage = None
+        try:
+            # Query the database using AI
+            async for next_stage, text in get_service().astream_query(question):
+                if next_stage != stage:
+                    self.append_ai_response(headings[next_stage])
+                    stage = next_stage
+                self.append_ai_response(text)
+        except asyncio.CancelledError:
+            # A superseded answer must not write into its successor's response
+            if execution is self.current_execution:
+                self.append_ai_response("\n\n(cancelled)")
+            raise
+        except Exception as e:
+            self.append_ai_response(f"\n\nError processing AI query: {str(e)}")
+        finally:
+            execution.finish()
+            self.finish_execution(execution)
+
+    @work(group="ai")
+    async def run_ai_direct(self, question: str, execution: Execution) -> None:
+        """Generate SQL with one LLM call, check it locally and run it into the data table."""
+        execution.cancel_callbacks.append(get_current_worker().cancel)
+        service = get_service()
+        self.show_ai_response("")
+        try:
+            # A question asked before under the same schema skips the LLM entirely
+            fingerprint, sql = await asyncio.to_thread(service.lookup_sql, question)
+            if sql is not None:
+                self.append_ai_response(f"--- Cached SQL (schema unchanged) ---\n{sql}")
+            else:
+                llm_inputs = await service.prompt_inputs(question)
+                self.append_ai_response(f"--- Schema sent: {llm_inputs['schema_report']}\n\n")
+                sql = await service.generate_sql(llm_inputs)
+                self.append_ai_response(f"--- Generated SQL ---\n{sql}")
+            await asyncio.to_thread(service.validate_sql, sql)
+            await asyncio.to_thread(service.remember_sql, question, fingerprint, sql)
+        except asyncio.CancelledError:
+            if execution is self.current_execution:
+                self.append_ai_response("\n\n(cancelled)")
+            execution.finish()
+            self.finish_execution(execution)
+            raise
+        except Exception as e:
+            self.append_ai_response(f"\n\nError processing AI query: {str(e)}")
+            execution.finish()
+            self.finish_execution(execution)
+            return
+
+        # The same execution carries on into the grid, so it can still be cancelled
+        self.append_ai_response("\n\n--- Results are shown in the data table ---")
+        data_table = self.query_one("#main_table", DisplayTable)
+        data_table.execute_query(sql, execution)
+
+    def show_ai_response(self, response: str) -> None:
+        """Show a response in the AI editor, if it is still the active editor."""
+        current_editor = self.query_one("#current_editor")
+        if isinstance(current_editor, AiEditor):
+            current_editor.set_response(response)
+
+    def append_ai_response(self, text: str) -> None:
+        """Append to the response in the AI editor, if it is still the active editor."""
+        current_editor = self.query_one("#current_editor")
+        if isinstance(current_editor, AiEditor):
+            current_editor.append_response(text)
+
+    def start_execution(self, description: str) -> Execution:
+        """Track a new execution. A newer execution supersedes (cancels) a running one."""
+        if self.current_execution is not None:
+            self.current_execution.cancel()
+        if self.profile_mode:
+            self.current_execution = Execution(description, progress_steps=PROFILE_PROGRESS_STEPS)
+        else:
+            self.current_execution = Execution(description)
+        self.update_execution_status()
+        self.refresh_bindings()
+        return self.current_execution
+
+    def finish_execution(self, execution: Execution) -> None:
+        """Stop tracking an execution once its worker is done."""
+        if execution is self.current_execution:
+            self.current_execution = None
+            self.update_execution_status()
+        self.refresh_bindings()
+
+    def update_execution_status(self) -> None:
+        """Show the elapsed time and progress of the running execution."""
+        execution = self.current_execution
+        try:
+            status = self.query_one("#execution_status", Static)
+        except NoMatches:
+            return  # Not mounted, e.g. while the app shuts down
+        if execution is None:
+            search = self.search_execution
+            search_status = f"🔍 {search.progress}" if search is not None and search.progress else ""
+            status.update(" ".join(filter(None, (search_status, self.snapshot_status()))))
+            return
+        if execution.progress:
+            progress = f" · {execution.progress}"
+        else:
+            progress = f" · {execution.steps:,} steps" if execution.steps else ""
+        status.update(f"⏳ {execution.elapsed:.1f}s{progress} (Esc to cancel)")
+
+    def snapshot_status(self) -> str:
+        """How far the snapshot copy got, or how long ago the snapshot was copied."""
+        copying = self.snapshot_execution
+        if copying is not None:
+            return f"📸 {copying.progress or 'snapshot…'}"
+        age = self.connections.snapshot_age
+        if not self.snapshot_mode or age is None:
+            return ""
+        if age < 60:
+            return f"📸 {age:.0f}s old"
+        return f"📸 {age / 60:.0f}m old" if age < 3600 else f"📸 {age / 3600:.1f}h old"
+
+    def ai_editor_title(self) -> str:
+        return 'AI Editor (direct → table)' if self.ai_direct_mode else 'AI Editor (answer)'
+
+    def action_toggle_ai_direct_mode(self) -> None:
+        """Switch AI questions between answered-in-text and run-straight-into-the-table."""
+        self.ai_direct_mode = not self.ai_direct_mode
+        if self.is_ai_mode:
+            self.query_one("#query_section", Vertical).border_title = self.ai_editor_title()
+        self.notify(f"AI mode: {'direct (SQL runs into the table)' if self.ai_direct_mode else 'answer'}")
+
+    def action_toggle_profile_mode(self) -> None:
+        """Show or hide the profile panel; while shown, executed statements are profiled."""
+        self.profile_mode = not self.profile_mode
+        self.screen.set_class(self.profile_mode, "profiling")
+        self.notify(f"Profiling {'on' if self.profile_mode else 'off'}")
+
+    def toggle_input_bar(self, section_id: str, class_name: str, input_id: str, widget_id: str) -> None:
+        """Show an input bar and focus it, or hide it and focus the widget it belongs to."""
+        section = self.query_one(section_id, Vertical)
+        shown = not section.has_class(class_name)
+        section.set_class(shown, class_name)
+        self.query_one(input_id if shown else widget_id).focus()
+
+    def action_toggle_filter_bar(self) -> None:
+        self.toggle_input_bar("#table_section", "filtering", "#filter_bar", "#main_table")
+
+    def action_toggle_search_bar(self) -> None:
+        self.toggle_input_bar("#sidebar_section", "searching", "#search_bar", "#sidebar")
+
+    def on_input_submitted(self, event: Input.Submitted) -> None:
+        """Apply the filter bar's predicates, or run the search bar's search."""
+        if event.input.id == "filter_bar":
+            data_table = self.query_one("#main_table", DisplayTable)
+            data_table.apply_view(data_table.sort, event.value.strip())
+        elif event.input.id == "search_bar" and event.value.strip():
+            self.run_search(event.value.strip())
+
+    def action_toggle_stats_panel(self) -> None:
+        """Show or hide live latency stats for database and LLM calls."""
+        shown = not self.screen.has_class("stats")
+        self.screen.set_class(shown, "stats")
+        if shown:
+            self.update_stats_panel()
+
+    def update_stats_panel(self) -> None:
+        """Redraw the stats panel from the recent spans, while it is shown."""
+        if self.screen.has_class("stats"):
+            self.query_one("#stats_view", Static).update(tracer.renderable())
+
+    def show_profile(self, profile: Profile) -> None:
+        self.query_one("#profile_view", Static).update(profile.renderable())
+
+    def check_action(self, action: str, parameters) -> bool | None:
+        if action == "cancel_query":
+            # Only claim Escape while something is running
+            return self.current_execution is not None
+        return True
+
+    def action_cancel_query(self) -> None:
+        """Cancel the running SQL or AI execution."""
+        if self.current_execution is not None:
+            self.current_execution.cancel()
+            self.notify("Cancelling…")
 
     def on_button_pressed(self, event: Button.Pressed) -> None:
         """Handle button press events."""
@@ -584,14 +1862,20 @@ Footer {
         elif event.widget.id == "toggle_btn":
             await self.toggle_editor_mode()
 
-    def refresh_explorer_after_ddl(self):
+    def refresh_explorer_after_ddl(self, statement: str = None):
         """Refresh the explorer after DDL operations."""
         try:
             explorer = self.query_one("#sidebar", Explorer)
-            explorer.refresh_structure()
+            explorer.refresh_structure(statement)
         except Exception:
             pass  # Explorer might not be mounted yet
+        # New or altered tables get search indexes (a no-op unless search is on);
+        # plain DML is already kept in the index by its triggers
+        if statement is None or written_table(statement) is None:
+            self.build_search_index()
 
 if __name__ == "__main__":
-    app = InfotronApp()
+    import sys
+    # Optional database path, e.g. `python main.py notes.db`
+    app = InfotronApp(database_path=sys.argv[1] if len(sys.argv) > 1 else None)
     app.run()
\ No newline at end of file
@@ -0,0 +1,379 @@
+import re
+import sqlite3
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+from cells import Cell, Preview, detail_expressions, formatter_for, is_wide, preview_expressions
+from filtering import parse_filter, quote_identifier
+from statements import strip_trailing_comments
+
+PAGE_SIZE = 200  # Rows fetched per page
+MAX_CACHED_PAGES = 32  # Upper bound on pages kept in memory per query
+READ_AHEAD_PAGES = 8  # Extra pages a wrapped query's run fetches, so scrolling doesn't re-run it per page
+
+# Matches a plain "SELECT * FROM table" which can be paged by rowid
+TABLE_SELECT_PATTERN = re.compile(
+    r'^\s*SELECT\s+\*\s+FROM\s+(?:"([^"]+)"|(\w+))\s*;?\s*$',
+    re.IGNORECASE,
+)
+
+
+def estimate_page_bytes(page) -> int:
+    """Roughly how much memory a page of ``(key, row)`` tuples holds."""
+    total = sys.getsizeof(page)
+    for key, row in page:
+        total += sys.getsizeof(row) + sum(sys.getsizeof(value) for value in row)
+    return total
+
+
+class PageCache:
+    """A bounded least-recently-used cache of result pages."""
+
+    def __init__(self, max_pages: int = MAX_CACHED_PAGES):
+        self.max_pages = max_pages
+        self.pages = OrderedDict()
+        self.page_bytes = {}  # Page index -> estimated size
+        self.lock = threading.Lock()  # Pages are fetched from worker threads
+
+    @property
+    def bytes(self) -> int:
+        with self.lock:
+            return sum(self.page_bytes.values())
+
+    def get(self, index: int):
+        """Return the cached page, or None if it is not cached."""
+        with self.lock:
+            page = self.pages.get(index)
+            if page is not None:
+                self.pages.move_to_end(index)
+            return page
+
+    def put(self, index: int, page) -> None:
+        """Store a page, evicting the least recently used ones over the bound."""
+        with self.lock:
+            self.pages[index] = page
+            self.page_bytes[index] = estimate_page_bytes(page)
+            self.pages.move_to_end(index)
+            while len(self.pages) > self.max_pages:
+                evicted, _ = self.pages.popitem(last=False)
+                del self.page_bytes[evicted]
+
+    def clear(self) -> None:
+        """Drop every cached page."""
+        with self.lock:
+            self.pages.clear()
+            self.page_bytes.clear()
+
+
+class PagedQuery:
+    """Fetch the result of a query one page at a time.
+
+    A plain ``SELECT * FROM table`` on a rowid table is paged by keyset on the
+    rowid, so deep pages cost the same as the first one. Any other query is
+    wrapped as a subquery and paged with LIMIT/OFFSET; since every run of it may
+    compute the whole result again, consecutive pages are fetched together by
+    one statement, with some read-ahead. Statements that cannot be wrapped
+    (PRAGMA and friends) are run once, keeping as many pages as the cache
+    holds.
+
+    Each page is a list of ``(key, row)`` tuples, where the key is the rowid
+    for keyset pages and the absolute row index otherwise.
+
+    ``sort`` (a ``(column, descending)`` pair) and ``filter_text`` (see
+    ``filtering.parse_filter``) are pushed down into the SQL, so SQLite sorts
+    and filters with its indexes. Table pages stay keyset-paged, on the sort
+    column and rowid.
+
+    Columns that can hold long TEXT or BLOBs are fetched as a short preview
+    and their full length (see ``cells``), so pages stay small however wide
+    the values are; ``fetch_value`` loads one in full on demand.
+    """
+
+    def __init__(self, connections, query: str, page_size: int = PAGE_SIZE,
+                 max_cached_pages: int = MAX_CACHED_PAGES, sort=None, filter_text: str = ""):
+        self.connections = connections  # A ConnectionManager to borrow readers from
+        # A trailing comment would swallow the closing parenthesis of the wrapped query
+        self.query = strip_trailing_comments(query.strip())
+        self.page_size = page_size
+        self.cache = PageCache(max_cached_pages)
+        self.columns = []
+        self.declared_types = []  # Per column, from PRAGMA table_xinfo; None for a query's result columns
+        self.previewed = []  # Per column, whether pages hold a Preview of it rather than the value
+        self.formatters = []  # Per column, how its values are drawn in the grid
+        self.table_name = None  # Set when paging by rowid
+        self.wrappable = True
+        self.last_page = None  # Index of the final page, once it has been seen
+        self.truncated = False  # True if a one-shot statement had more rows than were kept
+        self.page_keys = {}  # Page index -> last rowid (or sort value and rowid) on that page
+        self.sort = sort  # (column, descending) the rows are ordered by, or None
+        self.filter_text = filter_text  # Predicates typed into the filter bar
+        self.where = ""  # The filter as SQL over the result columns
+        self.where_params = ()
+        self.execute_seconds = 0.0  # Time spent stepping statements to their first row
+        self.fetch_seconds = 0.0  # Time spent reading rows out of them
+
+    @property
+    def keyset(self) -> bool:
+        return self.table_name is not None
+
+    @property
+    def sort_index(self) -> int:
+        return self.columns.index(self.sort[0])
+
+    def open(self, execution=None) -> None:
+        """Resolve the result columns and pick a paging strategy."""
+        started_at = time.perf_counter()
+        try:
+            self.resolve(execution)
+        finally:
+            self.execute_seconds += time.perf_counter() - started_at
+
+    def resolve(self, execution=None) -> None:
+        with self.connections.reader(execution) as conn:
+            cursor = conn.cursor()
+            match = TABLE_SELECT_PATTERN.match(self.query)
+            if match:
+                table_name = match.group(1) or match.group(2)
+                try:
+                    # Views and WITHOUT ROWID tables have no rowid to page on
+                    cursor.execute(f'SELECT rowid, * FROM "{table_name}" LIMIT 0')
+                    self.columns = [description[0] for description in cursor.description][1:]
+                    types = {row[1]: row[2] for row in cursor.execute(f'PRAGMA table_xinfo("{table_name}")').fetchall()}
+                    self.declared_types = [types.get(column, "") for column in self.columns]
+                    self.table_name = table_name
+                    self.prepare_view()
+                    return
+                except sqlite3.Error:
+                    pass
+
+            try:
+                cursor.execute(f"SELECT * FROM ({self.query}) LIMIT 0")
+            except sqlite3.Error:
+                # Not a SELECT we can wrap; run it as-is, once
+                self.wrappable = False
+                cursor.execute(self.query)
+                self.fetch_one_shot_pages(cursor)
+            self.columns = [description[0] for description in cursor.description or ()]
+            cursor.close()
+            self.declared_types = [None] * len(self.columns)
+            self.prepare_view()
+
+    def fetch_one_shot_pages(self, cursor) -> None:
+        """Page a statement that can't be run again, a page at a time, up to as many pages as the cache holds."""
+        for index in range(self.cache.max_pages):
+            rows = cursor.fetchmany(self.page_size)
+            if rows or index == 0:
+                self.cache.put(index, list(enumerate(rows, start=index * self.page_size)))
+            if len(rows) < self.page_size:
+                self.last_page = index if rows else max(index - 1, 0)
+                return
+        self.last_page = self.cache.max_pages - 1
+        self.truncated = cursor.fetchone() is not None
+
+    def prepare_view(self) -> None:
+        """Check the sort column and turn the filter text into SQL, now the columns are known."""
+        if (self.sort or self.filter_text) and not self.wrappable:
+            raise ValueError("Only the results of a SELECT can be sorted or filtered")
+        if self.sort and self.sort[0] not in self.columns:
+            raise ValueError(f"No column named {self.sort[0]}")
+        if self.filter_text:
+            self.where, self.where_params = parse_filter(self.filter_text, self.columns)
+        # One-shot pages are already fetched whole, so only wrapped queries and tables are cut in SQL
+        self.previewed = [self.wrappable and is_wide(declared_type) for declared_type in self.declared_types]
+        self.formatters = [formatter_for(declared_type) for declared_type in self.declared_types]
+
+    def select_list(self) -> str:
+        """The result columns as SQL, with previewed ones as a preview and a length each."""
+        expressions = []
+        for column, previewed in zip(self.columns, self.previewed):
+            column = quote_identifier(column)
+            expressions.extend(preview_expressions(column) if previewed else [column])
+        return ", ".join(expressions)
+
+    def decode_row(self, values):
+        """Turn a row of ``select_list()`` values into one value, or Preview, per column."""
+        if not any(self.previewed):
+            return tuple(values)
+        row = []
+        position = 0
+        for previewed in self.previewed:
+            if previewed:
+                head, length = values[position], values[position + 1]
+                row.append(head if length is None else Preview(head, length))
+                position += 2
+            else:
+                row.append(values[position])
+                position += 1
+        return tuple(row)
+
+    def keyset_columns(self) -> str:
+        """The rowid, the result columns and, when sorted, the sort column in full for the page key."""
+        sort_key = f", {quote_identifier(self.sort[0])}" if self.sort is not None else ""
+        return f"rowid, {self.select_list()}{sort_key}"
+
+    def keyset_statement(self, after, offset: int = None):
+        """SQL and parameters for a table page following the key ``after``, or at ``offset``."""
+        conditions = [f"({self.where})"] if self.where else []
+        params = list(self.where_params)
+        if self.sort is None:
+            order = "rowid"
+            if after is not None:
+                conditions.append("rowid > ?")
+                params.append(after)
+        else:
+            column, descending = self.sort
+            column = quote_identifier(column)
+            # NULLs sort first ascending and last descending, as SQLite orders them
+            order = f"{column} DESC, rowid DESC" if descending else f"{column}, rowid"
+            if after is not None:
+                value, rowid = after
+                if value is None:
+                    conditions.append(f"{column} IS NULL AND rowid < ?" if descending
+                                      else f"({column} IS NOT NULL OR rowid > ?)")
+                    params.append(rowid)
+                else:
+                    # The NULLs after the last value descending are topped up separately,
+                    # since OR-ing them in here would stop SQLite using an index
+                    conditions.append(f"({column}, rowid) {'<' if descending else '>'} (?, ?)")
+                    params.extend([value, rowid])
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+        statement = f'SELECT {self.keyset_columns()} FROM "{self.table_name}"{where} ORDER BY {order} LIMIT ?'
+        params.append(self.page_size)
+        if offset is not None:
+            statement += " OFFSET ?"
+            params.append(offset)
+        return statement, params
+
+    def page_key(self, row):
+        return row[0] if self.sort is None else (row[-1], row[0])
+
+    def fetch_keyset_rows(self, cursor, index: int, offset: int):
+        after = self.page_keys.get(index - 1) if index > 0 else None
+        if index > 0 and after is None:
+            # No known boundary yet (e.g. a jump), seed one with OFFSET
+            cursor.execute(*self.keyset_statement(None, offset))
+            return cursor.fetchall()
+        cursor.execute(*self.keyset_statement(after))
+        rows = cursor.fetchall()
+        if (self.sort is not None and self.sort[1] and after is not None and after[0] is not None
+                and len(rows) < self.page_size):
+            column = quote_identifier(self.sort[0])
+            where = f"({self.where}) AND " if self.where else ""
+            cursor.execute(
+                f'SELECT {self.keyset_columns()} FROM "{self.table_name}" WHERE {where}{column} IS NULL '
+                f'ORDER BY rowid DESC LIMIT ?',
+                (*self.where_params, self.page_size - len(rows)),
+            )
+            rows += cursor.fetchall()
+        return rows
+
+    def wrapped_statement(self, columns: str = None) -> str:
+        """The query as a subquery, filtered and sorted, ready for LIMIT/OFFSET.
+
+        ``columns`` are the expressions selected, over the query's result
+        columns; ``select_list()`` by default.
+        """
+        statement = f"SELECT {columns or self.select_list()} FROM ({self.query})"
+        if self.where:
+            statement += f" WHERE {self.where}"
+        if self.sort is not None:
+            statement += f" ORDER BY {quote_identifier(self.sort[0])}{' DESC' if self.sort[1] else ''}"
+        return statement
+
+    def is_last_page(self, index: int) -> bool:
+        return self.last_page is not None and index >= self.last_page
+
+    def fetch_page(self, index: int, execution=None):
+        """Return the rows of a page, fetching it from the database if needed."""
+        return self.fetch_pages(index, 1, execution)[0]
+
+    def fetch_pages(self, first: int, count: int, execution=None):
+        """Return ``count`` consecutive pages from ``first``, fetching the ones not cached.
+
+        Table pages are fetched one keyset statement each. The uncached pages
+        of a wrapped query are fetched by a single LIMIT/OFFSET statement,
+        which also reads READ_AHEAD_PAGES beyond them into the cache.
+        """
+        pages = {}
+        missing = []
+        for index in range(first, first + count):
+            page = self.cache.get(index)
+            if page is not None:
+                pages[index] = page
+            elif self.last_page is not None and index > self.last_page:
+                pages[index] = []
+            else:
+                missing.append(index)
+        if missing:
+            with self.connections.reader(execution) as conn:
+                cursor = conn.cursor()
+                if self.keyset:
+                    for index in missing:
+                        pages[index] = [] if self.is_last_page(index - 1) else self.fetch_keyset_page(cursor, index)
+                else:
+                    start = missing[0]
+                    pages.update(self.fetch_wrapped_pages(cursor, start, missing[-1] + 1 - start + READ_AHEAD_PAGES))
+        return [pages.get(index, []) for index in range(first, first + count)]
+
+    def fetch_keyset_page(self, cursor, index: int):
+        started_at = time.perf_counter()
+        rows = self.fetch_keyset_rows(cursor, index, index * self.page_size)
+        executed_at = time.perf_counter()
+        end = -1 if self.sort is not None else None  # Leave out the sort key
+        page = [(row[0], self.decode_row(row[1:end])) for row in rows]
+        if page:
+            self.page_keys[index] = self.page_key(rows[-1])
+        self.execute_seconds += executed_at - started_at
+        self.fetch_seconds += time.perf_counter() - executed_at
+        if len(page) < self.page_size:
+            self.last_page = index if page else max(index - 1, 0)
+        self.cache.put(index, page)
+        return page
+
+    def fetch_wrapped_pages(self, cursor, first: int, count: int) -> dict:
+        """Run the wrapped query once for ``count`` pages from ``first``; return them by index."""
+        offset = first * self.page_size
+        started_at = time.perf_counter()
+        cursor.execute(
+            f"{self.wrapped_statement()} LIMIT ? OFFSET ?",
+            (*self.where_params, count * self.page_size, offset),
+        )
+        executed_at = time.perf_counter()
+        rows = list(enumerate(map(self.decode_row, cursor.fetchall()), start=offset))
+        self.execute_seconds += executed_at - started_at
+        self.fetch_seconds += time.perf_counter() - executed_at
+
+        pages = {}
+        for index in range(first, first + count):
+            start = (index - first) * self.page_size
+            page = rows[start:start + self.page_size]
+            pages[index] = page
+            self.cache.put(index, page)
+            if len(page) < self.page_size:
+                self.last_page = index if page else max(index - 1, 0)
+                break
+        return pages
+
+    def fetch_value(self, key, column_index: int, execution=None):
+        """Fetch as much of one value as the value panel shows: ``(value, full length)``.
+
+        ``key`` is the row's key in its page: the rowid for table pages and
+        the row index otherwise.
+        """
+        expressions = ", ".join(detail_expressions(quote_identifier(self.columns[column_index])))
+        with self.connections.reader(execution) as conn:
+            if self.keyset:
+                row = conn.execute(
+                    f'SELECT {expressions} FROM "{self.table_name}" WHERE rowid = ?', (key,)
+                ).fetchone()
+            else:
+                row = conn.execute(
+                    f"{self.wrapped_statement(expressions)} LIMIT 1 OFFSET ?", (*self.where_params, key)
+                ).fetchone()
+        return row if row is not None else (None, None)
+
+    def cells(self, row):
+        """A row of values as grid cells, each drawn by its column's formatter."""
+        return [Cell(value, formatter) for value, formatter in zip(row, self.formatters)]
@@ -0,0 +1,105 @@
+import json
+import os
+import re
+import sqlite3
+import time
+
+from rich.console import Group
+from rich.text import Text
+from rich.tree import Tree
+
+# Every profiled run is appended here as one JSON line; override with INFOTRON_PROFILE_LOG
+PROFILE_LOG_PATH = os.getenv(
+    "INFOTRON_PROFILE_LOG",
+    os.path.join(os.path.expanduser("~"), ".cache", "infotron", "profile.jsonl"),
+)
+PROFILE_PROGRESS_STEPS = 100  # Finer than normal, so short queries still count steps
+
+# A plan step that reads a whole table rather than seeking through an index
+FULL_SCAN_PATTERN = re.compile(r'^SCAN (?!CONSTANT ROW)(?!.*\bUSING (?:COVERING )?INDEX\b)')
+TEMP_BTREE_PATTERN = re.compile(r'\bUSE TEMP B-TREE\b')
+
+
+def plan_warning(detail: str):
+    """Name what is expensive about a query plan step, or None."""
+    if FULL_SCAN_PATTERN.match(detail):
+        return "full table scan"
+    if TEMP_BTREE_PATTERN.search(detail):
+        return "temp b-tree"
+    return None
+
+
+def explain_query_plan(conn: sqlite3.Connection, query: str):
+    """Return the query plan as ``(id, parent, detail)`` rows."""
+    return [(row[0], row[1], row[3]) for row in conn.execute(f"EXPLAIN QUERY PLAN {query}")]
+
+
+class Profile:
+    """Where the time went for one statement: plan, phases, VM steps and rows."""
+
+    def __init__(self, query: str):
+        self.query = query
+        self.recorded_at = time.time()
+        self.plan = []
+        self.execute_seconds = 0.0  # Preparing and stepping to the first row
+        self.fetch_seconds = 0.0  # Reading the rows out
+        self.render_seconds = 0.0  # Putting them into the grid
+        self.steps = 0  # SQLite VM instructions, to the nearest PROFILE_PROGRESS_STEPS
+        self.rows = 0
+        self.error = None
+
+    @property
+    def total_seconds(self) -> float:
+        return self.execute_seconds + self.fetch_seconds + self.render_seconds
+
+    @property
+    def warnings(self):
+        return [(detail, plan_warning(detail)) for _, _, detail in self.plan if plan_warning(detail)]
+
+    def to_dict(self) -> dict:
+        return {
+            "recorded_at": self.recorded_at,
+            "query": self.query,
+            "execute_ms": round(self.execute_seconds * 1000, 3),
+            "fetch_ms": round(self.fetch_seconds * 1000, 3),
+            "render_ms": round(self.render_seconds * 1000, 3),
+            "total_ms": round(self.total_seconds * 1000, 3),
+            "steps": self.steps,
+            "rows": self.rows,
+            "plan": [detail for _, _, detail in self.plan],
+            "warnings": [warning for _, warning in self.warnings],
+            "error": self.error,
+        }
+
+    def renderable(self):
+        """The profile as it appears in the profile panel."""
+        summary = Text()
+        summary.append(f"Total {self.total_seconds * 1000:.1f} ms", style="bold")
+        summary.append(
+            f"\n  execute {self.execute_seconds * 1000:.1f} ms"
+            f"\n  fetch   {self.fetch_seconds * 1000:.1f} ms"
+            f"\n  render  {self.render_seconds * 1000:.1f} ms"
+            f"\n{self.rows:,} rows · ~{self.steps:,} VM steps"
+        )
+        if self.error:
+            summary.append(f"\n{self.error}", style="bold red")
+
+        tree = Tree(Text("Query plan", style="bold"))
+        nodes = {0: tree}
+        for node_id, parent, detail in self.plan:
+            warning = plan_warning(detail)
+            style = "bold red" if warning == "full table scan" else "bold yellow" if warning else ""
+            label = Text(detail, style=style)
+            if warning:
+                label.append(f"  ← {warning}", style=style)
+            nodes[node_id] = nodes.get(parent, tree).add(label)
+        if not self.plan:
+            tree.add(Text("(no plan)", style="dim"))
+        return Group(summary, Text(""), tree)
+
+
+def append_log(profile: Profile, path: str = PROFILE_LOG_PATH) -> None:
+    """Append a profile to the log, so runs can be compared over time."""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "a") as file:
+        file.write(json.dumps(profile.to_dict()) + "\n")
@@ -0,0 +1,106 @@
+import os
+import threading
+from collections import OrderedDict
+
+from statements import VOLATILE_PATTERN
+
+# Memory budget for cached results; override with INFOTRON_RESULT_CACHE_MB
+RESULT_CACHE_MB = float(os.getenv("INFOTRON_RESULT_CACHE_MB", "64"))
+
+
+
+def normalize_sql(query: str) -> str:
+    """Lowercase and collapse whitespace outside quotes, and drop trailing semicolons.
+
+    SQLite keywords and unquoted identifiers are case-insensitive, so this only
+    merges spellings of the same query.
+    """
+    parts = []
+    quote = None
+    pending_space = False
+    for char in query.strip().rstrip(';').strip():
+        if quote:
+            parts.append(char)
+            if char == quote:
+                quote = None
+        elif char.isspace():
+            pending_space = True
+        else:
+            if pending_space and parts:
+                parts.append(' ')
+            pending_space = False
+            parts.append(char.lower())
+            if char in ("'", '"', '`'):
+                quote = char
+            elif char == '[':
+                quote = ']'
+    return ''.join(parts)
+
+
+class ResultCache:
+    """An LRU cache of opened query results for the data grid.
+
+    Entries are ``PagedQuery`` objects, so a hit serves both the columns and
+    every page already fetched. Keys combine the normalized SQL and the grid's
+    sort and filter with the database file identity, ``PRAGMA data_version`` and ``schema_version``;
+    entries under any older version are dropped on the next lookup, so a write
+    evicts everything it made stale. The total size of cached pages is kept
+    under a memory budget.
+    """
+
+    def __init__(self, connections, budget_mb: float = RESULT_CACHE_MB):
+        self.connections = connections
+        self.budget_bytes = int(budget_mb * 1024 * 1024)
+        self.entries = OrderedDict()  # Key -> PagedQuery
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def cacheable(query: str) -> bool:
+        return VOLATILE_PATTERN.search(query) is None
+
+    def key(self, query: str, view=None):
+        return (normalize_sql(query), view, *self.connections.versions())
+
+    def get(self, key):
+        """Return the cached result for a key from ``key()``, or None."""
+        with self.lock:
+            self.purge_stale(key[2:])
+            paged_query = self.entries.get(key)
+            if paged_query is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return paged_query
+
+    def put(self, key, paged_query) -> None:
+        with self.lock:
+            self.purge_stale(key[2:])
+            self.entries[key] = paged_query
+            self.entries.move_to_end(key)
+            self.enforce_budget()
+
+    def enforce_budget(self) -> None:
+        """Evict least recently used results until the cached pages fit the budget.
+
+        Results grow as their pages are scrolled in, so this is rechecked on
+        every insert rather than only sized once.
+        """
+        total = sum(paged_query.cache.bytes for paged_query in self.entries.values())
+        while total > self.budget_bytes and len(self.entries) > 1:
+            _, evicted = self.entries.popitem(last=False)
+            total -= evicted.cache.bytes
+
+    def purge_stale(self, versions) -> None:
+        for key in [key for key in self.entries if key[2:] != versions]:
+            del self.entries[key]
+
+    def clear(self) -> None:
+        with self.lock:
+            self.entries.clear()
+
+    @property
+    def stats(self) -> str:
+        return f"cache {self.hits} hit{'s' if self.hits != 1 else ''} / {self.misses} miss{'es' if self.misses != 1 else ''}"
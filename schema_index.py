@@ -0,0 +1,125 @@
+import math
+import os
+import re
+import sqlite3
+import threading
+from collections import Counter
+
+from catalog import SchemaSnapshot
+
+# How many best-matching tables go into an AI prompt, before adding their
+# foreign-key neighbours; override with INFOTRON_AI_SCHEMA_TABLES
+SCHEMA_TOP_K = int(os.getenv("INFOTRON_AI_SCHEMA_TABLES", "8"))
+
+# BM25 parameters, the usual defaults
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+TOKEN_PATTERN = re.compile(r"[A-Z]+(?![a-z])|[A-Z]?[a-z]+|[0-9]+")
+
+
+def tokenize(text: str):
+    """Split text and identifiers (snake_case, camelCase) into lower-cased words."""
+    words = [word.lower() for word in TOKEN_PATTERN.findall(text)]
+    # Crude plural folding, so "users" matches a table named "user" and vice versa
+    return [word[:-1] if len(word) > 3 and word.endswith("s") else word for word in words]
+
+
+class SchemaIndex:
+    """A BM25 index over table names, column names and foreign keys.
+
+    Each table is one document made of its name, its column names and the
+    names of the tables it references, with the table name weighted highest.
+    ``select()`` picks the tables most relevant to a question plus their
+    foreign-key neighbours in both directions, so the prompt only carries the
+    schema the question can plausibly need. ``refresh()`` re-reads only the
+    tables that changed since the last ``PRAGMA schema_version`` it saw.
+    """
+
+    def __init__(self, top_k: int = SCHEMA_TOP_K):
+        self.top_k = top_k
+        self.snapshot = None
+        self.documents = {}  # Table name -> Counter of tokens
+        self.references = {}  # Table name -> set of tables it references
+        self.lock = threading.Lock()
+
+    def refresh(self, conn: sqlite3.Connection) -> None:
+        """Bring the index up to date with the schema, re-indexing only changed tables."""
+        with self.lock:
+            if self.snapshot is not None and SchemaSnapshot.read_version(conn) == self.snapshot.schema_version:
+                return
+            snapshot = SchemaSnapshot.load(conn)
+            if self.snapshot is None:
+                added, dropped, altered = list(snapshot.tables), [], []
+            else:
+                added, dropped, altered = self.snapshot.diff(snapshot)
+            for name in dropped:
+                self.documents.pop(name, None)
+                self.references.pop(name, None)
+            for name in added + altered:
+                self.index_table(conn, name)
+            self.snapshot = snapshot
+
+    def index_table(self, conn: sqlite3.Connection, table_name: str) -> None:
+        columns = [row[1] for row in conn.execute(f'PRAGMA table_info("{table_name}")')]
+        references = {row[2] for row in conn.execute(f'PRAGMA foreign_key_list("{table_name}")')}
+        tokens = Counter()
+        for token in tokenize(table_name):
+            tokens[token] += 3
+        for text in columns + sorted(references):
+            tokens.update(tokenize(text))
+        self.documents[table_name] = tokens
+        self.references[table_name] = references
+
+    def scores(self, question: str) -> dict:
+        """BM25 score of every table against the question."""
+        terms = set(tokenize(question))
+        count = len(self.documents)
+        if not terms or not count:
+            return {}
+        average_length = sum(sum(tokens.values()) for tokens in self.documents.values()) / count
+        frequencies = {term: sum(1 for tokens in self.documents.values() if term in tokens) for term in terms}
+        scores = {}
+        for name, tokens in self.documents.items():
+            length = sum(tokens.values())
+            score = 0.0
+            for term in terms:
+                frequency = tokens.get(term, 0)
+                if not frequency:
+                    continue
+                idf = math.log(1 + (count - frequencies[term] + 0.5) / (frequencies[term] + 0.5))
+                score += idf * frequency * (BM25_K1 + 1) / (
+                    frequency + BM25_K1 * (1 - BM25_B + BM25_B * length / average_length)
+                )
+            if score > 0:
+                scores[name] = score
+        return scores
+
+    def select(self, question: str):
+        """Return the tables to describe for a question, or None to describe them all.
+
+        None is returned when the schema is already small enough or nothing in
+        the question matches any table.
+        """
+        with self.lock:
+            if len(self.documents) <= self.top_k:
+                return None
+            scores = self.scores(question)
+            if not scores:
+                return None
+            best = sorted(scores, key=lambda name: (-scores[name], name))[:self.top_k]
+            selected = set(best)
+            for name in best:
+                # Tables it joins to, and tables that join to it
+                selected |= self.references.get(name, set()) & self.documents.keys()
+                selected |= {other for other, targets in self.references.items() if name in targets}
+            return sorted(selected)
+
+    def schema_size(self, table_names=None) -> int:
+        """Characters of CREATE statements for the given tables, or all of them."""
+        with self.lock:
+            if self.snapshot is None:
+                return 0
+            tables = self.snapshot.tables
+            names = tables if table_names is None else table_names
+            return sum(len(tables.get(name) or "") for name in names)
@@ -0,0 +1,225 @@
+import json
+import os
+import re
+import sqlite3
+
+from catalog import INTERNAL_TABLE_PREFIX, is_internal
+from filtering import quote_identifier
+
+SEARCH_STATE_TABLE = f"{INTERNAL_TABLE_PREFIX}_search"  # Which tables are indexed, and how far
+SEARCH_TABLE_PREFIX = f"{INTERNAL_TABLE_PREFIX}_fts_"  # One FTS5 index per searched table
+SEARCH_BATCH_ROWS = int(os.getenv("INFOTRON_SEARCH_BATCH_ROWS", "5000"))  # Rows indexed per commit
+SEARCH_RESULTS_PER_TABLE = 20
+INDEXED_ALL = 2 ** 63 - 1  # indexed_rowid once a table's backfill is done
+
+# Declared types with TEXT affinity; see https://www.sqlite.org/datatype3.html
+TEXT_TYPE_PATTERN = re.compile(r'CHAR|CLOB|TEXT', re.IGNORECASE)
+# Column names FTS5 reserves for itself
+RESERVED_COLUMNS = {"rank", "rowid"}
+WORD_PATTERN = re.compile(r'\w+')
+
+
+def index_name(table_name: str) -> str:
+    return f"{SEARCH_TABLE_PREFIX}{table_name}"
+
+
+def trigger_names(table_name: str):
+    return [f"{index_name(table_name)}_{suffix}" for suffix in ("insert", "delete", "update")]
+
+
+def match_query(text: str) -> str:
+    """Turn typed words into an FTS5 query matching rows with all of them, as prefixes.
+
+    Each word is quoted, so punctuation and FTS5 operators can't make it invalid.
+    """
+    return " ".join(f'"{word}"*' for word in WORD_PATTERN.findall(text))
+
+
+def text_columns(conn: sqlite3.Connection, table_name: str):
+    """The table's columns with TEXT affinity, or None if it can't be indexed by rowid."""
+    try:
+        conn.execute(f"SELECT rowid FROM {quote_identifier(table_name)} LIMIT 0")
+    except sqlite3.Error:
+        return None  # Views, virtual tables and WITHOUT ROWID tables
+    columns = conn.execute(f"PRAGMA table_info({quote_identifier(table_name)})").fetchall()
+    return [
+        column[1] for column in columns
+        if TEXT_TYPE_PATTERN.search(column[2] or "") and column[1].lower() not in RESERVED_COLUMNS
+    ]
+
+
+class SearchHit:
+    """One matching row: where it is, how well it ranks, and the matching text."""
+
+    def __init__(self, table_name: str, rowid: int, rank: float, snippet: str):
+        self.table_name = table_name
+        self.rowid = rowid
+        self.rank = rank  # bm25; lower is better
+        self.snippet = snippet
+
+
+class SearchIndex:
+    """Opt-in full-text search over the TEXT columns of every table.
+
+    Each table gets an external-content FTS5 table keyed by its rowid, so the
+    text is not stored twice, plus triggers that keep it current on INSERT,
+    UPDATE and DELETE. Existing rows are backfilled in rowid order, in batches
+    that each commit, and ``indexed_rowid`` in the state table records how far
+    that got: the triggers only touch rows at or below it, so a build can stop
+    at any batch and resume later without missing or double-indexing a row.
+    Everything lives in ``_infotron`` tables, which the explorer hides.
+    """
+
+    def __init__(self, connections, batch_rows: int = SEARCH_BATCH_ROWS):
+        self.connections = connections
+        self.batch_rows = batch_rows
+
+    def enabled(self) -> bool:
+        with self.connections.reader() as conn:
+            return conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (SEARCH_STATE_TABLE,)
+            ).fetchone() is not None
+
+    def enable(self) -> None:
+        with self.connections.writer() as conn:
+            conn.execute(
+                f'CREATE TABLE IF NOT EXISTS "{SEARCH_STATE_TABLE}" ('
+                "table_name TEXT PRIMARY KEY, columns TEXT NOT NULL, indexed_rowid INTEGER NOT NULL DEFAULT 0)"
+            )
+
+    def disable(self) -> None:
+        """Drop every search index, trigger and the state table."""
+        with self.connections.writer() as conn:
+            for (table_name,) in conn.execute(f'SELECT table_name FROM "{SEARCH_STATE_TABLE}"').fetchall():
+                self.drop_table_index(conn, table_name)
+            conn.execute(f'DROP TABLE IF EXISTS "{SEARCH_STATE_TABLE}"')
+
+    def drop_table_index(self, conn: sqlite3.Connection, table_name: str) -> None:
+        for trigger in trigger_names(table_name):
+            conn.execute(f"DROP TRIGGER IF EXISTS {quote_identifier(trigger)}")
+        conn.execute(f"DROP TABLE IF EXISTS {quote_identifier(index_name(table_name))}")
+        conn.execute(f'DELETE FROM "{SEARCH_STATE_TABLE}" WHERE table_name = ?', (table_name,))
+
+    def create_table_index(self, conn: sqlite3.Connection, table_name: str, columns) -> None:
+        """Create a table's FTS5 index and its triggers, empty and ready to backfill."""
+        table = quote_identifier(table_name)
+        index = quote_identifier(index_name(table_name))
+        names = ", ".join(quote_identifier(column) for column in columns)
+        old = ", ".join(f"old.{quote_identifier(column)}" for column in columns)
+        new = ", ".join(f"new.{quote_identifier(column)}" for column in columns)
+        content = table_name.replace("'", "''")
+        conn.execute(
+            f"CREATE VIRTUAL TABLE {index} USING fts5({names}, content='{content}', content_rowid='rowid')"
+        )
+        conn.execute(
+            f'INSERT INTO "{SEARCH_STATE_TABLE}" (table_name, columns, indexed_rowid) VALUES (?, ?, 0)',
+            (table_name, json.dumps(columns)),
+        )
+        indexed = f"(SELECT indexed_rowid FROM \"{SEARCH_STATE_TABLE}\" WHERE table_name = '{content}')"
+        insert_trigger, delete_trigger, update_trigger = (quote_identifier(name) for name in trigger_names(table_name))
+        conn.execute(
+            f"CREATE TRIGGER {insert_trigger} AFTER INSERT ON {table} WHEN new.rowid <= {indexed} BEGIN "
+            f"INSERT INTO {index} (rowid, {names}) VALUES (new.rowid, {new}); END"
+        )
+        conn.execute(
+            f"CREATE TRIGGER {delete_trigger} AFTER DELETE ON {table} WHEN old.rowid <= {indexed} BEGIN "
+            f"INSERT INTO {index} ({index}, rowid, {names}) VALUES ('delete', old.rowid, {old}); END"
+        )
+        conn.execute(
+            f"CREATE TRIGGER {update_trigger} AFTER UPDATE ON {table} BEGIN "
+            f"INSERT INTO {index} ({index}, rowid, {names}) SELECT 'delete', old.rowid, {old} "
+            f"WHERE old.rowid <= {indexed}; "
+            f"INSERT INTO {index} (rowid, {names}) SELECT new.rowid, {new} WHERE new.rowid <= {indexed}; END"
+        )
+
+    def sync(self):
+        """Match the indexes to the schema; return the tables whose backfill isn't done.
+
+        New tables get an index, dropped or renamed ones lose theirs, and a
+        table whose TEXT columns changed is indexed again from scratch.
+        """
+        with self.connections.writer() as conn:
+            state = {
+                table_name: (json.loads(columns), indexed_rowid)
+                for table_name, columns, indexed_rowid in conn.execute(
+                    f'SELECT table_name, columns, indexed_rowid FROM "{SEARCH_STATE_TABLE}"'
+                )
+            }
+            tables = [
+                name for (name,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table' ORDER BY name")
+                if not name.startswith("sqlite_") and not is_internal(name)
+            ]
+            pending = []
+            for table_name in tables:
+                columns = text_columns(conn, table_name)
+                indexed = state.pop(table_name, None)
+                if indexed is not None and indexed[0] == columns:
+                    if indexed[1] < INDEXED_ALL:
+                        pending.append(table_name)
+                    continue
+                if indexed is not None:
+                    self.drop_table_index(conn, table_name)
+                if columns:
+                    self.create_table_index(conn, table_name, columns)
+                    pending.append(table_name)
+            for table_name in state:
+                self.drop_table_index(conn, table_name)
+        return pending
+
+    def build_table(self, table_name: str, progress=None, execution=None) -> None:
+        """Backfill a table's index from where it stopped, one committed batch at a time.
+
+        ``progress`` is called with the table and the fraction done (by rowid)
+        after each batch. A cancelled execution stops between batches; the
+        batches already committed are kept.
+        """
+        table = quote_identifier(table_name)
+        index = quote_identifier(index_name(table_name))
+        with self.connections.reader() as conn:
+            last_rowid = conn.execute(f"SELECT max(rowid) FROM {table}").fetchone()[0] or 0
+        while execution is None or not execution.cancelled:
+            with self.connections.writer() as conn:
+                row = conn.execute(
+                    f'SELECT columns, indexed_rowid FROM "{SEARCH_STATE_TABLE}" WHERE table_name = ?', (table_name,)
+                ).fetchone()
+                if row is None or row[1] >= INDEXED_ALL:
+                    return  # Dropped, or finished, meanwhile
+                columns, indexed_rowid = json.loads(row[0]), row[1]
+                names = ", ".join(quote_identifier(column) for column in columns)
+                rows = conn.execute(
+                    f"SELECT rowid, {names} FROM {table} WHERE rowid > ? ORDER BY rowid LIMIT ?",
+                    (indexed_rowid, self.batch_rows),
+                ).fetchall()
+                conn.executemany(f"INSERT INTO {index} (rowid, {names}) VALUES ({', '.join('?' * (len(columns) + 1))})", rows)
+                done = len(rows) < self.batch_rows
+                conn.execute(
+                    f'UPDATE "{SEARCH_STATE_TABLE}" SET indexed_rowid = ? WHERE table_name = ?',
+                    (INDEXED_ALL if done else rows[-1][0], table_name),
+                )
+            if progress is not None:
+                progress(table_name, 1.0 if done else min(rows[-1][0] / last_rowid, 1.0) if last_rowid else 1.0)
+            if done:
+                return
+
+    def search(self, text: str, limit_per_table: int = SEARCH_RESULTS_PER_TABLE):
+        """Rank rows matching ``text`` with bm25; return ``[(table, [SearchHit])]``, best table first."""
+        query = match_query(text)
+        if not query:
+            return []
+        results = []
+        with self.connections.reader() as conn:
+            tables = [name for (name,) in conn.execute(f'SELECT table_name FROM "{SEARCH_STATE_TABLE}"')]
+            for table_name in tables:
+                index = quote_identifier(index_name(table_name))
+                try:
+                    rows = conn.execute(
+                        f"SELECT rowid, bm25({index}), snippet({index}, -1, '', '', '…', 10) "
+                        f"FROM {index} WHERE {index} MATCH ? ORDER BY rank LIMIT ?",
+                        (query, limit_per_table),
+                    ).fetchall()
+                except sqlite3.Error:
+                    continue  # Dropped or being rebuilt since the state was read
+                if rows:
+                    results.append((table_name, [SearchHit(table_name, *row) for row in rows]))
+        results.sort(key=lambda result: result[1][0].rank)
+        return results
@@ -0,0 +1,186 @@
+import os
+import sqlite3
+import tempfile
+import time
+
+from statements import VOLATILE_PATTERN, statement_effect
+from tracing import TracedConnection
+
+# Start with reads served from a snapshot, as `.snapshot on` does
+SNAPSHOT_ON_START = os.getenv("INFOTRON_SNAPSHOT", "0") == "1"
+# Snapshots are copied here: tmpfs where there is one; override with INFOTRON_SNAPSHOT_DIR
+SNAPSHOT_DIR = os.getenv(
+    "INFOTRON_SNAPSHOT_DIR",
+    "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir(),
+)
+SNAPSHOT_STEP_PAGES = 1024  # Pages copied per backup step, between progress reports
+SNAPSHOT_ATTEMPTS = 3  # Copies tried while the file keeps changing; the last one holds the writer
+REPLAY_LOG_ROWS = int(os.getenv("INFOTRON_REPLAY_LOG_ROWS", "100000"))  # More written at once means a resync
+
+
+def snapshot_path(database_path: str) -> str:
+    """A new, unique file for a snapshot of the database."""
+    name = os.path.splitext(os.path.basename(database_path))[0]
+    return os.path.join(SNAPSHOT_DIR, f"infotron-{name}-{os.getpid()}-{time.monotonic_ns()}.db")
+
+
+def remove_snapshot(path: str) -> None:
+    for suffix in ("", "-wal", "-shm", "-journal"):
+        try:
+            os.remove(path + suffix)
+        except FileNotFoundError:
+            pass
+
+
+def copy_database(source: sqlite3.Connection, path: str, progress=None, execution=None) -> None:
+    """Copy a database into ``path`` with the backup API, a step at a time.
+
+    ``progress`` is called with the fraction copied after each step. A
+    cancelled execution stops the copy between steps.
+    """
+    def step(status, remaining, total):
+        if execution is not None and execution.cancelled:
+            raise sqlite3.OperationalError("interrupted")
+        if progress is not None:
+            progress(1 - remaining / total if total else 1.0)
+
+    target = sqlite3.connect(path)
+    try:
+        source.backup(target, pages=SNAPSHOT_STEP_PAGES, progress=step)
+    finally:
+        target.close()
+
+
+class RecordingConnection(sqlite3.Connection):
+    """A connection that can log the writes made through it, to replay them elsewhere.
+
+    Only statements that succeed are logged. Those since the last commit are
+    held back until it and dropped on rollback, so what ``stop_recording()``
+    returns is exactly what reached the file. Statements are classified from
+    their bytecode: reads aren't logged, and a write that reads the time or a
+    random value, itself or through a default, trigger or check of a table it
+    writes, makes the log unreplayable.
+    """
+
+    recording = False
+
+    def start_recording(self, max_rows: int = REPLAY_LOG_ROWS) -> None:
+        self.recording = True
+        self.max_rows = max_rows
+        self.committed = []  # (method, sql, parameters)
+        self.pending = []
+        self.logged_rows = 0
+        self.replayable = True  # False once too much was written, or something that won't replay the same
+
+    def stop_recording(self):
+        """Stop logging; return the committed writes, or None if they can't be replayed."""
+        self.recording = False
+        writes = self.committed if self.replayable else None
+        self.committed = self.pending = []
+        return writes
+
+    def classify(self, sql: str, parameters=()):
+        """What a statement about to run will do, or None if it doesn't compile on its own."""
+        try:
+            return statement_effect(self.cursor(), sql, parameters)  # A cursor, so the EXPLAIN isn't recorded
+        except sqlite3.Error:
+            return None
+
+    def volatile(self, sql: str, effect) -> bool:
+        """Whether a statement that ran might write something else when replayed.
+
+        Besides the statement itself, the schema of the tables it wrote is
+        checked, or of every table if what it wrote isn't known.
+        """
+        if VOLATILE_PATTERN.search(sql):
+            return True
+        query, parameters = "SELECT sql FROM sqlite_master WHERE sql IS NOT NULL", ()
+        if effect is not None:
+            if not effect.written_roots:
+                return False
+            parameters = tuple(effect.written_roots)
+            marks = ", ".join("?" * len(parameters))
+            query += f" AND tbl_name IN (SELECT tbl_name FROM sqlite_master WHERE rootpage IN ({marks}))"
+        return any(VOLATILE_PATTERN.search(row[0]) for row in super().execute(query, parameters))
+
+    def log(self, method: str, sql: str, parameters, rows: int = 1, volatile: bool = False) -> None:
+        if not self.replayable:
+            return
+        self.logged_rows += rows
+        if self.logged_rows > self.max_rows or volatile:
+            self.replayable = False
+            self.committed = self.pending = []
+            return
+        self.pending.append((method, sql, parameters))
+        if not self.in_transaction:  # Autocommitted, e.g. DDL outside a transaction
+            self.committed.extend(self.pending)
+            self.pending = []
+
+    def execute(self, sql, parameters=()):
+        if not self.recording or not self.replayable:
+            return super().execute(sql, parameters)
+        effect = self.classify(sql, parameters)
+        cursor = super().execute(sql, parameters)
+        if effect is None or effect.writes or effect.changes_state:
+            self.log("execute", sql, parameters, volatile=self.volatile(sql, effect))
+        return cursor
+
+    def executemany(self, sql, parameters):
+        if not self.recording or not self.replayable:
+            return super().executemany(sql, parameters)
+        rows = []
+
+        def record(parameters):
+            # Keep each row as it is consumed, so a generator still streams into SQLite
+            for row in parameters:
+                if len(rows) <= self.max_rows:
+                    rows.append(row)
+                yield row
+
+        cursor = super().executemany(sql, record(parameters))
+        if rows:  # Nothing ran otherwise; the first row binds the placeholders to classify it
+            effect = self.classify(sql, rows[0])
+            self.log("executemany", sql, rows, rows=len(rows), volatile=self.volatile(sql, effect))
+        return cursor
+
+    def executescript(self, script):
+        if not self.recording or not self.replayable:
+            return super().executescript(script)
+        try:
+            cursor = super().executescript(script)
+        except sqlite3.Error:
+            self.replayable = False  # The statements before the failing one may have committed
+            raise
+        self.log("executescript", script, None, volatile=self.volatile(script, None))
+        return cursor
+
+    def commit(self):
+        super().commit()
+        if self.recording:
+            self.committed.extend(self.pending)
+            self.pending = []
+
+    def rollback(self):
+        super().rollback()
+        if self.recording:
+            self.pending = []
+
+
+class TracedRecordingConnection(RecordingConnection, TracedConnection):
+    """A recording connection whose statements are traced as well."""
+
+
+def replay(conn: sqlite3.Connection, writes) -> None:
+    """Run logged writes on another connection, committing them together where they allow."""
+    try:
+        for method, sql, parameters in writes:
+            if method == "executescript":
+                conn.executescript(sql)
+            else:
+                getattr(conn, method)(sql, parameters)
+        if conn.in_transaction:
+            conn.commit()
+    except BaseException:
+        if conn.in_transaction:
+            conn.rollback()
+        raise
@@ -0,0 +1,139 @@
+import os
+import re
+import sqlite3
+import threading
+import time
+
+# Where generated SQL is remembered between sessions; override with INFOTRON_AI_CACHE
+SQL_CACHE_PATH = os.getenv(
+    "INFOTRON_AI_CACHE",
+    os.path.join(os.path.expanduser("~"), ".cache", "infotron", "ai_sql_cache.db"),
+)
+SQL_CACHE_ENTRIES = int(os.getenv("INFOTRON_AI_CACHE_ENTRIES", "500"))
+
+# Token-overlap (Jaccard) similarity needed for a near-duplicate hit, e.g. 0.85.
+# Unset disables the near-duplicate tier: only identical questions match.
+_similarity = os.getenv("INFOTRON_AI_CACHE_SIMILARITY")
+SQL_CACHE_SIMILARITY = float(_similarity) if _similarity else None
+
+WORD_PATTERN = re.compile(r"[a-z0-9_]+")
+
+
+def normalize_question(question: str) -> str:
+    """Lowercase a question and reduce it to its words, dropping punctuation."""
+    return " ".join(WORD_PATTERN.findall(question.lower()))
+
+
+def similarity(first: str, second: str) -> float:
+    """Jaccard overlap of the word sets of two normalized questions."""
+    first_words, second_words = set(first.split()), set(second.split())
+    if not first_words or not second_words:
+        return 0.0
+    return len(first_words & second_words) / len(first_words | second_words)
+
+
+class SqlCache:
+    """A persistent map from natural-language questions to the SQL generated for them.
+
+    Entries are keyed by the database's path, the normalized question and a
+    fingerprint of the schema, so SQL is only reused against the database and
+    schema it was written for. Storing an entry drops that database's entries
+    for older schemas; other databases keep theirs. The cache keeps at most
+    ``max_entries`` in all, evicting the least recently used.
+    With a similarity threshold set, a question that misses exactly can still
+    hit the closest cached question by word overlap.
+    """
+
+    def __init__(self, path: str = SQL_CACHE_PATH, max_entries: int = SQL_CACHE_ENTRIES,
+                 min_similarity: float = SQL_CACHE_SIMILARITY):
+        self.path = path
+        self.max_entries = max_entries
+        self.min_similarity = min_similarity
+        self.lock = threading.Lock()
+        self.initialized = False
+
+    def connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path)
+        if not self.initialized:
+            columns = [row[1] for row in conn.execute("PRAGMA table_info(question_sql)")]
+            if columns and "database" not in columns:
+                conn.execute("DROP TABLE question_sql")  # Written before entries were keyed by database
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS question_sql (
+                    database TEXT NOT NULL,
+                    question TEXT NOT NULL,
+                    fingerprint TEXT NOT NULL,
+                    sql TEXT NOT NULL,
+                    last_used REAL NOT NULL,
+                    hits INTEGER NOT NULL DEFAULT 0,
+                    PRIMARY KEY (database, question, fingerprint)
+                )
+            """)
+            self.initialized = True
+        return conn
+
+    def get(self, question: str, fingerprint: str, database: str):
+        """Return the cached SQL for a question about this database and schema, or None."""
+        question = normalize_question(question)
+        with self.lock:
+            if not os.path.exists(self.path):
+                return None
+            conn = self.connect()
+            try:
+                row = conn.execute(
+                    "SELECT question, sql FROM question_sql WHERE database = ? AND question = ? AND fingerprint = ?",
+                    (database, question, fingerprint),
+                ).fetchone()
+                if row is None and self.min_similarity is not None:
+                    candidates = conn.execute(
+                        "SELECT question, sql FROM question_sql WHERE database = ? AND fingerprint = ?",
+                        (database, fingerprint),
+                    ).fetchall()
+                    scored = [(similarity(question, candidate[0]), candidate) for candidate in candidates]
+                    scored = [item for item in scored if item[0] >= self.min_similarity]
+                    if scored:
+                        row = max(scored, key=lambda item: item[0])[1]
+                if row is None:
+                    return None
+                conn.execute(
+                    "UPDATE question_sql SET last_used = ?, hits = hits + 1 "
+                    "WHERE database = ? AND question = ? AND fingerprint = ?",
+                    (time.time(), database, row[0], fingerprint),
+                )
+                conn.commit()
+                return row[1]
+            finally:
+                conn.close()
+
+    def put(self, question: str, fingerprint: str, sql: str, database: str) -> None:
+        """Remember the SQL for a question, dropping the database's entries for older schemas."""
+        question = normalize_question(question)
+        with self.lock:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = self.connect()
+            try:
+                conn.execute("DELETE FROM question_sql WHERE database = ? AND fingerprint != ?", (database, fingerprint))
+                conn.execute(
+                    "INSERT OR REPLACE INTO question_sql (database, question, fingerprint, sql, last_used) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (database, question, fingerprint, sql, time.time()),
+                )
+                conn.execute(
+                    """DELETE FROM question_sql WHERE rowid NOT IN (
+                        SELECT rowid FROM question_sql ORDER BY last_used DESC LIMIT ?
+                    )""",
+                    (self.max_entries,),
+                )
+                conn.commit()
+            finally:
+                conn.close()
+
+    def clear(self) -> None:
+        with self.lock:
+            if os.path.exists(self.path):
+                conn = self.connect()
+                try:
+                    conn.execute("DELETE FROM question_sql")
+                    conn.commit()
+                finally:
+                    conn.close()
@@ -0,0 +1,214 @@
+import os
+import re
+import sqlite3
+import time
+
+# Run each statement of a script under its own savepoint, so a failing
+# statement is rolled back alone and the rest still run; INFOTRON_SCRIPT_SAVEPOINTS=1
+SCRIPT_SAVEPOINTS = os.getenv("INFOTRON_SCRIPT_SAVEPOINTS", "0") == "1"
+
+# Bytecode that changes the database; see https://www.sqlite.org/opcode.html
+WRITE_OPCODES = {
+    "OpenWrite", "Insert", "Delete", "IdxInsert", "IdxDelete", "Clear",
+    "CreateBtree", "Destroy", "ParseSchema", "DropTable", "DropIndex",
+    "DropTrigger", "VCreate", "VDestroy", "VUpdate", "SetCookie", "Vacuum",
+}
+# Bytecode that changes the schema
+SCHEMA_OPCODES = {
+    "CreateBtree", "Destroy", "ParseSchema", "DropTable", "DropIndex", "DropTrigger", "VCreate", "VDestroy",
+}
+# Bytecode that changes the transaction or the connection's settings, e.g. SAVEPOINT or PRAGMA foreign_keys
+STATE_OPCODES = {"AutoCommit", "Savepoint", "Expire"}
+MAIN_DATABASE = 0  # OpenWrite's P3 for the main database, as opposed to temp or an attached one
+# ATTACH and DETACH compile to calls of these; they only change the connection that runs them,
+# so they go to the writer, where the attached database stays put
+ATTACH_FUNCTIONS = ("sqlite_attach(", "sqlite_detach(")
+BTREE_INTKEY = 1  # CreateBtree's P3 for a rowid table, as opposed to an index
+JOURNAL_MODE_QUERY = -1  # JournalMode's P3 when the mode is only read
+
+# SQL that can give a different result each time it runs: random values, counters, and the
+# current time, whether from 'now', a keyword or a date function given no time value
+VOLATILE_PATTERN = re.compile(
+    r"\b(?:random|randomblob|changes|total_changes|last_insert_rowid)\s*\("
+    r"|\b(?:date|time|datetime|julianday|unixepoch)\s*\(\s*\)|\bstrftime\s*\(\s*'[^']*'\s*\)"
+    r"|\bcurrent_(?:timestamp|date|time)\b|'now'",
+    re.IGNORECASE,
+)
+
+# Leading comments and whitespace, which on their own don't make a statement
+COMMENT_PATTERN = re.compile(r'^(?:\s+|--[^\n]*(?:\n|$)|/\*.*?\*/)*', re.DOTALL)
+
+# Transaction control, which a script can't use inside the transaction it runs in
+TRANSACTION_PATTERN = re.compile(
+    r'^(?:BEGIN(?:\s+(?:DEFERRED|IMMEDIATE|EXCLUSIVE))?(?:\s+TRANSACTION)?|(?:COMMIT|END)(?:\s+TRANSACTION)?'
+    r'|ROLLBACK(?:\s+TRANSACTION)?)\s*;?\s*$',
+    re.IGNORECASE,
+)
+
+
+def strip_comments(statement: str) -> str:
+    return statement[COMMENT_PATTERN.match(statement).end():]
+
+
+def strip_trailing_comments(statement: str) -> str:
+    """Drop the comments, whitespace and semicolons after a statement's last token.
+
+    Strings and quoted identifiers are skipped whole, so ``--`` or ``/*``
+    inside them isn't taken for a comment.
+    """
+    end = position = 0
+    while position < len(statement):
+        char = statement[position]
+        if char in " \t\r\n;":
+            position += 1
+        elif statement.startswith("--", position):
+            newline = statement.find("\n", position)
+            position = len(statement) if newline == -1 else newline + 1
+        elif statement.startswith("/*", position):
+            close = statement.find("*/", position + 2)
+            position = len(statement) if close == -1 else close + 2
+        elif char in "'\"`[":
+            quote = "]" if char == "[" else char
+            position += 1
+            while True:
+                position = statement.find(quote, position)
+                if position == -1:
+                    position = len(statement)
+                    break
+                if quote != "]" and statement.startswith(quote * 2, position):
+                    position += 2  # An escaped quote
+                    continue
+                position += 1
+                break
+            end = position
+        else:
+            position += 1
+            end = position
+    return statement[:end]
+
+
+def split_statements(text: str):
+    """Split SQL text into complete statements, as the sqlite3 shell would.
+
+    Semicolons inside strings, comments and trigger bodies don't end a
+    statement, because each candidate is checked with
+    ``sqlite3.complete_statement``. Comment-only fragments are dropped, and a
+    final statement without a semicolon is kept.
+    """
+    statements = []
+    start = 0
+    position = text.find(";")
+    while position != -1:
+        candidate = text[start:position + 1]
+        if sqlite3.complete_statement(candidate):
+            if strip_comments(candidate).strip(" \t\r\n;"):
+                statements.append(candidate.strip())
+            start = position + 1
+        position = text.find(";", position + 1)
+    rest = text[start:]
+    if strip_comments(rest).strip():
+        statements.append(rest.strip())
+    return statements
+
+
+class StatementEffect:
+    """What a statement would do when run, as told by ``statement_effect``."""
+
+    def __init__(self, writes: bool = False, changes_schema: bool = False,
+                 creates_table: bool = False, drops_table: bool = False, changes_state: bool = False):
+        self.writes = writes  # Must run on the writer: changes the database or the connection
+        self.changes_schema = changes_schema
+        self.creates_table = creates_table
+        self.drops_table = drops_table  # A table or view
+        self.changes_state = changes_state  # Transaction control or a connection setting
+        self.written_roots = set()  # Root pages of the main database's tables and indexes written, triggers included
+
+
+def statement_effect(conn: sqlite3.Connection, statement: str, parameters=()) -> StatementEffect:
+    """Judge what a statement would do from its compiled bytecode.
+
+    Compiling with EXPLAIN runs nothing, and unlike checking the first
+    keyword it sees through WITH ... INSERT, REPLACE, writing PRAGMAs,
+    VACUUM and ATTACH. A statement with placeholders needs ``parameters`` to
+    bind; their values don't change the bytecode. Raises sqlite3.Error if
+    the statement doesn't compile.
+    """
+    effect = StatementEffect()
+    for row in conn.execute(f"EXPLAIN {statement}", parameters).fetchall():
+        opcode, p2, p3, p4 = row[1], row[3], row[4], row[5]
+        if (opcode in WRITE_OPCODES or (opcode == "Transaction" and p2)
+                or (opcode == "JournalMode" and p3 != JOURNAL_MODE_QUERY)
+                or (opcode == "Function" and str(p4).startswith(ATTACH_FUNCTIONS))):
+            effect.writes = True
+        if opcode in SCHEMA_OPCODES:
+            effect.changes_schema = True
+        if opcode in STATE_OPCODES:
+            effect.changes_state = True
+        if opcode == "OpenWrite" and p3 == MAIN_DATABASE:
+            effect.written_roots.add(p2)
+        if (opcode == "CreateBtree" and p3 == BTREE_INTKEY) or opcode == "VCreate":
+            effect.creates_table = True
+        elif opcode == "DropTable":
+            effect.drops_table = True
+    return effect
+
+
+def writes_database(conn: sqlite3.Connection, statement: str) -> bool:
+    """Whether a statement must run on the writer; see ``statement_effect``."""
+    return statement_effect(conn, statement).writes
+
+
+class StatementResult:
+    """How one statement of a script went."""
+
+    def __init__(self, statement: str, seconds: float, rows: int = None, error: str = None, skipped: bool = False):
+        self.statement = statement
+        self.seconds = seconds
+        self.rows = rows  # Rows returned, or affected by DML; None if neither applies
+        self.error = error
+        self.skipped = skipped
+
+
+def run_script(conn: sqlite3.Connection, statements, savepoints: bool = SCRIPT_SAVEPOINTS, execution=None):
+    """Run statements on a writer connection inside one transaction; return a StatementResult each.
+
+    Without savepoints the first failing statement raises and the caller's
+    rollback undoes the whole script. With them, a failing statement is rolled
+    back to its savepoint, reported, and the script carries on; a cancelled
+    execution still aborts everything. BEGIN/COMMIT/ROLLBACK in the script are
+    skipped, since the script already runs as one transaction. The caller
+    commits.
+    """
+    results = []
+    if not conn.in_transaction:
+        conn.execute("BEGIN")
+    for statement in statements:
+        if TRANSACTION_PATTERN.match(strip_comments(statement)):
+            results.append(StatementResult(statement, 0.0, skipped=True))
+            continue
+        started_at = time.perf_counter()
+        if savepoints:
+            conn.execute("SAVEPOINT infotron_statement")
+        try:
+            total_changes = conn.total_changes
+            cursor = conn.execute(statement)
+            if cursor.description is not None:
+                rows = sum(1 for _ in cursor)
+            elif cursor.rowcount >= 0:
+                rows = cursor.rowcount
+            elif conn.total_changes != total_changes:
+                # DML the sqlite3 module doesn't count, e.g. WITH ... INSERT
+                rows = conn.execute("SELECT changes()").fetchone()[0]
+            else:
+                rows = None
+        except sqlite3.Error as e:
+            if not savepoints or (execution is not None and execution.cancelled):
+                raise
+            conn.execute("ROLLBACK TO infotron_statement")
+            conn.execute("RELEASE infotron_statement")
+            results.append(StatementResult(statement, time.perf_counter() - started_at, error=str(e)))
+            continue
+        if savepoints:
+            conn.execute("RELEASE infotron_statement")
+        results.append(StatementResult(statement, time.perf_counter() - started_at, rows))
+    return results
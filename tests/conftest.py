@@ -0,0 +1,43 @@
+import os
+import sqlite3
+import sys
+
+import pytest
+
+# The modules live at the top of the repository, not in a package
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Keep test runs out of the user's trace log
+os.environ.setdefault("INFOTRON_TRACE", "0")
+
+from connections import ConnectionManager  # noqa: E402
+
+
+@pytest.fixture
+def database_path(tmp_path):
+    return str(tmp_path / "test.db")
+
+
+@pytest.fixture
+def open_database(database_path):
+    """Create the test database from a SQL script and return a ConnectionManager on it."""
+    managers = []
+
+    def open_database(script: str = "") -> ConnectionManager:
+        conn = sqlite3.connect(database_path)
+        conn.executescript(script)
+        conn.close()
+        manager = ConnectionManager(database_path)
+        managers.append(manager)
+        return manager
+
+    yield open_database
+    for manager in managers:
+        manager.close()
+
+
+@pytest.fixture
+def memory():
+    """A plain in-memory connection, for functions that take one directly."""
+    conn = sqlite3.connect(":memory:")
+    yield conn
+    conn.close()
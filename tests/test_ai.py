@@ -0,0 +1,141 @@
+"""The AI service on a local fake chat model: streamed stages, SQL validation and schema narrowing."""
+import asyncio
+import sqlite3
+
+import pytest
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+import ai
+from column_stats import ColumnStatsCache
+from sql_cache import SqlCache
+
+SQL = "SELECT city, count(*) FROM users GROUP BY city"
+ANSWER = "Two users live in Paris and one in Oslo."
+FILLER_TABLES = 10  # More than the schema index describes at once, so questions get narrowed
+
+
+@pytest.fixture
+def database(open_database):
+    return open_database("""
+        CREATE TABLE users (id INTEGER PRIMARY KEY, name TEXT, city TEXT);
+        CREATE TABLE orders (id INTEGER PRIMARY KEY, user_id INTEGER REFERENCES users(id), total REAL);
+        INSERT INTO users (name, city) VALUES ('Ann', 'Paris'), ('Bob', 'Paris'), ('Cy', 'Oslo');
+        INSERT INTO orders (user_id, total) VALUES (1, 9.5), (3, 20.0);
+    """ + "".join(
+        f"CREATE TABLE inventory_{number} (id INTEGER PRIMARY KEY, sku TEXT, shelf TEXT);"
+        for number in range(FILLER_TABLES)
+    ))
+
+
+def install(connections, tmp_path, responses, allow_writes=False):
+    """Make the shared AI service answer from a fake LLM, with its own caches."""
+    service = ai.AiService(
+        connections=connections,
+        llm=FakeListChatModel(responses=responses),
+        allow_writes=allow_writes,
+        sql_cache=SqlCache(str(tmp_path / "sql_cache.db")),
+        column_stats=ColumnStatsCache(connections, path=str(tmp_path / "column_stats.db")),
+    )
+    ai.set_service(service)
+    return service
+
+
+@pytest.fixture(autouse=True)
+def restore_service():
+    yield
+    ai.set_service(None)
+
+
+def stream(question):
+    async def collect():
+        return [stage async for stage in ai.get_service().astream_query(question)]
+    return asyncio.run(collect())
+
+
+def test_streams_each_stage_in_order(database, tmp_path):
+    # One response each for generating the SQL, checking it and answering
+    install(database, tmp_path, [SQL, SQL, ANSWER])
+    stages = stream("How many users live in each city?")
+
+    names = [name for name, _ in stages]
+    assert names[:4] == ["schema", "sql", "checked_sql", "rows"]
+    assert set(names[4:]) == {"answer"}
+    values = dict(stages[:4])
+    assert values["sql"] == SQL
+    assert values["checked_sql"] == SQL
+    assert values["rows"] == "2"
+    assert "".join(text for name, text in stages if name == "answer") == ANSWER
+
+
+def test_repeated_question_reuses_the_sql(database, tmp_path):
+    install(database, tmp_path, [SQL, SQL, ANSWER, ANSWER])
+    stream("How many users live in each city?")
+    stages = stream("how many users live in each city")
+
+    names = [name for name, _ in stages]
+    assert names[:3] == ["schema", "cached_sql", "rows"]
+    assert dict(stages)["cached_sql"] == SQL
+
+
+def test_repeated_question_on_unchanged_data_reuses_the_answer(database, tmp_path):
+    service = install(database, tmp_path, [SQL, SQL, ANSWER, "Three users in Paris."])
+    first = stream("How many users live in each city?")
+    calls = service.llm.i
+
+    stages = stream("How many users live in each city?")
+    assert [name for name, _ in stages] == ["schema", "cached_sql", "rows", "answer"]
+    assert stages[-1][1] == "".join(text for name, text in first if name == "answer")
+    assert service.llm.i == calls  # Neither the SQL nor the answer needed the LLM
+
+    with database.writer() as conn:
+        conn.execute("INSERT INTO users (name, city) VALUES ('Dee', 'Paris')")
+    stages = stream("How many users live in each city?")
+    assert "".join(text for name, text in stages if name == "answer") == "Three users in Paris."
+
+
+@pytest.mark.parametrize("sql", [
+    "DELETE FROM users",
+    "UPDATE users SET city = 'Rome'",
+    "WITH gone AS (SELECT 1) INSERT INTO users (name) VALUES ('Dee')",
+    "DROP TABLE orders",
+])
+def test_validate_sql_rejects_writes(database, tmp_path, sql):
+    service = install(database, tmp_path, [], allow_writes=False)
+    with pytest.raises(ValueError):
+        service.validate_sql(sql)
+
+
+def test_validate_sql_allows_writes_when_enabled(database, tmp_path):
+    service = install(database, tmp_path, [], allow_writes=True)
+    service.validate_sql("DELETE FROM users")
+    service.validate_sql(SQL)
+
+
+def test_validate_sql_rejects_unknown_columns(database, tmp_path):
+    service = install(database, tmp_path, [])
+    with pytest.raises(sqlite3.Error):
+        service.validate_sql("SELECT age FROM users")
+
+
+def test_schema_is_narrowed_to_relevant_tables(database, tmp_path):
+    service = install(database, tmp_path, [])
+    service.ensure_ready()
+    table_info, report = service.schema_info("What is the order total per user?")
+
+    assert "CREATE TABLE orders" in table_info
+    assert "CREATE TABLE users" in table_info
+    assert "inventory_" not in table_info
+    assert report.startswith(f"2 of {FILLER_TABLES + 2} tables")
+
+
+def test_chain_gets_table_names_to_use(database, tmp_path, monkeypatch):
+    service = install(database, tmp_path, [])
+    chain = service.ensure_ready()
+    calls = []
+    monkeypatch.setattr(type(chain), "invoke", lambda self, inputs, *args, **kwargs: calls.append(inputs) or {})
+
+    service.query_database("Which users have orders?")
+    assert calls[0]["table_names_to_use"] == ["orders", "users"]
+
+    service.query_database("What is the weather like?")
+    assert "table_names_to_use" not in calls[1]  # Nothing matches, so the whole schema is described
@@ -0,0 +1,72 @@
+"""Row deltas: which DML statements get a RETURNING rewrite, and reading back the rows they touched."""
+import pytest
+
+from delta import fetch_delta, returning_statement
+
+
+@pytest.fixture
+def conn(memory):
+    memory.executescript("""
+        CREATE TABLE users (id INTEGER PRIMARY KEY, name TEXT UNIQUE, city TEXT);
+        CREATE TABLE tags (name TEXT PRIMARY KEY, color TEXT) WITHOUT ROWID;
+        INSERT INTO users (name, city) VALUES ('Ann', 'Paris'), ('Bob', 'Oslo'), ('Cy', 'Oslo');
+    """)
+    return memory
+
+
+@pytest.mark.parametrize("query", [
+    "UPDATE users SET city = 'Rome' WHERE city = 'Oslo'",
+    "DELETE FROM users WHERE id = 1",
+    "INSERT INTO users (name) VALUES ('Dee')",
+])
+def test_plain_dml_reports_its_rowids(conn, query):
+    assert returning_statement(conn, query) == ("users", f"{query} RETURNING rowid")
+
+
+def test_trailing_comment_is_dropped_before_returning(conn):
+    assert returning_statement(conn, "DELETE FROM users WHERE id = 1; -- oops") == (
+        "users", "DELETE FROM users WHERE id = 1 RETURNING rowid"
+    )
+
+
+@pytest.mark.parametrize("query", [
+    "REPLACE INTO users (id, name) VALUES (1, 'Ann')",
+    "INSERT OR REPLACE INTO users (name) VALUES ('Bob')",
+    "UPDATE OR REPLACE users SET name = 'Ann' WHERE id = 2",
+    "UPDATE users SET id = id + 10",
+    "DELETE FROM users RETURNING name",
+    "DELETE FROM tags",
+    "SELECT * FROM users",
+])
+def test_untrackable_statements_reload(conn, query):
+    assert returning_statement(conn, query) is None
+
+
+def test_triggers_make_the_table_reload(conn):
+    conn.execute("CREATE TABLE audit (user_id INTEGER)")
+    conn.execute("CREATE TRIGGER log AFTER UPDATE ON users BEGIN INSERT INTO audit VALUES (new.id); END")
+    assert returning_statement(conn, "UPDATE users SET city = 'Rome'") is None
+
+
+def test_cascading_foreign_keys_make_the_parent_reload(conn):
+    conn.execute("CREATE TABLE orders (id INTEGER PRIMARY KEY, user_id INTEGER REFERENCES users(id) ON DELETE CASCADE)")
+    assert returning_statement(conn, "DELETE FROM users WHERE id = 1") is None
+    assert returning_statement(conn, "DELETE FROM orders WHERE id = 1") is not None
+
+
+def test_fetch_delta_reads_touched_rows_and_marks_deleted_ones(conn):
+    table_name, statement = returning_statement(conn, "DELETE FROM users WHERE id = 1")
+    rowids = [row[0] for row in conn.execute(statement).fetchall()]
+    conn.execute("UPDATE users SET city = 'Rome' WHERE id = 2")
+    delta = fetch_delta(conn, table_name, rowids + [2], changes=2)
+    assert delta.table_name == "users"
+    assert delta.rows == {1: None, 2: (2, "Bob", "Rome")}
+    assert delta.changes == 2
+
+
+def test_fetch_delta_reads_in_chunks(conn):
+    conn.executemany("INSERT INTO users (name) VALUES (?)", [(f"u{number}",) for number in range(1200)])
+    rowids = [row[0] for row in conn.execute("SELECT rowid FROM users")]
+    delta = fetch_delta(conn, "users", rowids)
+    assert len(delta.rows) == 1203
+    assert all(row is not None for row in delta.rows.values())
@@ -0,0 +1,44 @@
+"""Exporting a query to CSV or JSONL, in batches, with nothing left behind on failure."""
+import csv
+import gzip
+import json
+import sqlite3
+
+import pytest
+
+from exporter import export_query
+
+
+@pytest.fixture
+def connections(open_database):
+    return open_database("""
+        CREATE TABLE files (id INTEGER PRIMARY KEY, name TEXT, size REAL, data BLOB);
+        INSERT INTO files (name, size, data) VALUES ('a.txt', 1.5, x'00ff'), ('b.txt', NULL, NULL), ('c,d', 3, x'');
+    """)
+
+
+def test_csv_export_writes_a_header_and_every_row(connections, tmp_path):
+    path = str(tmp_path / "files.csv")
+    progress = []
+    result = export_query(connections, "SELECT id, name, size FROM files", path, fetch_rows=2,
+                          progress=lambda rows, elapsed: progress.append(rows))
+    assert result.rows == 3 and result.path == path
+    assert progress == [2, 3]
+    with open(path, newline="") as file:
+        assert list(csv.reader(file)) == [["id", "name", "size"], ["1", "a.txt", "1.5"], ["2", "b.txt", ""],
+                                          ["3", "c,d", "3.0"]]
+
+
+def test_gzipped_jsonl_export_hexes_blobs(connections, tmp_path):
+    path = str(tmp_path / "files.jsonl.gz")
+    export_query(connections, "SELECT name, data FROM files ORDER BY id", path)
+    with gzip.open(path, "rt") as file:
+        records = [json.loads(line) for line in file]
+    assert records == [{"name": "a.txt", "data": "00ff"}, {"name": "b.txt", "data": None}, {"name": "c,d", "data": ""}]
+
+
+def test_failed_export_leaves_no_file(connections, tmp_path):
+    path = tmp_path / "files.csv"
+    with pytest.raises(sqlite3.Error):
+        export_query(connections, "SELECT missing FROM files", str(path))
+    assert not path.exists() and not (tmp_path / "files.csv.partial").exists()
@@ -0,0 +1,34 @@
+"""Filter bar text to a parameterized WHERE clause."""
+import pytest
+
+from filtering import parse_filter
+
+COLUMNS = ["name", "age", "Home City"]
+
+
+@pytest.mark.parametrize("text, where, params", [
+    ("age >= 30", '"age" >= ?', (30,)),
+    ("AGE=30.5", '"age" = ?', (30.5,)),
+    ("name ~ smi", '"name" LIKE ?', ("%smi%",)),
+    ("name !~ 'a, b'", '"name" NOT LIKE ?', ("%a, b%",)),
+    ("name = '42'", '"name" = ?', ("42",)),
+    ("name <> 'it''s'", '"name" != ?', ("it's",)),
+    ('"Home City" = Oslo', '"Home City" = ?', ("Oslo",)),
+    ("age is not null", '"age" IS NOT NULL', ()),
+    ("age >= 30, name is null", '"age" >= ? AND "name" IS NULL', (30,)),
+    ("age > 1 and name = 'x and y'", '"age" > ? AND "name" = ?', (1, "x and y")),
+    ("paris", '("name" LIKE ? OR "age" LIKE ? OR "Home City" LIKE ?)', ("%paris%",) * 3),
+    ("", "", ()),
+])
+def test_parse_filter(text, where, params):
+    assert parse_filter(text, COLUMNS) == (where, params)
+
+
+@pytest.mark.parametrize("text", [
+    "height > 2",
+    "age >",
+    "age is null 3",
+])
+def test_invalid_filters_raise(text):
+    with pytest.raises(ValueError):
+        parse_filter(text, COLUMNS)
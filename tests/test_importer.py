@@ -0,0 +1,86 @@
+"""Importing CSV and JSONL: type inference, value conversion and fields left without a column."""
+import gzip
+import json
+
+import pytest
+
+from importer import convert, import_file, infer_schema, parse_schema, value_type
+
+
+@pytest.mark.parametrize("value, kind", [
+    ("", None),
+    (None, None),
+    ("42", "INTEGER"),
+    ("-7", "INTEGER"),
+    ("007", "TEXT"),
+    ("1.5", "REAL"),
+    ("-.5e3", "REAL"),
+    ("1_000", "TEXT"),
+    ("nan", "TEXT"),
+    (" 3", "TEXT"),
+    (True, "INTEGER"),
+    (2.0, "REAL"),
+    ({"a": 1}, "TEXT"),
+])
+def test_value_type(value, kind):
+    assert value_type(value) == kind
+
+
+def test_infer_schema_widens_and_defaults_to_text():
+    records = [{"a": "1", "b": "1", "c": ""}, {"a": "2", "b": "1.5", "c": ""}, {"a": "x", "b": "2"}]
+    assert infer_schema(records) == {"a": "TEXT", "b": "REAL", "c": "TEXT"}
+
+
+def test_parse_schema():
+    assert parse_schema('id INTEGER PRIMARY KEY, "name", total REAL') == {
+        "id": "INTEGER PRIMARY KEY", "name": "TEXT", "total": "REAL",
+    }
+
+
+@pytest.mark.parametrize("value, kind, converted", [
+    ("12", "INTEGER", 12),
+    ("007", "INTEGER", "007"),
+    ("1.25", "REAL", 1.25),
+    ("1e400x", "REAL", "1e400x"),
+    ("", "TEXT", None),
+    ([1, 2], "TEXT", "[1, 2]"),
+])
+def test_convert(value, kind, converted):
+    assert convert(value, kind) == converted
+
+
+def test_csv_creates_a_typed_table(open_database, tmp_path):
+    connections = open_database()
+    path = tmp_path / "people.csv.gz"
+    with gzip.open(path, "wt", newline="") as file:
+        file.write("name,age,score\nAnn,31,9.5\nBob,,7\n")
+    result = import_file(connections, str(path), "people", batch_rows=1)
+    assert result.created and result.rows == 2 and not result.skipped_fields
+    with connections.reader() as conn:
+        types = {row[1]: row[2] for row in conn.execute("PRAGMA table_info(people)")}
+        rows = conn.execute("SELECT name, age, score FROM people ORDER BY rowid").fetchall()
+    assert types == {"name": "TEXT", "age": "INTEGER", "score": "REAL"}
+    assert rows == [("Ann", 31, 9.5), ("Bob", None, 7.0)]
+
+
+def test_jsonl_fields_without_a_column_are_reported(open_database, tmp_path, monkeypatch):
+    monkeypatch.setattr("importer.SCHEMA_SAMPLE_ROWS", 1)
+    connections = open_database("CREATE TABLE events (kind TEXT, at INTEGER)")
+    path = tmp_path / "events.jsonl"
+    path.write_text("\n".join(json.dumps(record) for record in [
+        {"kind": "open", "at": 1, "user": "ann"},
+        {"kind": "close", "at": 2, "extra": {"x": 1}},
+    ]) + "\n")
+    result = import_file(connections, str(path), "events")
+    assert not result.created and result.rows == 2
+    assert list(result.skipped_fields) == ["user", "extra"]
+    with connections.reader() as conn:
+        assert conn.execute("SELECT kind, at FROM events ORDER BY rowid").fetchall() == [("open", 1), ("close", 2)]
+
+
+def test_no_matching_fields_is_an_error(open_database, tmp_path):
+    connections = open_database("CREATE TABLE events (kind TEXT)")
+    path = tmp_path / "other.csv"
+    path.write_text("a,b\n1,2\n")
+    with pytest.raises(ValueError):
+        import_file(connections, str(path), "events")
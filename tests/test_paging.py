@@ -0,0 +1,95 @@
+"""PagedQuery: keyset paging over tables, NULLs under a sort, wrapped queries and the one-shot fallback."""
+import pytest
+
+from paging import PagedQuery
+
+ROWS = 25
+PAGE_SIZE = 10
+
+
+@pytest.fixture
+def connections(open_database):
+    # Every third score is NULL, so sorted pages have to step across them
+    return open_database("CREATE TABLE scores (id INTEGER PRIMARY KEY, name TEXT, score INTEGER);" + "".join(
+        f"INSERT INTO scores (name, score) VALUES ('p{number}', {'NULL' if number % 3 == 0 else number % 7});"
+        for number in range(ROWS)
+    ))
+
+
+def all_rows(paged):
+    rows = []
+    for index in range(ROWS // PAGE_SIZE + 2):
+        rows.extend(paged.fetch_page(index))
+    return rows
+
+
+def expected(connections, order):
+    with connections.reader() as conn:
+        return [tuple(row) for row in conn.execute(f"SELECT rowid, * FROM scores ORDER BY {order}")]
+
+
+def test_table_is_paged_by_rowid(connections):
+    paged = PagedQuery(connections, "SELECT * FROM scores", page_size=PAGE_SIZE)
+    paged.open()
+    assert paged.keyset
+    rows = all_rows(paged)
+    assert [key for key, _ in rows] == list(range(1, ROWS + 1))
+    assert paged.last_page == 2
+    assert paged.page_keys[1] == 2 * PAGE_SIZE
+
+
+@pytest.mark.parametrize("descending, order", [
+    (False, "score, rowid"),
+    (True, "score DESC, rowid DESC"),
+])
+def test_sorted_keyset_pages_include_nulls_once(connections, descending, order):
+    paged = PagedQuery(connections, "SELECT * FROM scores", page_size=PAGE_SIZE, sort=("score", descending))
+    paged.open()
+    rows = all_rows(paged)
+    assert [(key, *row) for key, row in rows] == expected(connections, order)
+
+
+def test_jump_to_a_page_without_a_known_boundary(connections):
+    paged = PagedQuery(connections, "SELECT * FROM scores", page_size=PAGE_SIZE, sort=("score", True))
+    paged.open()
+    assert [key for key, _ in paged.fetch_page(2)] == [row[0] for row in expected(connections, "score DESC, rowid DESC")][20:]
+
+
+def test_filter_is_pushed_into_keyset_pages(connections):
+    paged = PagedQuery(connections, "SELECT * FROM scores", page_size=PAGE_SIZE, filter_text="score is null")
+    paged.open()
+    assert [key for key, _ in all_rows(paged)] == [number + 1 for number in range(0, ROWS, 3)]
+
+
+def test_query_with_trailing_comment_is_wrapped(connections):
+    paged = PagedQuery(connections, "SELECT name FROM scores WHERE score > 2 -- the good ones", page_size=PAGE_SIZE,
+                       sort=("name", False))
+    paged.open()
+    assert not paged.keyset and paged.wrappable
+    with connections.reader() as conn:
+        names = [row[0] for row in conn.execute("SELECT name FROM scores WHERE score > 2 ORDER BY name")]
+    assert [row[0] for _, row in all_rows(paged)] == names
+
+
+def test_unwrappable_statement_runs_once_in_pages(connections):
+    paged = PagedQuery(connections, "PRAGMA table_info(scores)", page_size=2)
+    paged.open()
+    assert not paged.wrappable
+    assert paged.columns[:2] == ["cid", "name"]
+    assert [row[1] for _, row in paged.fetch_page(0) + paged.fetch_page(1)] == ["id", "name", "score"]
+    assert paged.last_page == 1
+    assert not paged.truncated
+
+
+def test_unwrappable_statement_keeps_at_most_the_cached_pages(connections):
+    paged = PagedQuery(connections, "PRAGMA table_info(scores)", page_size=1, max_cached_pages=2)
+    paged.open()
+    assert paged.last_page == 1
+    assert paged.truncated
+    assert paged.fetch_page(2) == []
+
+
+def test_unwrappable_statement_cannot_be_sorted(connections):
+    paged = PagedQuery(connections, "PRAGMA table_info(scores)", sort=("name", False))
+    with pytest.raises(ValueError):
+        paged.open()
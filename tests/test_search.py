@@ -0,0 +1,94 @@
+"""Full-text search: backfill in batches, triggers that keep indexed rows current, and syncing with the schema."""
+import pytest
+
+from search import INDEXED_ALL, SEARCH_STATE_TABLE, SearchIndex, index_name, match_query
+
+
+@pytest.fixture
+def connections(open_database):
+    return open_database("""
+        CREATE TABLE notes (id INTEGER PRIMARY KEY, title TEXT, body VARCHAR(200), stars INTEGER);
+        INSERT INTO notes (title, body, stars) VALUES
+            ('apple pie', 'bake slowly', 5),
+            ('banana bread', 'ripe bananas', 4),
+            ('cherry tart', 'pitted cherries', 3),
+            ('date loaf', 'soft dates', 2),
+            ('elderberry jam', 'boil the berries', 1);
+        CREATE TABLE counts (n INTEGER);
+        CREATE TABLE tags (name TEXT PRIMARY KEY) WITHOUT ROWID;
+    """)
+
+
+@pytest.fixture
+def index(connections):
+    index = SearchIndex(connections, batch_rows=2)
+    index.enable()
+    return index
+
+
+def hits(index, text):
+    return {table_name: sorted(hit.rowid for hit in table_hits) for table_name, table_hits in index.search(text)}
+
+
+def indexed_rowid(connections, table_name):
+    with connections.reader() as conn:
+        return conn.execute(
+            f'SELECT indexed_rowid FROM "{SEARCH_STATE_TABLE}" WHERE table_name = ?', (table_name,)
+        ).fetchone()[0]
+
+
+def test_match_query_quotes_words_as_prefixes():
+    assert match_query('ban* "OR" bread-') == '"ban"* "OR"* "bread"*'
+    assert match_query("  ** ") == ""
+
+
+def test_sync_indexes_only_rowid_tables_with_text(index, connections):
+    assert index.enabled()
+    assert index.sync() == ["notes"]
+    with connections.reader() as conn:
+        assert conn.execute("SELECT name FROM sqlite_master WHERE name = ?", (index_name("counts"),)).fetchone() is None
+
+
+def test_backfill_runs_in_committed_batches(index, connections):
+    index.sync()
+    progress = []
+    index.build_table("notes", progress=lambda table_name, fraction: progress.append(fraction))
+    assert progress == [0.4, 0.8, 1.0]
+    assert indexed_rowid(connections, "notes") == INDEXED_ALL
+    assert hits(index, "ban") == {"notes": [2]}
+    assert hits(index, "berr") == {"notes": [5]}
+
+
+def test_triggers_only_touch_backfilled_rows(index, connections):
+    index.sync()
+    with connections.writer() as conn:
+        conn.execute("UPDATE notes SET stars = 0")  # Nothing indexed yet, so nothing to keep current
+    with connections.writer() as conn:
+        conn.execute(f'UPDATE "{SEARCH_STATE_TABLE}" SET indexed_rowid = 2')  # As if stopped after a batch
+        conn.execute(f"INSERT INTO {index_name('notes')} (rowid, title, body) SELECT id, title, body FROM notes WHERE id <= 2")
+    with connections.writer() as conn:
+        conn.execute("UPDATE notes SET title = 'apricot pie' WHERE id = 1")
+        conn.execute("DELETE FROM notes WHERE id = 2")
+        conn.execute("UPDATE notes SET title = 'cherry pie' WHERE id = 3")
+    assert hits(index, "pie") == {"notes": [1]}
+    index.build_table("notes")
+    assert hits(index, "pie") == {"notes": [1, 3]}
+    assert hits(index, "banana") == {}
+    with connections.writer() as conn:
+        conn.execute("INSERT INTO notes (title) VALUES ('fig pie')")
+    assert hits(index, "pie") == {"notes": [1, 3, 6]}
+
+
+def test_schema_changes_rebuild_or_drop_indexes(index, connections):
+    index.sync()
+    index.build_table("notes")
+    with connections.writer() as conn:
+        conn.execute("ALTER TABLE notes ADD COLUMN author TEXT")
+        conn.execute("CREATE TABLE people (name TEXT)")
+    assert index.sync() == ["notes", "people"]
+    assert indexed_rowid(connections, "notes") == 0
+    with connections.writer() as conn:
+        conn.execute("DROP TABLE people")
+    assert index.sync() == ["notes"]
+    index.disable()
+    assert not index.enabled()
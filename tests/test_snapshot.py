@@ -0,0 +1,112 @@
+"""Recording committed writes, replaying them into a snapshot, and dropping the snapshot when they won't replay."""
+import sqlite3
+
+import pytest
+
+import snapshot
+from snapshot import RecordingConnection, copy_database, replay
+
+SCHEMA = """
+    CREATE TABLE users (id INTEGER PRIMARY KEY, name TEXT);
+    CREATE TABLE visits (user_id INTEGER, at TEXT DEFAULT CURRENT_TIMESTAMP);
+    INSERT INTO users (name) VALUES ('Ann');
+"""
+
+
+@pytest.fixture
+def recording(database_path):
+    conn = sqlite3.connect(database_path, factory=RecordingConnection)
+    conn.executescript(SCHEMA)
+    yield conn
+    conn.close()
+
+
+@pytest.fixture(autouse=True)
+def snapshot_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(snapshot, "SNAPSHOT_DIR", str(tmp_path))
+
+
+def contents(conn):
+    return conn.execute("SELECT id, name FROM users ORDER BY id").fetchall()
+
+
+def test_only_committed_writes_are_recorded(recording):
+    recording.start_recording()
+    recording.execute("SELECT * FROM users").fetchall()
+    recording.execute("INSERT INTO users (name) VALUES (?)", ("Bob",))
+    recording.commit()
+    recording.execute("INSERT INTO users (name) VALUES ('lost')")
+    recording.rollback()
+    recording.executemany("UPDATE users SET name = ? WHERE id = ?", iter([("Cy", 1)]))
+    recording.commit()
+    assert recording.stop_recording() == [
+        ("execute", "INSERT INTO users (name) VALUES (?)", ("Bob",)),
+        ("executemany", "UPDATE users SET name = ? WHERE id = ?", [("Cy", 1)]),
+    ]
+
+
+def test_replay_reproduces_the_writes(recording, tmp_path):
+    copy_path = str(tmp_path / "copy.db")
+    copy_database(recording, copy_path)
+    recording.start_recording()
+    recording.execute("SAVEPOINT a")
+    recording.execute("INSERT INTO users (name) VALUES ('Bob')")
+    recording.execute("ROLLBACK TO a")
+    recording.execute("INSERT INTO users (name) VALUES ('Cy')")
+    recording.execute("RELEASE a")
+    recording.commit()
+    writes = recording.stop_recording()
+    copy = sqlite3.connect(copy_path)
+    try:
+        replay(copy, writes)
+        assert contents(copy) == contents(recording) == [(1, "Ann"), (2, "Cy")]
+    finally:
+        copy.close()
+
+
+@pytest.mark.parametrize("sql", [
+    "INSERT INTO visits (user_id) VALUES (1)",  # Through the column default
+    "INSERT INTO users (name) VALUES (datetime())",
+    "UPDATE users SET name = random()",
+])
+def test_volatile_writes_cannot_be_replayed(recording, sql):
+    recording.start_recording()
+    recording.execute(sql)
+    recording.commit()
+    assert recording.stop_recording() is None
+
+
+def test_volatile_defaults_of_other_tables_do_not_matter(recording):
+    recording.start_recording()
+    recording.execute("INSERT INTO users (name) VALUES (date('2020-01-01'))")
+    recording.commit()
+    assert recording.stop_recording() is not None
+
+
+def test_too_many_rows_cannot_be_replayed(recording):
+    recording.start_recording(max_rows=2)
+    recording.executemany("INSERT INTO users (name) VALUES (?)", [(str(number),) for number in range(3)])
+    recording.commit()
+    assert recording.stop_recording() is None
+
+
+def test_snapshot_reads_see_our_writes(open_database):
+    connections = open_database(SCHEMA)
+    connections.sync_snapshot()
+    assert connections.read_path != connections.database_path
+    with connections.writer() as conn:
+        conn.execute("INSERT INTO users (name) VALUES ('Bob')")
+    assert connections.snapshot_path is not None
+    with connections.reader() as conn:
+        assert contents(conn) == [(1, "Ann"), (2, "Bob")]
+
+
+def test_unreplayable_write_drops_the_snapshot(open_database):
+    connections = open_database(SCHEMA)
+    connections.sync_snapshot()
+    with connections.writer() as conn:
+        conn.execute("INSERT INTO visits (user_id) VALUES (1)")
+    assert connections.snapshot_path is None and connections.snapshot_error
+    assert connections.read_path == connections.database_path
+    with connections.reader() as conn:
+        assert conn.execute("SELECT count(*) FROM visits").fetchone()[0] == 1
@@ -0,0 +1,111 @@
+"""Splitting SQL scripts, trimming trailing comments and judging statements from their bytecode."""
+import sqlite3
+
+import pytest
+
+from statements import VOLATILE_PATTERN, split_statements, statement_effect, strip_trailing_comments
+
+
+@pytest.fixture
+def conn(memory):
+    memory.executescript("""
+        CREATE TABLE users (id INTEGER PRIMARY KEY, name TEXT);
+        CREATE INDEX users_name ON users (name);
+        CREATE TABLE audit (user_id INTEGER);
+        CREATE TRIGGER log AFTER INSERT ON users BEGIN INSERT INTO audit VALUES (new.id); END;
+    """)
+    return memory
+
+
+def root_pages(conn, *names):
+    marks = ", ".join("?" * len(names))
+    return {row[0] for row in conn.execute(f"SELECT rootpage FROM sqlite_master WHERE name IN ({marks})", names)}
+
+
+def test_split_keeps_semicolons_in_strings_comments_and_triggers():
+    script = """
+        -- setup;
+        INSERT INTO t VALUES ('a;b');
+        /* one; two */
+        CREATE TRIGGER r AFTER INSERT ON t BEGIN DELETE FROM u; INSERT INTO u VALUES (1); END;
+        SELECT 1
+    """
+    assert split_statements(script) == [
+        "-- setup;\n        INSERT INTO t VALUES ('a;b');",
+        "/* one; two */\n        CREATE TRIGGER r AFTER INSERT ON t BEGIN DELETE FROM u; INSERT INTO u VALUES (1); END;",
+        "SELECT 1",
+    ]
+
+
+def test_split_drops_comment_only_fragments():
+    assert split_statements("SELECT 1; -- done\n;") == ["SELECT 1;"]
+    assert split_statements("  /* nothing */  ") == []
+
+
+@pytest.mark.parametrize("statement, stripped", [
+    ("SELECT 1 -- note", "SELECT 1"),
+    ("SELECT 1; /* a */ ;\n-- b\n", "SELECT 1"),
+    ("SELECT '--not a comment'", "SELECT '--not a comment'"),
+    ('SELECT "a/*b" FROM t /* c', 'SELECT "a/*b" FROM t'),
+    ("SELECT 'it''s' -- x", "SELECT 'it''s'"),
+    ("SELECT [a--b]", "SELECT [a--b]"),
+])
+def test_strip_trailing_comments(statement, stripped):
+    assert strip_trailing_comments(statement) == stripped
+
+
+@pytest.mark.parametrize("statement", [
+    "SELECT * FROM users",
+    "WITH t AS (SELECT 1) SELECT * FROM t",
+    "PRAGMA journal_mode",
+])
+def test_reads_do_not_write(conn, statement):
+    effect = statement_effect(conn, statement)
+    assert not effect.writes and not effect.changes_schema and not effect.written_roots
+
+
+@pytest.mark.parametrize("statement", [
+    "WITH t AS (SELECT 1 AS id) INSERT INTO audit SELECT id FROM t",
+    "REPLACE INTO users VALUES (1, 'a')",
+    "PRAGMA user_version = 3",
+    "ATTACH ':memory:' AS other",
+])
+def test_writes_are_seen_through_the_first_keyword(conn, statement):
+    assert statement_effect(conn, statement).writes
+
+
+def test_written_roots_include_indexes_and_trigger_targets(conn):
+    effect = statement_effect(conn, "INSERT INTO users (name) VALUES ('a')")
+    assert effect.writes and not effect.changes_schema
+    assert effect.written_roots == root_pages(conn, "users", "users_name", "audit")
+
+
+def test_schema_changes(conn):
+    created = statement_effect(conn, "CREATE TABLE t (a)")
+    assert created.changes_schema and created.creates_table and not created.drops_table
+    assert not statement_effect(conn, "CREATE INDEX t_a ON audit (user_id)").creates_table
+    dropped = statement_effect(conn, "DROP TABLE audit")
+    assert dropped.changes_schema and dropped.drops_table
+
+
+@pytest.mark.parametrize("statement", ["BEGIN", "COMMIT", "SAVEPOINT a", "PRAGMA cache_size = 10"])
+def test_transaction_control_and_settings_change_state(conn, statement):
+    assert statement_effect(conn, statement).changes_state
+
+
+def test_statement_that_does_not_compile_raises(conn):
+    with pytest.raises(sqlite3.Error):
+        statement_effect(conn, "SELECT * FROM missing")
+
+
+@pytest.mark.parametrize("sql, volatile", [
+    ("INSERT INTO t VALUES (random())", True),
+    ("INSERT INTO t VALUES (datetime())", True),
+    ("INSERT INTO t VALUES (datetime('now'))", True),
+    ("CREATE TABLE t (at DEFAULT CURRENT_TIMESTAMP)", True),
+    ("INSERT INTO t VALUES (strftime('%s'))", True),
+    ("INSERT INTO t VALUES (date('2020-01-01'))", False),
+    ("INSERT INTO t VALUES (strftime('%Y', '2020-01-01'))", False),
+])
+def test_volatile_pattern(sql, volatile):
+    assert bool(VOLATILE_PATTERN.search(sql)) == volatile
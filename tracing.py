@@ -0,0 +1,270 @@
+import atexit
+import hashlib
+import json
+import logging
+import os
+import queue
+import re
+import sqlite3
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from functools import lru_cache
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+from rich.console import Group
+from rich.table import Table
+from rich.text import Text
+
+from result_cache import normalize_sql
+
+# Record spans for SQLite and LLM calls; INFOTRON_TRACE=0 turns tracing off entirely
+TRACE_ENABLED = os.getenv("INFOTRON_TRACE", "1") == "1"
+# Spans are appended here as JSON lines; override with INFOTRON_TRACE_LOG
+TRACE_LOG_PATH = os.getenv(
+    "INFOTRON_TRACE_LOG",
+    os.path.join(os.path.expanduser("~"), ".cache", "infotron", "trace.jsonl"),
+)
+TRACE_LOG_MB = float(os.getenv("INFOTRON_TRACE_LOG_MB", "10"))  # Size at which the log rotates
+TRACE_LOG_BACKUPS = 3  # Rotated logs kept, as trace.jsonl.1 to .3
+TRACE_BUFFER_SPANS = 5000  # Recent spans kept in memory for the stats panel
+TRACE_SAMPLE_ROWS = 100  # Rows sized to estimate how many bytes a fetch returned
+SQL_PREVIEW_CHARS = 200  # SQL text kept per span, with its literals replaced by ?; parameters are never recorded
+SLOW_QUERIES_SHOWN = 10
+
+# String, blob and number literals, which may hold the user's data
+LITERAL_PATTERN = re.compile(r"[xX]?'(?:[^']|'')*(?:'|$)|(?<![\w.\"])\d+(?:\.\d*)?(?:[eE][+-]?\d+)?")
+
+
+@lru_cache(maxsize=1024)
+def sql_shape(sql: str) -> str:
+    """A statement with its literals replaced by ?, as spans record it."""
+    # Cut first, so a long script isn't normalized whole; a literal left open by the cut is still replaced
+    return LITERAL_PATTERN.sub("?", normalize_sql(sql[:SQL_PREVIEW_CHARS * 4]))[:SQL_PREVIEW_CHARS]
+
+
+@lru_cache(maxsize=1024)
+def sql_hash(sql: str) -> str:
+    """A short hash shared by every spelling of the same statement, whatever its literals."""
+    return hashlib.sha1(LITERAL_PATTERN.sub("?", normalize_sql(sql)).encode()).hexdigest()[:12]
+
+
+def estimate_bytes(rows) -> int:
+    """Roughly how many bytes of values ``rows`` holds, sized from a sample."""
+    if not rows:
+        return 0
+    sample = rows[:TRACE_SAMPLE_ROWS]
+    size = sum(len(value) if isinstance(value, (str, bytes)) else 8 for row in sample for value in row)
+    return size * len(rows) // len(sample)
+
+
+def percentile(values, fraction: float) -> float:
+    """Nearest-rank percentile of already sorted values."""
+    return values[min(int(fraction * len(values)), len(values) - 1)]
+
+
+class Span:
+    """One timed operation and what it did: rows, bytes, tokens, cache hits."""
+
+    def __init__(self, name: str, **attributes):
+        self.name = name
+        self.attributes = attributes
+        self.started_at = time.time()
+        self.seconds = 0.0
+
+    def set(self, **attributes) -> None:
+        self.attributes.update(attributes)
+
+    def to_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "started_at": round(self.started_at, 6),
+            "duration_ms": round(self.seconds * 1000, 3),
+            "thread": threading.current_thread().name,
+            **{key: value for key, value in self.attributes.items() if value is not None},
+        }
+
+
+class Tracer:
+    """Records spans in memory for the stats panel and appends them to a rotating JSONL log.
+
+    The log file is written by a background thread, so recording a span
+    never waits on the disk.
+    """
+
+    def __init__(self, path: str = TRACE_LOG_PATH, enabled: bool = TRACE_ENABLED,
+                 max_mb: float = TRACE_LOG_MB, buffer_spans: int = TRACE_BUFFER_SPANS):
+        self.path = path
+        self.enabled = enabled
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.spans = deque(maxlen=buffer_spans)
+        self.lock = threading.Lock()
+        self.logger = None  # Created on the first span, so importing this never touches the disk
+
+    @contextmanager
+    def span(self, name: str, **attributes):
+        """Time the block as a span; an exception is recorded on it and re-raised."""
+        span = Span(name, **attributes)
+        if not self.enabled:
+            yield span
+            return
+        started_at = time.perf_counter()
+        try:
+            yield span
+        except BaseException as e:
+            span.set(error=str(e) or type(e).__name__)
+            raise
+        finally:
+            span.seconds = time.perf_counter() - started_at
+            self.record(span)
+
+    def record(self, span: Span) -> None:
+        with self.lock:
+            self.spans.append(span)
+        logger = self.logger or self.open_log()
+        if logger is not None:
+            logger.info(json.dumps(span.to_dict(), default=str))
+
+    def open_log(self):
+        with self.lock:
+            if self.logger is None:
+                logger = logging.getLogger("infotron.trace")
+                logger.setLevel(logging.INFO)
+                logger.propagate = False  # Keep spans out of the app's own logging
+                try:
+                    os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+                    handler = RotatingFileHandler(
+                        self.path, maxBytes=self.max_bytes, backupCount=TRACE_LOG_BACKUPS, encoding="utf-8"
+                    )
+                    records = queue.SimpleQueue()
+                    listener = QueueListener(records, handler)
+                    listener.start()
+                    atexit.register(listener.stop)  # Write out what is still queued
+                    logger.addHandler(QueueHandler(records))
+                except OSError:
+                    logger.addHandler(logging.NullHandler())  # Keep the in-memory stats anyway
+                self.logger = logger
+            return self.logger
+
+    def snapshot(self):
+        with self.lock:
+            return list(self.spans)
+
+    def latency_stats(self):
+        """``(name, count, p50 ms, p95 ms, rows, bytes, cache hits or None)`` per span name."""
+        by_name = {}
+        for span in self.snapshot():
+            by_name.setdefault(span.name, []).append(span)
+        stats = []
+        for name, spans in sorted(by_name.items()):
+            durations = sorted(span.seconds * 1000 for span in spans)
+            hits = [span.attributes["cache_hit"] for span in spans if "cache_hit" in span.attributes]
+            stats.append((
+                name,
+                len(spans),
+                percentile(durations, 0.5),
+                percentile(durations, 0.95),
+                sum(span.attributes.get("rows") or 0 for span in spans),
+                sum(span.attributes.get("bytes") or 0 for span in spans),
+                sum(hits) if hits else None,
+            ))
+        return stats
+
+    def slow_queries(self, limit: int = SLOW_QUERIES_SHOWN):
+        """The statements with the slowest single execute or fetch: ``(max ms, runs, total ms, sql)``."""
+        by_hash = {}
+        for span in self.snapshot():
+            if "sql_hash" not in span.attributes:
+                continue
+            entry = by_hash.setdefault(span.attributes["sql_hash"], [0.0, 0, 0.0, span.attributes.get("sql", "")])
+            entry[0] = max(entry[0], span.seconds * 1000)
+            entry[1] += span.name != "sqlite.fetch"
+            entry[2] += span.seconds * 1000
+        return sorted(map(tuple, by_hash.values()), key=lambda query: query[0], reverse=True)[:limit]
+
+    def renderable(self):
+        """Latency percentiles per operation and the slowest queries, for the stats panel."""
+        if not self.enabled:
+            return Text("Tracing is off (INFOTRON_TRACE=0)", style="dim")
+        latency = Table(title="Latency by operation", title_justify="left", expand=True)
+        for column in ("Operation", "Count", "p50 ms", "p95 ms", "Rows", "Bytes", "Cache hits"):
+            latency.add_column(column, justify="left" if column == "Operation" else "right")
+        for name, count, p50, p95, rows, size, hits in self.latency_stats():
+            latency.add_row(
+                name, f"{count:,}", f"{p50:.2f}", f"{p95:.2f}", f"{rows:,}", f"{size:,}",
+                "" if hits is None else f"{hits}/{count}",
+            )
+
+        slow = Table(title="Slowest queries", title_justify="left", expand=True)
+        for column in ("Max ms", "Runs", "Total ms", "SQL"):
+            slow.add_column(column, justify="left" if column == "SQL" else "right")
+        for slowest, runs, total, sql in self.slow_queries():
+            slow.add_row(f"{slowest:.1f}", f"{runs:,}", f"{total:.1f}", " ".join(sql.split())[:120])
+        return Group(Text(f"Spans logged to {self.path}", style="dim"), latency, Text(""), slow)
+
+
+tracer = Tracer()
+
+
+class TracedCursor(sqlite3.Cursor):
+    """A cursor that records a span for every execute and fetch.
+
+    Iterating over the cursor isn't traced; the execute that started it is.
+    """
+
+    def execute(self, sql, parameters=()):
+        self.traced_sql = sql
+        with tracer.span("sqlite.execute", sql_hash=sql_hash(sql), sql=sql_shape(sql)) as span:
+            super().execute(sql, parameters)
+            if self.rowcount >= 0:
+                span.set(rows=self.rowcount)
+        return self
+
+    def executemany(self, sql, parameters):
+        self.traced_sql = sql
+        with tracer.span("sqlite.executemany", sql_hash=sql_hash(sql), sql=sql_shape(sql)) as span:
+            super().executemany(sql, parameters)
+            span.set(rows=self.rowcount)
+        return self
+
+    def executescript(self, script):
+        self.traced_sql = script
+        with tracer.span("sqlite.executescript", sql_hash=sql_hash(script), sql=sql_shape(script)):
+            super().executescript(script)
+        return self
+
+    def fetch(self, fetch, *args):
+        sql = getattr(self, "traced_sql", "")
+        with tracer.span("sqlite.fetch", sql_hash=sql_hash(sql), sql=sql_shape(sql)) as span:
+            rows = fetch(*args)
+            if isinstance(rows, list):
+                span.set(rows=len(rows), bytes=estimate_bytes(rows))
+            else:
+                span.set(rows=int(rows is not None), bytes=estimate_bytes([rows]) if rows is not None else 0)
+        return rows
+
+    def fetchone(self):
+        return self.fetch(super().fetchone)
+
+    def fetchmany(self, size=None):
+        return self.fetch(super().fetchmany, self.arraysize if size is None else size)
+
+    def fetchall(self):
+        return self.fetch(super().fetchall)
+
+
+class TracedConnection(sqlite3.Connection):
+    """A connection whose cursors, including the ones ``execute()`` makes, are traced."""
+
+    def cursor(self, factory=TracedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, parameters):
+        return self.cursor().executemany(sql, parameters)
+
+    def executescript(self, script):
+        return self.cursor().executescript(script)